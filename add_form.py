@@ -1,26 +1,25 @@
 import flet as ft
-import sqlite3
 from datetime import datetime
+from background import BackgroundTask
+from database import WRITE_TIMEOUT, pesees_repo
+from responsive import ResponsiveLayout
+from sessions import current_username
 
 def create_add_view(page: ft.Page, record_to_edit=None):
-    # Utiliser la largeur actuelle de la fenêtre ou la largeur de page
-    window_width = page.window_width if hasattr(page, "window_width") else page.width
-    is_mobile = window_width < 768 if window_width else False
+    # Largeur de la fenêtre (ou de la page) et seuil mobile, suivis au redimensionnement
+    layout = ResponsiveLayout(page, lambda mobile: apply_layout(mobile),
+                              lambda width: apply_widths(width))
     
     # Pour les tests en mode développement
-    print(f"Window width: {window_width}, Is mobile: {is_mobile}")
+    print(f"Window width: {layout.width}, Is mobile: {layout.mobile}")
 
     def create_input_field(label, value="", multiline=False):
-        # Calculer la largeur adaptative
-        field_width = window_width - 40 if is_mobile else min(300, window_width/2.5 if window_width else 300)
-        
+        # Largeur adaptative fixée par apply_widths
         return ft.TextField(
             label=label,
             value=value,
-            width=field_width,
             multiline=multiline,
-            min_lines=3 if multiline else 1,
-            text_size=14 if is_mobile else 16
+            min_lines=3 if multiline else 1
         )
 
     # Création des champs avec la fonction helper
@@ -70,7 +69,19 @@ def create_add_view(page: ft.Page, record_to_edit=None):
         multiline=True
     )
 
+    # Attente du commit sur le pool de threads, indicateur près du bouton
+    save_progress = ft.ProgressRing(width=20, height=20, stroke_width=2, visible=False)
+    save_task = BackgroundTask(page, save_progress)
+
+    def set_saving(saving):
+        # Bouton désactivé jusqu'au commit: un double clic n'envoie pas deux écritures
+        save_button.disabled = saving
+        if save_button.page:
+            save_button.update()
+
     def save_record(e):
+        if save_button.disabled:
+            return
         try:
             # Validation
             if not all([
@@ -86,169 +97,154 @@ def create_add_view(page: ft.Page, record_to_edit=None):
                 page.update()
                 return
 
-            conn = sqlite3.connect('pesees.db')
-            c = conn.cursor()
+            # Récupérer le nom d'utilisateur connecté (session serveur)
+            username = current_username(page, "Inconnu")
             
-            # Récupérer le nom d'utilisateur connecté
-            try:
-                username = page.client_storage.get("username")
-                if username is None:
-                    username = "Inconnu"
-            except:
-                username = "Inconnu"
+            values = {
+                "date": date_input.value,
+                "produit": produit_input.value,
+                "n_lot": lot_input.value,
+                "ddf": ddf_input.value,
+                "ddp": ddp_input.value,
+                "nb_caisses_pesees": nb_caisses_input.value,
+                "intervalle_pesee": intervalle_input.value,
+                "nb_caisses_conformes": nb_conformes_input.value,
+                "nb_caisses_non_conformes": nb_non_conformes_input.value,
+                "numero_caisse_non_conforme": numero_non_conforme_input.value,
+                "anomalie_observee": anomalie_input.value,
+                "created_by": username
+            }
             
+            set_saving(True)
             if record_to_edit:
                 # Update existing record
-                c.execute('''UPDATE pesees 
-                            SET date=?, produit=?, n_lot=?, ddf=?, ddp=?,
-                                nb_caisses_pesees=?, intervalle_pesee=?,
-                                nb_caisses_conformes=?, nb_caisses_non_conformes=?,
-                                numero_caisse_non_conforme=?, anomalie_observee=?,
-                                created_by=?
-                            WHERE id=?''',
-                         (date_input.value, produit_input.value, lot_input.value,
-                          ddf_input.value, ddp_input.value, nb_caisses_input.value,
-                          intervalle_input.value, nb_conformes_input.value,
-                          nb_non_conformes_input.value, numero_non_conforme_input.value,
-                          anomalie_input.value, username, record_to_edit[0]))
+                saved = pesees_repo.submit_update(record_to_edit[0], values)
             else:
-                # Insert new record - ASSUREZ-VOUS QUE TOUTES LES COLONNES SONT SPÉCIFIÉES
-                c.execute('''INSERT INTO pesees 
-                            (date, produit, n_lot, ddf, ddp, nb_caisses_pesees,
-                             intervalle_pesee, nb_caisses_conformes, nb_caisses_non_conformes,
-                             numero_caisse_non_conforme, anomalie_observee, created_by)
-                            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
-                         (date_input.value, produit_input.value, lot_input.value,
-                          ddf_input.value, ddp_input.value, nb_caisses_input.value,
-                          intervalle_input.value, nb_conformes_input.value,
-                          nb_non_conformes_input.value, numero_non_conforme_input.value,
-                          anomalie_input.value, username))
-
-            conn.commit()
-            conn.close()
-
-            # Show success message
-            page.snack_bar = ft.SnackBar(
-                content=ft.Text("Enregistrement sauvegardé avec succès!"),
-                bgcolor=ft.Colors.GREEN
-            )
-            page.snack_bar.open = True
-            page.update()
-            page.go("/consultation")  # Rediriger vers la consultation après sauvegarde
+                # Insert new record
+                saved = pesees_repo.submit_insert(values)
+            # Écriture groupée avec celles des autres sessions; le commit est
+            # attendu hors du gestionnaire d'événement
+            save_task.run(lambda: saved.result(WRITE_TIMEOUT), on_saved, on_save_error)
             
         except Exception as ex:
-            print(f"Error saving record: {ex}")
-            page.snack_bar = ft.SnackBar(
-                content=ft.Text(f"Erreur lors de la sauvegarde: {str(ex)}"),
-                bgcolor=ft.Colors.RED
-            )
-            page.snack_bar.open = True
-            page.update()
-
-    # Créer un container responsive pour le formulaire
-    def create_form_container():
-        nonlocal is_mobile
-        # Recalculer si on est en mode mobile
-        window_width = page.window_width if hasattr(page, "window_width") else page.width
-        is_mobile = window_width < 768 if window_width else False
-        
+            on_save_error(ex)
+
+    def on_saved(record_id):
+        set_saving(False)
+        # Show success message
+        page.snack_bar = ft.SnackBar(
+            content=ft.Text("Enregistrement sauvegardé avec succès!"),
+            bgcolor=ft.Colors.GREEN
+        )
+        page.snack_bar.open = True
+        page.update()
+        page.go("/consultation")  # Rediriger vers la consultation après sauvegarde
+
+    def on_save_error(ex):
+        set_saving(False)
+        print(f"Error saving record: {ex}")
+        page.snack_bar = ft.SnackBar(
+            content=ft.Text(f"Erreur lors de la sauvegarde: {str(ex)}"),
+            bgcolor=ft.Colors.RED
+        )
+        page.snack_bar.open = True
+        page.update()
+
+    inputs = [
+        date_input, produit_input, lot_input,
+        ddf_input, ddp_input, nb_caisses_input,
+        intervalle_input, nb_conformes_input,
+        nb_non_conformes_input, numero_non_conforme_input,
+        anomalie_input
+    ]
+
+    # Créer un container responsive pour le formulaire (champs réutilisés)
+    def create_form_container(mobile):
         # Disposition responsive
-        if is_mobile:
+        if mobile:
             return ft.Column(
-                [
-                    date_input, produit_input, lot_input,
-                    ddf_input, ddp_input, nb_caisses_input,
-                    intervalle_input, nb_conformes_input,
-                    nb_non_conformes_input, numero_non_conforme_input,
-                    anomalie_input
-                ],
+                inputs,
                 spacing=10,
                 scroll=ft.ScrollMode.AUTO
             )
         else:
             return ft.Row(
                 [
-                    ft.Column(
-                        [date_input, produit_input, lot_input,
-                         ddf_input, ddp_input, nb_caisses_input],
-                        spacing=10
-                    ),
-                    ft.Column(
-                        [intervalle_input, nb_conformes_input,
-                         nb_non_conformes_input, numero_non_conforme_input,
-                         anomalie_input],
-                        spacing=10
-                    )
+                    ft.Column(inputs[:6], spacing=10),
+                    ft.Column(inputs[6:], spacing=10)
                 ],
                 alignment=ft.MainAxisAlignment.CENTER,
                 spacing=20
             )
 
-    # Créer le contenu initial
-    form_container = create_form_container()
-
-    # Fonction pour gérer le redimensionnement
-    def on_resize(e):
-        nonlocal form_container
-        # Recréer le conteneur du formulaire
-        new_form_container = create_form_container()
-        # Remplacer l'ancien conteneur
-        page_content.controls[1] = new_form_container
-        form_container = new_form_container
-        page.update()
+    # Seuil mobile franchi: changer la disposition
+    def apply_layout(mobile):
+        page_content.controls[1] = create_form_container(mobile)
+        title_text.size = 22 if mobile else 30
+        buttons_row.spacing = 10 if mobile else 20
+        main_container.padding = 10 if mobile else 20
+        for field in inputs:
+            field.text_size = 14 if mobile else 16
+
+    # Même disposition: ajuster les largeurs en place
+    def apply_widths(width):
+        mobile = layout.mobile
+        field_width = width - 40 if mobile else min(300, width/2.5)
+        for field in inputs:
+            field.width = field_width
+        save_button.width = consult_button.width = width/2 - 30 if mobile else None
+
+    title_text = ft.Text(
+        "Gestion des Pesées",
+        weight=ft.FontWeight.BOLD,
+        text_align=ft.TextAlign.CENTER
+    )
+    save_button = ft.ElevatedButton(
+        text="Sauvegarder",
+        on_click=save_record,
+        style=ft.ButtonStyle(
+            color=ft.Colors.WHITE,
+            bgcolor=ft.Colors.BLUE,
+            padding=15
+        )
+    )
+    consult_button = ft.ElevatedButton(
+        text="Consulter",
+        on_click=lambda _: page.go("/consultation"),
+        style=ft.ButtonStyle(
+            color=ft.Colors.WHITE,
+            bgcolor=ft.Colors.GREEN,
+            padding=15
+        )
+    )
+    buttons_row = ft.Row(
+        [save_progress, save_button, consult_button],
+        alignment=ft.MainAxisAlignment.CENTER
+    )
 
     # Créer le contenu principal de la page
     page_content = ft.Column(
         [
-            ft.Text(
-                "Gestion des Pesées",
-                size=22 if is_mobile else 30,
-                weight=ft.FontWeight.BOLD,
-                text_align=ft.TextAlign.CENTER
-            ),
-            form_container,
-            ft.Row(
-                [
-                    ft.ElevatedButton(
-                        text="Sauvegarder",
-                        on_click=save_record,
-                        style=ft.ButtonStyle(
-                            color=ft.Colors.WHITE,
-                            bgcolor=ft.Colors.BLUE,
-                            padding=15
-                        ),
-                        width=window_width/2 - 30 if is_mobile else None
-                    ),
-                    ft.ElevatedButton(
-                        text="Consulter",
-                        on_click=lambda _: page.go("/consultation"),
-                        style=ft.ButtonStyle(
-                            color=ft.Colors.WHITE,
-                            bgcolor=ft.Colors.GREEN,
-                            padding=15
-                        ),
-                        width=window_width/2 - 30 if is_mobile else None
-                    )
-                ],
-                alignment=ft.MainAxisAlignment.CENTER,
-                spacing=10 if is_mobile else 20
-            )
+            title_text,
+            ft.Container(),
+            buttons_row
         ],
         horizontal_alignment=ft.CrossAxisAlignment.CENTER,
         spacing=20
     )
 
+    main_container = ft.Container(
+        content=page_content,
+        expand=True
+    )
+
+    apply_layout(layout.mobile)
+    apply_widths(layout.width)
     # Enregistrer l'événement de redimensionnement
-    page.on_resize = on_resize
+    layout.attach()
 
     return ft.View(
         "/",
-        [
-            ft.Container(
-                content=page_content,
-                padding=10 if is_mobile else 20,
-                expand=True
-            )
-        ],
+        [main_container],
         scroll=ft.ScrollMode.AUTO
     )
\ No newline at end of file
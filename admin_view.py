@@ -1,43 +1,16 @@
 import flet as ft
+import os
 import sqlite3
+import uuid
 from auth_view import hash_password
-
-def is_admin(page):
-    """Vérifier si l'utilisateur connecté est un administrateur"""
-    try:
-        # Use client_storage instead of session
-        role = page.client_storage.get("user_role")
-        return role == "admin"
-    except Exception as ex:
-        print(f"Error checking admin status: {ex}")
-        return False
-
-def add_role_column_if_not_exists():
-    """Ajouter la colonne role si elle n'existe pas et définir admin comme administrateur"""
-    try:
-        conn = sqlite3.connect('pesees.db')
-        c = conn.cursor()
-        
-        # Vérifier si la colonne role existe
-        result = c.execute("PRAGMA table_info(users)").fetchall()
-        has_role_column = any(column[1] == 'role' for column in result)
-        
-        if not has_role_column:
-            # Ajouter la colonne role
-            c.execute('ALTER TABLE users ADD COLUMN role TEXT DEFAULT "user"')
-            # Définir l'utilisateur admin comme administrateur
-            c.execute('UPDATE users SET role = "admin" WHERE username = "admin"')
-            conn.commit()
-        
-        conn.close()
-    except Exception as e:
-        print(f"Erreur lors de l'ajout de la colonne role: {e}")
+from background import BackgroundTask
+from database import users_repo
+from importer import UPLOAD_DIR, import_file
+from sessions import current_username, is_admin, login
 
 def create_user_management_view(page: ft.Page):
     """Créer la vue de gestion des utilisateurs"""
     
-    add_role_column_if_not_exists()
-    
     # Table des utilisateurs
     users_table = ft.DataTable(
         columns=[
@@ -76,15 +49,20 @@ def create_user_management_view(page: ft.Page):
         value="user"
     )
     
+    # Requêtes de gestion des utilisateurs sur le pool de threads
+    users_progress = ft.ProgressBar(width=400, visible=False)
+    users_task = BackgroundTask(page, users_progress)
+    user_actions = BackgroundTask(page)
+    
     def load_users():
+        users_task.run(users_repo.list, show_users, on_users_error)
+    
+    def on_users_error(ex):
+        print(f"Erreur lors du chargement des utilisateurs: {ex}")
+    
+    def show_users(users):
         users_table.rows.clear()
         try:
-            conn = sqlite3.connect('pesees.db')
-            c = conn.cursor()
-            users = c.execute('''SELECT id, username, role, created_at 
-                               FROM users ORDER BY id DESC''').fetchall()
-            conn.close()
-            
             if not users:
                 users_table.rows.append(
                     ft.DataRow(cells=[ft.DataCell(ft.Text("Aucun utilisateur"))] * 5)
@@ -125,29 +103,28 @@ def create_user_management_view(page: ft.Page):
             show_error("Le mot de passe doit contenir au moins 4 caractères")
             return
         
-        try:
-            conn = sqlite3.connect('pesees.db')
-            c = conn.cursor()
-            
-            hashed_password = hash_password(password_field.value)
-            c.execute('''INSERT INTO users (username, password, role) 
-                        VALUES (?, ?, ?)''',
-                     (username_field.value, hashed_password, role_dropdown.value))
-            
-            conn.commit()
-            conn.close()
-            
-            # Vider les champs
-            username_field.value = ""
-            password_field.value = ""
-            role_dropdown.value = "user"
-            
-            show_success(f"Utilisateur '{username_field.value}' créé avec succès!")
-            load_users()
-            
-        except sqlite3.IntegrityError:
+        username = username_field.value
+        hashed_password = hash_password(password_field.value)
+        role = role_dropdown.value
+        user_actions.run(
+            lambda: users_repo.create(username, hashed_password, role),
+            lambda _: on_user_created(username),
+            on_create_error
+        )
+    
+    def on_user_created(username):
+        # Vider les champs
+        username_field.value = ""
+        password_field.value = ""
+        role_dropdown.value = "user"
+        
+        show_success(f"Utilisateur '{username}' créé avec succès!")
+        load_users()
+    
+    def on_create_error(ex):
+        if isinstance(ex, sqlite3.IntegrityError):
             show_error("Ce nom d'utilisateur existe déjà")
-        except Exception as ex:
+        else:
             show_error(f"Erreur lors de la création: {str(ex)}")
     
     def delete_user(e, user_id, username):
@@ -158,23 +135,14 @@ def create_user_management_view(page: ft.Page):
             return
         
         def confirm_delete(e):
+            dialog.open = False
+            page.update()
             if e.control.text == "Oui":
-                try:
-                    conn = sqlite3.connect('pesees.db')
-                    c = conn.cursor()
-                    c.execute('DELETE FROM users WHERE id = ?', (user_id,))
-                    conn.commit()
-                    conn.close()
-                    
-                    dialog.open = False
-                    show_success(f"Utilisateur '{username}' supprimé!")
-                    load_users()
-                    
-                except Exception as ex:
-                    show_error(f"Erreur lors de la suppression: {str(ex)}")
-            else:
-                dialog.open = False
-                page.update()
+                user_actions.run(
+                    lambda: users_repo.delete(user_id),
+                    lambda _: on_user_deleted(username),
+                    lambda ex: show_error(f"Erreur lors de la suppression: {str(ex)}")
+                )
 
         dialog = ft.AlertDialog(
             modal=True,
@@ -189,6 +157,102 @@ def create_user_management_view(page: ft.Page):
         dialog.open = True
         page.update()
     
+    # Import en masse CSV / XLSX
+    import_table_dropdown = ft.Dropdown(
+        label="Données",
+        width=220,
+        options=[
+            ft.dropdown.Option("pesees", "Pesées"),
+            ft.dropdown.Option("controle_reception", "Contrôles de réception"),
+            ft.dropdown.Option("sheet", "Sheets")
+        ],
+        value="pesees"
+    )
+    import_status = ft.Text()
+    import_errors = ft.Column(spacing=2)
+    # Lecture du fichier et écritures sur le pool de threads
+    import_progress = ft.ProgressBar(width=400, visible=False)
+    import_task = BackgroundTask(page, import_progress)
+    
+    def run_import(path, uploaded=False):
+        table = import_table_dropdown.value
+        username = current_username(page, "import")
+        import_errors.controls.clear()
+        import_status.value = "Import en cours..."
+        page.update()
+        
+        def on_progress(lines):
+            import_status.value = f"Import en cours... {lines} ligne(s) lue(s)"
+            import_status.update()
+        
+        def work():
+            try:
+                return import_file(table, path, username, on_progress=on_progress)
+            finally:
+                if uploaded and os.path.exists(path):
+                    os.remove(path)
+        
+        import_task.run(work, show_report, on_import_error)
+    
+    def show_report(report):
+        try:
+            import_status.value = report.summary()
+            import_errors.controls = [
+                ft.Text(f"Ligne {line}: {message}", size=12, color=ft.Colors.RED)
+                for line, message in report.errors[:50]
+            ]
+            if len(report.errors) > 50:
+                import_errors.controls.append(
+                    ft.Text(f"... {report.rejected - 50} autre(s) erreur(s)", size=12)
+                )
+            show_success(report.summary())
+        except Exception as ex:
+            on_import_error(ex)
+    
+    def on_import_error(ex):
+        print(f"Erreur lors de l'import: {ex}")
+        import_status.value = ""
+        show_error(f"Erreur lors de l'import: {str(ex)}")
+    
+    # Nom du fichier choisi -> nom unique sous lequel il est envoyé dans
+    # UPLOAD_DIR (deux envois du même nom ne s'écrasent pas)
+    upload_names = {}
+    
+    def on_file_picked(e: ft.FilePickerResultEvent):
+        if not e.files:
+            return
+        picked = e.files[0]
+        if picked.path:
+            # Application desktop: le fichier est lu directement
+            run_import(picked.path)
+        else:
+            # Navigateur: envoyer d'abord le fichier dans UPLOAD_DIR
+            import_status.value = f"Envoi de {picked.name}..."
+            page.update()
+            upload_name = f"{uuid.uuid4().hex[:12]}_{os.path.basename(picked.name)}"
+            upload_names[picked.name] = upload_name
+            file_picker.upload([
+                ft.FilePickerUploadFile(picked.name, upload_url=page.get_upload_url(upload_name, 600))
+            ])
+    
+    def on_file_uploaded(e: ft.FilePickerUploadEvent):
+        upload_name = upload_names.get(e.file_name)
+        if upload_name is None:
+            return
+        path = os.path.join(UPLOAD_DIR, upload_name)
+        if e.error:
+            upload_names.pop(e.file_name, None)
+            if os.path.exists(path):
+                os.remove(path)
+            show_error(f"Erreur lors de l'envoi: {e.error}")
+        elif e.progress == 1:
+            upload_names.pop(e.file_name, None)
+            # Le fichier envoyé est supprimé après import_file (voir run_import)
+            run_import(path, uploaded=True)
+    
+    file_picker = ft.FilePicker(on_result=on_file_picked, on_upload=on_file_uploaded)
+    page.overlay.append(file_picker)
+    
     def show_error(message):
         page.snack_bar = ft.SnackBar(
             content=ft.Text(message),
@@ -197,6 +261,10 @@ def create_user_management_view(page: ft.Page):
         page.snack_bar.open = True
         page.update()
     
+    def on_user_deleted(username):
+        show_success(f"Utilisateur '{username}' supprimé!")
+        load_users()
+    
     def show_success(message):
         page.snack_bar = ft.SnackBar(
             content=ft.Text(message),
@@ -255,6 +323,33 @@ def create_user_management_view(page: ft.Page):
                         margin=ft.margin.only(bottom=30)
                     ),
                     
+                    # Import en masse
+                    ft.Container(
+                        content=ft.Column([
+                            ft.Text("Importer des données (CSV / XLSX)", size=18, weight=ft.FontWeight.BOLD),
+                            ft.Row([
+                                import_table_dropdown,
+                                ft.ElevatedButton(
+                                    "Choisir un fichier",
+                                    icon=ft.Icons.UPLOAD_FILE,
+                                    on_click=lambda _: file_picker.pick_files(
+                                        allow_multiple=False,
+                                        allowed_extensions=["csv", "xlsx"]
+                                    ),
+                                    height=40
+                                )
+                            ], spacing=15),
+                            import_progress,
+                            import_status,
+                            import_errors
+                        ]),
+                        padding=20,
+                        bgcolor=ft.Colors.ORANGE_50,
+                        border_radius=10,
+                        border=ft.border.all(1, ft.Colors.ORANGE_200),
+                        margin=ft.margin.only(bottom=30)
+                    ),
+                    
                     # Liste des utilisateurs
                     ft.Container(
                         content=ft.Column([
@@ -266,6 +361,7 @@ def create_user_management_view(page: ft.Page):
                                     on_click=lambda _: load_users()
                                 )
                             ], alignment=ft.MainAxisAlignment.SPACE_BETWEEN),
+                            users_progress,
                             ft.Row([users_table], scroll=ft.ScrollMode.AUTO, expand=True)
                         ]),
                         padding=20,
@@ -299,49 +395,46 @@ def create_user_management_view(page: ft.Page):
     )
 
 def create_login_view(page: ft.Page):
+    # Vérification des identifiants sur le pool de threads
+    login_progress = ft.ProgressBar(width=400, visible=False)
+    login_task = BackgroundTask(page, login_progress)
+
     def handle_login(e):
         if not username_field.value or not password_field.value:
             show_error("Veuillez remplir tous les champs")
             return
 
-        try:
-            conn = sqlite3.connect('pesees.db')
-            c = conn.cursor()
-            
-            # Hash the password
-            hashed_password = hash_password(password_field.value)
-            
-            # Get user with role
-            result = c.execute('''
+        # Hash the password
+        username = username_field.value
+        hashed_password = hash_password(password_field.value)
+        
+        # Get user with role
+        login_task.run(
+            lambda: users_repo.authenticate(username, hashed_password),
+            on_authenticated,
+            on_login_error
+        )
 
-                SELECT username, role 
-                FROM users 
-                WHERE username = ? AND password = ?
-            ''', (username_field.value, hashed_password)).fetchone()
-            
-            conn.close()
+    def on_authenticated(result):
+        if result:
+            _, username, role = result
+            # Session serveur: utilisateur et rôle
+            login(page, username, role)
             
-            if result:
-                username, role = result
-                # Store in client_storage
-                page.client_storage.set("authenticated", "true")
-                page.client_storage.set("username", username)
-                page.client_storage.set("user_role", role)  # Store the role
-                
-                # Show success message
-                page.snack_bar = ft.SnackBar(
-                    content=ft.Text(f"Bienvenue {username}!"),
-                    bgcolor=ft.Colors.GREEN
-                )
-                page.snack_bar.open = True
-                page.update()
-                page.go("/home")
-            else:
-                show_error("Nom d'utilisateur ou mot de passe incorrect")
-                
-        except Exception as ex:
-            print(f"Login error: {ex}")
-            show_error("Erreur lors de la connexion")
+            # Show success message
+            page.snack_bar = ft.SnackBar(
+                content=ft.Text(f"Bienvenue {username}!"),
+                bgcolor=ft.Colors.GREEN
+            )
+            page.snack_bar.open = True
+            page.update()
+            page.go("/home")
+        else:
+            show_error("Nom d'utilisateur ou mot de passe incorrect")
+
+    def on_login_error(ex):
+        print(f"Login error: {ex}")
+        show_error("Erreur lors de la connexion")
     
     # Champ de nom d'utilisateur
     username_field = ft.TextField(
@@ -395,7 +488,8 @@ def create_login_view(page: ft.Page):
                                     ),
                                     height=40
                                 )
-                            ], alignment=ft.MainAxisAlignment.START, spacing=15)
+                            ], alignment=ft.MainAxisAlignment.START, spacing=15),
+                            login_progress
                         ]),
                         padding=20,
                         bgcolor=ft.Colors.BLUE_50,
@@ -1,24 +1,9 @@
 import flet as ft
 import sqlite3
 import hashlib
-
-def create_auth_database():
-    """Créer la base de données pour l'authentification"""
-    conn = sqlite3.connect('pesees.db')
-    c = conn.cursor()
-    c.execute('''CREATE TABLE IF NOT EXISTS users
-                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                  username TEXT UNIQUE NOT NULL,
-                  password TEXT NOT NULL,
-                  created_at TEXT DEFAULT CURRENT_TIMESTAMP)''')
-    
-    # Créer un utilisateur par défaut (admin/admin)
-    default_password = hashlib.sha256("admin".encode()).hexdigest()
-    c.execute('''INSERT OR IGNORE INTO users (username, password) 
-                 VALUES (?, ?)''', ("admin", default_password))
-    
-    conn.commit()
-    conn.close()
+from background import BackgroundTask
+from database import users_repo
+from sessions import login
 
 def hash_password(password):
     """Hasher le mot de passe"""
@@ -26,17 +11,9 @@ def hash_password(password):
 
 def verify_user(username, password):
     """Vérifier les identifiants utilisateur"""
-    conn = sqlite3.connect('pesees.db')
-    c = conn.cursor()
-    
     hashed_password = hash_password(password)
     # Modifié pour retourner plus d'informations sur l'utilisateur
-    result = c.execute('''SELECT id, username, role 
-                         FROM users 
-                         WHERE username = ? AND password = ?''', 
-                      (username, hashed_password)).fetchone()
-    
-    conn.close()
+    result = users_repo.authenticate(username, hashed_password)
     
     if result:
         return {
@@ -72,47 +49,45 @@ def create_login_view(page: ft.Page):
         value=False
     )
     
+    # Vérification des identifiants sur le pool de threads
+    login_progress = ft.ProgressBar(width=300, visible=False)
+    login_task = BackgroundTask(page, login_progress)
+
     def handle_login(e):
         if not username_field.value or not password_field.value:
             show_error("Veuillez saisir votre nom d'utilisateur et mot de passe")
             return
         
-        try:
-            conn = sqlite3.connect('pesees.db')
-            c = conn.cursor()
-            
-            # Hash the password
-            hashed_password = hash_password(password_field.value)
-            
-            # Get user with role
-            result = c.execute('''
-                SELECT username, role 
-                FROM users 
-                WHERE username = ? AND password = ?
-            ''', (username_field.value, hashed_password)).fetchone()
-            
-            conn.close()
+        # Hash the password
+        username = username_field.value
+        hashed_password = hash_password(password_field.value)
+        
+        # Get user with role
+        login_task.run(
+            lambda: users_repo.authenticate(username, hashed_password),
+            on_authenticated,
+            on_login_error
+        )
+
+    def on_authenticated(result):
+        if result:
+            _, username, role = result
+            # Session serveur: utilisateur et rôle
+            login(page, username, role)
             
-            if result:
-                username, role = result
-                # Store in client_storage instead of session
-                page.client_storage.set("authenticated", "true")
-                page.client_storage.set("username", username)
-                page.client_storage.set("user_role", role)
-                
-                # Show success message
-                page.snack_bar = ft.SnackBar(
-                    content=ft.Text(f"Bienvenue {username}!"),
-                    bgcolor=ft.Colors.GREEN
-                )
-                page.snack_bar.open = True
-                page.go("/home")
-            else:
-                show_error("Nom d'utilisateur ou mot de passe incorrect")
-                
-        except Exception as ex:
-            print(f"Login error: {ex}")
-            show_error("Erreur lors de la connexion")
+            # Show success message
+            page.snack_bar = ft.SnackBar(
+                content=ft.Text(f"Bienvenue {username}!"),
+                bgcolor=ft.Colors.GREEN
+            )
+            page.snack_bar.open = True
+            page.go("/home")
+        else:
+            show_error("Nom d'utilisateur ou mot de passe incorrect")
+
+    def on_login_error(ex):
+        print(f"Login error: {ex}")
+        show_error("Erreur lors de la connexion")
     
     def show_error(message):
         page.snack_bar = ft.SnackBar(
@@ -174,6 +149,7 @@ def create_login_view(page: ft.Page):
                                 username_field,
                                 password_field,
                                 remember_checkbox,
+                                login_progress,
                                 
                                 # Bouton de connexion
                                 ft.ElevatedButton(
@@ -276,6 +252,10 @@ def create_register_view(page: ft.Page):
         border_radius=10
     )
     
+    # Création du compte sur le pool de threads
+    register_progress = ft.ProgressBar(width=300, visible=False)
+    register_task = BackgroundTask(page, register_progress)
+    
     def handle_register(e):
         if not all([username_field.value, password_field.value, confirm_password_field.value]):
             show_error("Veuillez remplir tous les champs")
@@ -289,27 +269,26 @@ def create_register_view(page: ft.Page):
             show_error("Le mot de passe doit contenir au moins 4 caractères")
             return
         
-        try:
-            conn = sqlite3.connect('pesees.db')
-            c = conn.cursor()
-            
-            hashed_password = hash_password(password_field.value)
-            c.execute('INSERT INTO users (username, password) VALUES (?, ?)',
-                     (username_field.value, hashed_password))
-            
-            conn.commit()
-            conn.close()
-            
-            page.snack_bar = ft.SnackBar(
-                content=ft.Text("Compte créé avec succès!"),
-                bgcolor=ft.Colors.GREEN
-            )
-            page.snack_bar.open = True
-            page.go("/login")
-            
-        except sqlite3.IntegrityError:
+        username = username_field.value
+        hashed_password = hash_password(password_field.value)
+        register_task.run(
+            lambda: users_repo.create(username, hashed_password),
+            on_registered,
+            on_register_error
+        )
+    
+    def on_registered(_):
+        page.snack_bar = ft.SnackBar(
+            content=ft.Text("Compte créé avec succès!"),
+            bgcolor=ft.Colors.GREEN
+        )
+        page.snack_bar.open = True
+        page.go("/login")
+    
+    def on_register_error(ex):
+        if isinstance(ex, sqlite3.IntegrityError):
             show_error("Ce nom d'utilisateur existe déjà")
-        except Exception as ex:
+        else:
             show_error(f"Erreur lors de la création du compte: {str(ex)}")
     
     def show_error(message):
@@ -355,6 +334,7 @@ def create_register_view(page: ft.Page):
                                 username_field,
                                 password_field,
                                 confirm_password_field,
+                                register_progress,
                                 
                                 # Bouton d'inscription
                                 ft.ElevatedButton(
@@ -0,0 +1,105 @@
+"""Exécution des requêtes hors des gestionnaires d'événements Flet.
+
+Les requêtes tournent sur un pool borné de threads (DB_WORKERS) partagé par
+toutes les sessions; le gestionnaire rend la main aussitôt, un indicateur de
+progression est affiché, et le résultat est appliqué à la vue à son arrivée.
+Si une nouvelle demande remplace la précédente (nouvelle recherche, page
+suivante...), le résultat de l'ancienne est ignoré.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from database import POOL_SIZE
+
+# Nombre de requêtes exécutées en parallèle: moins que le pool SQLite, pour
+# laisser une connexion à l'écrivain groupé et une aux autres lectures
+DB_WORKERS = POOL_SIZE - 2
+
+executor = ThreadPoolExecutor(max_workers=DB_WORKERS, thread_name_prefix="db-worker")
+
+
+class BackgroundTask:
+    """Demandes successives d'une même vue; seule la dernière est appliquée.
+
+    indicator: contrôle (ProgressBar, ProgressRing...) visible pendant
+    l'exécution, ou None.
+    """
+
+    def __init__(self, page, indicator=None):
+        self.page = page
+        self.indicator = indicator
+        self._lock = threading.Lock()
+        self._generation = 0
+
+    def _set_busy(self, busy):
+        if self.indicator is not None:
+            self.indicator.visible = busy
+            if self.indicator.page:
+                self.indicator.update()
+
+    def run(self, work, on_result, on_error=None):
+        """Exécuter work() sur le pool puis on_result(résultat) dans le thread
+        du pool; on_error(exception) si work échoue. Retourne le Future."""
+        with self._lock:
+            self._generation += 1
+            generation = self._generation
+        self._set_busy(True)
+
+        def done(future):
+            with self._lock:
+                if generation != self._generation:
+                    # Demande remplacée entre-temps: résultat périmé
+                    return
+            try:
+                try:
+                    result = future.result()
+                except Exception as ex:
+                    if on_error:
+                        on_error(ex)
+                    else:
+                        print(f"Background task error: {ex}")
+                    return
+                on_result(result)
+            except Exception as ex:
+                print(f"Background result error: {ex}")
+            finally:
+                with self._lock:
+                    latest = generation == self._generation
+                if latest:
+                    self._set_busy(False)
+
+        future = executor.submit(work)
+        future.add_done_callback(done)
+        return future
+
+    def cancel(self):
+        """Ignorer le résultat de la demande en cours"""
+        with self._lock:
+            self._generation += 1
+        self._set_busy(False)
+
+
+class KeyedBackgroundTasks:
+    """Demandes indépendantes par clé (id d'enregistrement...): pour une même
+    clé seule la dernière est appliquée, des clés différentes ne s'annulent
+    pas (modifications publiées pour plusieurs enregistrements)."""
+
+    def __init__(self, page):
+        self.page = page
+        self._lock = threading.Lock()
+        self._tasks = {}
+
+    def run(self, key, work, on_result, on_error=None):
+        with self._lock:
+            task = self._tasks.get(key)
+            if task is None:
+                task = self._tasks[key] = BackgroundTask(self.page)
+        return task.run(work, on_result, on_error)
+
+    def cancel(self):
+        """Ignorer les résultats de toutes les demandes en cours"""
+        with self._lock:
+            tasks = list(self._tasks.values())
+            self._tasks.clear()
+        for task in tasks:
+            task.cancel()
@@ -0,0 +1,94 @@
+"""Temps de démarrage: import de main avec chargement paresseux des vues.
+
+Chaque mesure est faite dans un interpréteur neuf (aucun module en cache):
+- « main »: ce que coûte le démarrage (écran de connexion compris);
+- « toutes les vues »: main puis tous les modules de VIEW_MODULES, soit le
+  coût des imports faits d'avance avant le chargement paresseux.
+
+    python benchmarks/bench_startup.py [--runs 15] [--importtime 10]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCENARIOS = {
+    "main": "import main",
+    "main + écran de connexion": "import main; main.view_factory('create_login_view')",
+    "toutes les vues": (
+        "import importlib, main\n"
+        "for module in set(main.VIEW_MODULES.values()):\n"
+        "    importlib.import_module(module)"
+    ),
+}
+
+# Mesure l'import dans le processus fils, hors démarrage de l'interpréteur
+TIMER = '''import time
+start = time.perf_counter()
+{code}
+print(time.perf_counter() - start)
+'''
+
+
+def run(code, env, extra_args=()):
+    result = subprocess.run(
+        [sys.executable, *extra_args, "-c", TIMER.format(code=code)],
+        cwd=ROOT, env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    return result
+
+
+def measure(code, runs, env):
+    return [float(run(code, env).stdout.split()[-1]) * 1000 for _ in range(runs)]
+
+
+def slowest_imports(code, count, env):
+    """Modules les plus coûteux (temps cumulé) d'après python -X importtime"""
+    rows = []
+    for line in run(code, env, ("-X", "importtime")).stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative), name.strip()))
+    rows.sort(reverse=True)
+    return rows[:count]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=15)
+    parser.add_argument("--importtime", type=int, default=10,
+                        help="nombre de modules les plus lents affichés (0: aucun)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Base jetable: l'import ne doit pas toucher la base de production
+        env = dict(os.environ, PESEES_DB=os.path.join(tmp, "bench.db"))
+
+        print(f"Import dans un interpréteur neuf, {args.runs} mesures")
+        for label, code in SCENARIOS.items():
+            try:
+                timings = measure(code, args.runs, env)
+            except RuntimeError as ex:
+                print(f"  {label:<28} échec: {ex}")
+                continue
+            print(f"  {label:<28} médiane {statistics.median(timings):7.1f} ms"
+                  f"   min {min(timings):7.1f} ms")
+
+        if args.importtime:
+            print("\nModules les plus coûteux au démarrage (python -X importtime)")
+            try:
+                for cumulative, name in slowest_imports("import main", args.importtime, env):
+                    print(f"  {cumulative / 1000:7.1f} ms  {name}")
+            except RuntimeError as ex:
+                print(f"  échec: {ex}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""Latence de lecture pendant des écritures concurrentes: rollback journal vs WAL.
+
+Simule les sessions de consultation (load_data) pendant qu'un opérateur
+enchaîne les sauvegardes (save_record), sur une base temporaire.
+
+    python benchmarks/bench_wal.py [--rows 20000] [--seconds 5] [--readers 8]
+"""
+import argparse
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database  # noqa: E402
+import migrations  # noqa: E402
+from database import ConnectionPool, PeseesRepository  # noqa: E402
+
+
+def make_record(i):
+    return {
+        "date": f"2024-{i % 12 + 1:02d}-{i % 28 + 1:02d}",
+        "produit": f"produit-{i % 50}",
+        "n_lot": f"LOT{i:06d}",
+        "nb_caisses_pesees": 20,
+        "nb_caisses_conformes": 19,
+        "nb_caisses_non_conformes": 1,
+        "anomalie_observee": "",
+        "created_by": "bench",
+    }
+
+
+def create_schema(path):
+    """Schéma réel de l'application: migrations appliquées sur la base du banc
+    (les migrations utilisent le pool des modules)"""
+    bench_pool = ConnectionPool(path=path, size=1)
+    saved = database.pool, migrations.pool
+    database.pool = migrations.pool = bench_pool
+    try:
+        migrations.migrate()
+    finally:
+        database.pool, migrations.pool = saved
+        bench_pool.close_all()
+
+
+def prepare(path, journal_mode, rows):
+    conn = sqlite3.connect(path)
+    conn.execute(f'PRAGMA journal_mode = {journal_mode}')
+    conn.close()
+    create_schema(path)
+    conn = sqlite3.connect(path)
+    columns = PeseesRepository.COLUMNS
+    conn.executemany(
+        f'INSERT INTO pesees ({", ".join(columns)}) VALUES ({", ".join("?" * len(columns))})',
+        ([make_record(i).get(col) for col in columns] for i in range(rows))
+    )
+    conn.commit()
+    conn.close()
+
+
+def run(journal_mode, rows, seconds, readers):
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    os.remove(path)
+    try:
+        prepare(path, journal_mode, rows)
+        repo = PeseesRepository(ConnectionPool(path=path, size=readers + 1))
+        stop = threading.Event()
+        latencies = []
+        errors = []
+        writes = [0]
+        lock = threading.Lock()
+
+        def writer():
+            i = rows
+            while not stop.is_set():
+                try:
+                    repo.insert(make_record(i))
+                    writes[0] += 1
+                except sqlite3.OperationalError as e:
+                    errors.append(str(e))
+                i += 1
+
+        def reader():
+            while not stop.is_set():
+                start = time.perf_counter()
+                try:
+                    repo.list_summary()
+                except sqlite3.OperationalError as e:
+                    errors.append(str(e))
+                    continue
+                with lock:
+                    latencies.append((time.perf_counter() - start) * 1000)
+
+        threads = [threading.Thread(target=writer)]
+        threads += [threading.Thread(target=reader) for _ in range(readers)]
+        for t in threads:
+            t.start()
+        time.sleep(seconds)
+        stop.set()
+        for t in threads:
+            t.join()
+        repo.pool.close_all()
+
+        latencies.sort()
+        return {
+            "reads": len(latencies),
+            "writes": writes[0],
+            "p50": statistics.median(latencies) if latencies else float("nan"),
+            "p95": latencies[int(len(latencies) * 0.95)] if latencies else float("nan"),
+            "max": latencies[-1] if latencies else float("nan"),
+            "errors": len(errors),
+        }
+    finally:
+        for suffix in ("", "-wal", "-shm", "-journal"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--readers", type=int, default=8)
+    args = parser.parse_args()
+
+    print(f"{args.rows} pesées, {args.readers} lecteurs, 1 écrivain, {args.seconds}s par mode")
+    print(f"{'mode':<8}{'lectures':>10}{'écritures':>11}{'p50 ms':>9}{'p95 ms':>9}{'max ms':>9}{'erreurs':>9}")
+    for mode in ("DELETE", "WAL"):
+        r = run(mode, args.rows, args.seconds, args.readers)
+        print(f"{mode:<8}{r['reads']:>10}{r['writes']:>11}{r['p50']:>9.2f}"
+              f"{r['p95']:>9.2f}{r['max']:>9.2f}{r['errors']:>9}")
+
+
+if __name__ == "__main__":
+    main()
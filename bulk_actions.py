@@ -0,0 +1,193 @@
+"""Sélection multiple et actions groupées des vues de consultation.
+
+Les enregistrements cochés sont supprimés ou modifiés en une seule requête
+(repo.delete_many / repo.update_many, une transaction). La vue reçoit ensuite
+une seule notification (table, op, tuple d'ids) et met à jour toutes les
+lignes concernées en une fois. Les requêtes tournent sur le pool de
+threads (BackgroundTask), jamais dans le gestionnaire d'événement.
+"""
+import flet as ft
+from background import BackgroundTask
+from importer import validate_value
+
+
+class BulkSelection:
+    """Ids cochés d'une vue, et barre d'actions affichée dès qu'il y en a un.
+
+    fields: {colonne: libellé} des champs modifiables en groupe; la valeur
+    saisie est validée comme une cellule importée (importer.validate_value).
+    on_deleted(ids) retire les lignes supprimées de la vue.
+    """
+
+    def __init__(self, page: ft.Page, repo, fields, on_deleted=None):
+        self.page = page
+        self.repo = repo
+        self.fields = fields
+        self.on_deleted = on_deleted
+        self.ids = set()
+        # Contrôles cochables par id (DataRow ou Checkbox), pour tout décocher
+        self._controls = {}
+        self.count_text = ft.Text(weight=ft.FontWeight.BOLD)
+        self.progress = ft.ProgressRing(width=16, height=16, stroke_width=2, visible=False)
+        self.task = BackgroundTask(page, self.progress)
+        self.bar = ft.Container(
+            content=ft.Row(
+                [
+                    self.count_text,
+                    self.progress,
+                    ft.TextButton("Modifier", icon=ft.Icons.EDIT, on_click=self.open_edit),
+                    ft.TextButton(
+                        "Supprimer",
+                        icon=ft.Icons.DELETE,
+                        icon_color=ft.Colors.RED,
+                        on_click=self.confirm_delete
+                    ),
+                    ft.TextButton("Annuler", on_click=lambda _: self.clear()),
+                ],
+                wrap=True
+            ),
+            bgcolor=ft.Colors.BLUE_50,
+            border_radius=8,
+            padding=ft.padding.symmetric(horizontal=10, vertical=5),
+            visible=False
+        )
+
+    def _refresh(self):
+        self.count_text.value = f"{len(self.ids)} sélectionné(s)"
+        self.bar.visible = bool(self.ids)
+        if self.bar.page:
+            self.bar.update()
+
+    def toggle(self, record_id, selected):
+        if selected:
+            self.ids.add(record_id)
+        else:
+            self.ids.discard(record_id)
+        self._refresh()
+
+    def bind_row(self, row: ft.DataRow, record_id):
+        """Rendre une ligne de DataTable cochable (colonne de cases à cocher)"""
+        row.selected = record_id in self.ids
+        self._controls[record_id] = row
+
+        def on_select_changed(e):
+            row.selected = e.data == "true"
+            row.update()
+            self.toggle(record_id, row.selected)
+
+        row.on_select_changed = on_select_changed
+        return row
+
+    def checkbox(self, record_id):
+        """Case à cocher d'une carte (affichage mobile)"""
+        control = ft.Checkbox(
+            value=record_id in self.ids,
+            on_change=lambda e: self.toggle(record_id, e.control.value)
+        )
+        self._controls[record_id] = control
+        return control
+
+    def reset(self):
+        """Oublier la sélection (rechargement de la liste affichée)"""
+        self.ids.clear()
+        self._controls.clear()
+        self._refresh()
+
+    def clear(self):
+        """Décocher tout ce qui est affiché"""
+        for control in self._controls.values():
+            if isinstance(control, ft.DataRow):
+                control.selected = False
+            else:
+                control.value = False
+        self.ids.clear()
+        self._refresh()
+        self.page.update()
+
+    def _show_message(self, message, color):
+        self.page.snack_bar = ft.SnackBar(content=ft.Text(message), bgcolor=color)
+        self.page.snack_bar.open = True
+        self.page.update()
+
+    def confirm_delete(self, e):
+        ids = tuple(self.ids)
+
+        def on_answer(e):
+            dialog.open = False
+            self.page.update()
+            if e.control.text != "Oui":
+                return
+            self.task.run(lambda: self.repo.delete_many(ids), on_deleted, on_error)
+
+        def on_deleted(count):
+            self.reset()
+            if self.on_deleted:
+                self.on_deleted(ids)
+            self._show_message(f"{count} enregistrement(s) supprimé(s)!", ft.Colors.GREEN)
+
+        def on_error(ex):
+            print(f"Error deleting selection: {ex}")
+            self._show_message(f"Erreur lors de la suppression: {str(ex)}", ft.Colors.RED)
+
+        dialog = ft.AlertDialog(
+            modal=True,
+            title=ft.Text("Confirmation"),
+            content=ft.Text(f"Voulez-vous vraiment supprimer {len(ids)} enregistrement(s)?"),
+            actions=[
+                ft.TextButton("Oui", on_click=on_answer),
+                ft.TextButton("Non", on_click=on_answer),
+            ],
+        )
+        self.page.dialog = dialog
+        dialog.open = True
+        self.page.update()
+
+    def open_edit(self, e):
+        ids = tuple(self.ids)
+        field_dropdown = ft.Dropdown(
+            label="Champ",
+            options=[ft.dropdown.Option(key=col, text=label) for col, label in self.fields.items()],
+            value=next(iter(self.fields)),
+            width=300
+        )
+        value_field = ft.TextField(label="Nouvelle valeur", width=300)
+
+        def apply_edit(e):
+            if field_dropdown.value not in self.fields:
+                return
+            try:
+                value = validate_value(self.repo.TABLE, field_dropdown.value, value_field.value)
+            except ValueError as ex:
+                value_field.error_text = str(ex)
+                value_field.update()
+                return
+            values = {field_dropdown.value: value}
+            dialog.open = False
+            self.page.update()
+            # La vue relit les lignes modifiées à la notification (UPDATE, ids)
+            self.task.run(lambda: self.repo.update_many(ids, values), on_updated, on_error)
+
+        def on_updated(count):
+            self.reset()
+            self._show_message(f"{count} enregistrement(s) modifié(s)!", ft.Colors.GREEN)
+
+        def on_error(ex):
+            print(f"Error updating selection: {ex}")
+            self._show_message(f"Erreur lors de la modification: {str(ex)}", ft.Colors.RED)
+
+        def cancel(e):
+            dialog.open = False
+            self.page.update()
+
+        dialog = ft.AlertDialog(
+            modal=True,
+            title=ft.Text(f"Modifier {len(ids)} enregistrement(s)"),
+            content=ft.Column([field_dropdown, value_field], tight=True),
+            actions=[
+                ft.TextButton("Appliquer", on_click=apply_edit),
+                ft.TextButton("Annuler", on_click=cancel),
+            ],
+        )
+        self.page.dialog = dialog
+        dialog.open = True
+        self.page.update()
@@ -0,0 +1,82 @@
+"""Bus de notifications des modifications de données.
+
+Chaque écriture de la couche d'accès aux données publie (table, op, id) avec
+op parmi "insert", "update", "delete". id est un tuple d'ids pour une action
+groupée, et None pour un import (rechargement complet):
+- aux écouteurs du processus (caches serveur), appelés immédiatement;
+- à toutes les sessions Flet via page.pubsub, sur le sujet TOPIC, pour que
+  les vues de consultation ouvertes appliquent le changement sans recharger.
+"""
+import threading
+
+TOPIC = "db_changes"
+
+INSERT = "insert"
+UPDATE = "update"
+DELETE = "delete"
+
+_lock = threading.Lock()
+_listeners = []
+# Client pubsub d'une session; le hub derrière est commun à toute l'application
+_pubsub = None
+
+
+def bind_pubsub(pubsub):
+    """Enregistrer le pubsub Flet utilisé pour diffuser les changements"""
+    global _pubsub
+    with _lock:
+        if _pubsub is None:
+            _pubsub = pubsub
+
+
+def add_listener(listener):
+    """Abonner une fonction listener(table, op, record_id) dans le processus"""
+    with _lock:
+        _listeners.append(listener)
+
+
+def remove_listener(listener):
+    with _lock:
+        if listener in _listeners:
+            _listeners.remove(listener)
+
+
+def publish(table, op, record_id=None):
+    """Notifier une modification (appelé après le commit)"""
+    with _lock:
+        listeners = list(_listeners)
+        pubsub = _pubsub
+    for listener in listeners:
+        try:
+            listener(table, op, record_id)
+        except Exception as e:
+            print(f"Change listener error: {e}")
+    if pubsub is not None:
+        try:
+            pubsub.send_all_on_topic(TOPIC, (table, op, record_id))
+        except Exception as e:
+            print(f"Change broadcast error: {e}")
+
+
+def watch(page, handler):
+    """Abonner la vue courante d'une session aux changements.
+
+    handler(table, op, record_id) remplace celui de la vue précédente de la
+    même session: les vues étant reconstruites à chaque changement de route,
+    seule la vue affichée reçoit les notifications.
+    """
+    bind_pubsub(page.pubsub)
+    page.pubsub.unsubscribe_topic(TOPIC)
+
+    def on_message(topic, message):
+        try:
+            handler(*message)
+        except Exception as e:
+            print(f"Change handler error: {e}")
+
+    page.pubsub.subscribe_topic(TOPIC, on_message)
+
+
+def unwatch(page):
+    """Désabonner la vue courante de la session (changement de route)"""
+    page.pubsub.unsubscribe_topic(TOPIC)
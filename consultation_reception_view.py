@@ -1,11 +1,33 @@
 import flet as ft
-import sqlite3
+from background import BackgroundTask, KeyedBackgroundTasks
+from bulk_actions import BulkSelection
+from changes import DELETE, watch
+from database import reception_repo
+from exporter import create_export_button
+from responsive import ResponsiveLayout
+
+def sort_key(data):
+    """Clé (recu_ts, id) décroissante, les horodatages illisibles en dernier"""
+    recu_ts, record_id = data
+    return (recu_ts is not None, recu_ts or 0, record_id)
+
+# Champs modifiables en groupe depuis la sélection multiple (pas le numéro
+# de lot, propre à chaque enregistrement)
+BULK_FIELDS = {
+    "date": "Date",
+    "heure": "Heure",
+    "article": "Article",
+    "nature_article": "Nature",
+    "conformite": "Conformité",
+    "reference": "Référence",
+    "anomalie": "Anomalie",
+}
 
 def create_consultation_reception_view(page: ft.Page):
     try:
-        # Check if mobile view
-        def is_mobile():
-            return page.width < 850
+        # Cartes (mobile) ou tableau selon la largeur; franchir le seuil ne
+        # change que la présentation des lignes déjà lues
+        layout = ResponsiveLayout(page, lambda mobile: switch_presentation(mobile), breakpoint=850)
 
         def create_data_table():
             return ft.DataTable(
@@ -30,11 +52,12 @@ def create_consultation_reception_view(page: ft.Page):
                 heading_row_color=ft.Colors.BLUE_50,
                 data_row_max_height=100,
                 data_row_min_height=50,
-                show_checkbox_column=False,
+                show_checkbox_column=True,
             )
 
         def create_mobile_card(record):
             return ft.Card(
+                data=(record[12], record[0]),
                 content=ft.Container(
                     content=ft.Column([
                         ft.ListTile(
@@ -59,20 +82,23 @@ def create_consultation_reception_view(page: ft.Page):
                         ),
                         ft.Row(
                             [
-                                ft.IconButton(
-                                    icon=ft.Icons.EDIT,
-                                    icon_color=ft.Colors.BLUE,
-                                    tooltip="Modifier",
-                                    on_click=lambda e, id=record[0]: edit_record(e, id)
-                                ),
-                                ft.IconButton(
-                                    icon=ft.Icons.DELETE,
-                                    icon_color=ft.Colors.RED,
-                                    tooltip="Supprimer",
-                                    on_click=lambda e, id=record[0]: delete_record(e, id)
-                                )
+                                selection.checkbox(record[0]),
+                                ft.Row([
+                                    ft.IconButton(
+                                        icon=ft.Icons.EDIT,
+                                        icon_color=ft.Colors.BLUE,
+                                        tooltip="Modifier",
+                                        on_click=lambda e, id=record[0]: edit_record(e, id)
+                                    ),
+                                    ft.IconButton(
+                                        icon=ft.Icons.DELETE,
+                                        icon_color=ft.Colors.RED,
+                                        tooltip="Supprimer",
+                                        on_click=lambda e, id=record[0]: delete_record(e, id)
+                                    )
+                                ])
                             ],
-                            alignment=ft.MainAxisAlignment.END
+                            alignment=ft.MainAxisAlignment.SPACE_BETWEEN
                         )
                     ]),
                     padding=10
@@ -81,73 +107,198 @@ def create_consultation_reception_view(page: ft.Page):
                 margin=10
             )
 
-        # Create containers for both views
-        desktop_view = ft.Column(scroll=ft.ScrollMode.AUTO, expand=True)
-        mobile_view = ft.Column(scroll=ft.ScrollMode.AUTO, expand=True)
-        
-        consultation_table = create_data_table()
+        # Présentations (cartes ou tableau) créées à leur premier affichage
+        mobile_view = None
+        consultation_table = None
+        table_container = None
+        # Lignes lues par id, pour changer de présentation sans relire la table
+        row_data = {}
+        # Contrôle (carte ou ligne) affiché pour chaque id, pour retirer un
+        # enregistrement sans reconstruire toute la liste
+        row_controls = {}
+        # Cartes ou lignes cochées pour les actions groupées
+        selection = BulkSelection(page, reception_repo, BULK_FIELDS, lambda ids: remove_rows(ids))
+        # Requêtes exécutées sur le pool de threads, barre de progression pendant la lecture
+        progress_bar = ft.ProgressBar(visible=False, color=ft.Colors.BLUE)
+        load_task = BackgroundTask(page, progress_bar)
+        # Relecture des enregistrements modifiés, une demande par id
+        change_tasks = KeyedBackgroundTasks(page)
+        # Suppressions confirmées, exécutées sur le pool de threads
+        delete_tasks = KeyedBackgroundTasks(page)
+
+        def create_table_row(row):
+            return selection.bind_row(ft.DataRow(
+                data=(row[12], row[0]),
+                cells=[
+                    ft.DataCell(ft.Text(str(row[1]))),
+                    ft.DataCell(ft.Text(str(row[2]))),
+                    ft.DataCell(ft.Text(str(row[3]))),
+                    ft.DataCell(ft.Text(str(row[4]))),
+                    ft.DataCell(ft.Text(str(row[5]))),
+                    ft.DataCell(ft.Text(str(row[6]))),
+                    ft.DataCell(ft.Text(str(row[7]))),
+                    ft.DataCell(ft.Text(str(row[8]))),
+                    ft.DataCell(ft.Text(str(row[9]))),
+                    ft.DataCell(ft.Text(str(row[10]))),
+                    ft.DataCell(ft.Text(str(row[11]))),
+                    ft.DataCell(create_action_buttons(row[0]))
+                ]
+            ), row[0])
+
+        def presentation(mobile):
+            """Conteneur de la présentation demandée, créé au premier besoin"""
+            nonlocal mobile_view, consultation_table, table_container
+            if mobile:
+                if mobile_view is None:
+                    mobile_view = ft.Column(scroll=ft.ScrollMode.AUTO, expand=True)
+                return mobile_view
+            if table_container is None:
+                consultation_table = create_data_table()
+                table_container = ft.Container(
+                    content=consultation_table,
+                    border=ft.border.all(2, ft.Colors.BLUE_100),
+                    border_radius=10,
+                    padding=10,
+                    expand=True
+                )
+            return table_container
+
+        def displayed_controls():
+            """Liste (cartes ou lignes) remplie par le dernier load_data"""
+            return mobile_view.controls if shown_mobile else consultation_table.rows
+
+        def displayed_container():
+            return mobile_view if shown_mobile else consultation_table
+
+        def insert_row(row):
+            if row[0] in row_controls:
+                return
+            if not row_controls:
+                load_data()
+                return
+            controls = displayed_controls()
+            key = sort_key((row[12], row[0]))
+            position = sum(1 for control in controls if sort_key(control.data) > key)
+            control = create_mobile_card(row) if shown_mobile else create_table_row(row)
+            row_data[row[0]] = row
+            row_controls[row[0]] = control
+            controls.insert(position, control)
+            displayed_container().update()
+
+        def apply_change(table, op, record_id):
+            """Appliquer une modification publiée (par cette session ou une autre)"""
+            if table != "controle_reception":
+                return
+            if record_id is None:
+                # Écriture en masse (import): relire la liste
+                load_data()
+                return
+            if isinstance(record_id, tuple):
+                # Action groupée: une seule mise à jour de la liste
+                if op == DELETE:
+                    if any(rid in row_controls for rid in record_id):
+                        remove_rows(record_id)
+                else:
+                    load_data()
+                return
+            if op == DELETE:
+                if record_id in row_controls:
+                    remove_rows([record_id])
+                return
+            change_tasks.run(
+                record_id,
+                lambda: reception_repo.get_row(record_id),
+                lambda row: show_change(record_id, row),
+                lambda ex: print(f"Erreur lors de la mise à jour de la liste: {ex}")
+            )
+
+        def show_change(record_id, row):
+            control = row_controls.get(record_id)
+            if control is None:
+                if row is not None:
+                    insert_row(row)
+            elif row is None:
+                remove_rows([record_id])
+            elif control.data == (row[12], row[0]):
+                # Même position: seul le contenu est remplacé
+                row_data[record_id] = row
+                if shown_mobile:
+                    control.content = create_mobile_card(row).content
+                else:
+                    control.cells = create_table_row(row).cells
+                control.update()
+            else:
+                remove_rows([record_id])
+                insert_row(row)
+
+        def remove_rows(record_ids):
+            """Retirer les cartes ou lignes supprimées en une mise à jour;
+            rechargement seulement si la liste est vide"""
+            controls = [row_controls.pop(rid) for rid in record_ids if rid in row_controls]
+            for rid in record_ids:
+                row_data.pop(rid, None)
+            if not row_controls:
+                load_data()
+                return
+            displayed = displayed_controls()
+            for control in controls:
+                if control in displayed:
+                    displayed.remove(control)
+            displayed_container().update()
+
+        shown_mobile = layout.mobile
 
         def load_data():
-            try:
-                mobile = is_mobile()
-                if mobile:
-                    mobile_view.controls.clear()
+            # Lecture sur le pool de threads; une demande plus récente remplace celle-ci
+            change_tasks.cancel()
+            load_task.run(reception_repo.list, show_rows, lambda ex: show_rows(None, ex))
+
+        def fill_rows(rows):
+            """Remplir la présentation affichée avec les lignes (déjà triées)"""
+            row_controls.clear()
+            displayed = displayed_controls()
+            displayed.clear()
+            if not rows:
+                if shown_mobile:
+                    displayed.append(
+                        ft.Text("Aucune donnée disponible", 
+                              style=ft.TextThemeStyle.BODY_LARGE)
+                    )
                 else:
-                    consultation_table.rows.clear()
-
-                conn = sqlite3.connect('pesees.db')
-                c = conn.cursor()
-                rows = c.execute('''
-                    SELECT id, date, heure, article, nature_article, n_lot, 
-                           dlc, ddp, quantite_receptionnee, conformite, 
-                           reference, anomalie 
-                    FROM controle_reception 
-                    ORDER BY date DESC
-                ''').fetchall()
-
-                if not rows:
-                    if mobile:
-                        mobile_view.controls.append(
-                            ft.Text("Aucune donnée disponible", 
-                                  style=ft.TextThemeStyle.BODY_LARGE)
+                    displayed.append(
+                        ft.DataRow(
+                            cells=[ft.DataCell(ft.Text("Aucune donnée disponible"))] * 12
                         )
-                    else:
-                        consultation_table.rows.append(
-                            ft.DataRow(
-                                cells=[ft.DataCell(ft.Text("Aucune donnée disponible"))] * 12
-                            )
-                        )
-                else:
-                    if mobile:
-                        for row in rows:
-                            mobile_view.controls.append(create_mobile_card(row))
-                    else:
-                        for row in rows:
-                            consultation_table.rows.append(
-                                ft.DataRow(
-                                    cells=[
-                                        ft.DataCell(ft.Text(str(row[1]))),
-                                        ft.DataCell(ft.Text(str(row[2]))),
-                                        ft.DataCell(ft.Text(str(row[3]))),
-                                        ft.DataCell(ft.Text(str(row[4]))),
-                                        ft.DataCell(ft.Text(str(row[5]))),
-                                        ft.DataCell(ft.Text(str(row[6]))),
-                                        ft.DataCell(ft.Text(str(row[7]))),
-                                        ft.DataCell(ft.Text(str(row[8]))),
-                                        ft.DataCell(ft.Text(str(row[9]))),
-                                        ft.DataCell(ft.Text(str(row[10]))),
-                                        ft.DataCell(ft.Text(str(row[11]))),
-                                        ft.DataCell(create_action_buttons(row[0]))
-                                    ]
-                                )
-                            )
+                    )
+                return
+            for row in rows:
+                row_controls[row[0]] = create_mobile_card(row) if shown_mobile else create_table_row(row)
+            displayed.extend(row_controls.values())
+
+        def show_rows(rows, error=None):
+            if error is not None:
+                print(f"Error loading data: {error}")
+                rows = []
+            try:
+                selection.reset()
+                row_data.clear()
+                row_data.update((row[0], row) for row in rows)
+                fill_rows(rows)
             except Exception as ex:
                 print(f"Error loading data: {ex}")
             finally:
-                if 'conn' in locals():
-                    conn.close()
                 page.update()
 
+        def switch_presentation(mobile):
+            """Seuil franchi: les lignes déjà lues passent dans l'autre
+            présentation, sans requête; la sélection est conservée"""
+            nonlocal shown_mobile
+            displayed_controls().clear()
+            shown_mobile = mobile
+            title_text.size = 20 if mobile else 30
+            content_holder.content = presentation(mobile)
+            fill_rows(sorted(row_data.values(), key=lambda row: sort_key((row[12], row[0])), reverse=True))
+
         def create_action_buttons(record_id):
             return ft.Row(
                 [
@@ -168,78 +319,40 @@ def create_consultation_reception_view(page: ft.Page):
             )
 
         def edit_record(e, record_id):
-            try:
-                conn = sqlite3.connect('pesees.db')
-                c = conn.cursor()
-                record = c.execute('SELECT * FROM controle_reception WHERE id = ?', (record_id,)).fetchone()
-                conn.close()
-
-                if record:
-                    # Convert tuple to dictionary with all fields
-                    record_dict = {
-                        "id": record[0],
-                        "date": record[1],
-                        "heure": record[2],
-                        "article": record[3],
-                        "nature_article": record[4],
-                        "n_lot": record[5],
-                        "dlc": record[6],
-                        "ddp": record[7],
-                        "quantite_receptionnee": record[8],
-                        "conformite": record[9],
-                        "non_conformite": record[10],
-                        "reference": record[11],
-                        "anomalie": record[12],
-                        "created_by": record[13] if len(record) > 13 else None
-                    }
-                    
-                    # Store dictionary in client storage
-                    page.client_storage.set("reception_to_edit", record_dict)
-                    print("Stored data for editing:", record_dict)  # Debug print
-                    page.go("/reception")
-                else:
-                    print("Record not found:", record_id)
-                    page.snack_bar = ft.SnackBar(
-                        content=ft.Text("Enregistrement non trouvé"),
-                        bgcolor=ft.Colors.RED
+            # La route ne porte que l'id; la ligne est lue côté serveur
+            page.go(f"/reception/{record_id}")
+
+        def delete_record(e, record_id):
+            def confirm_delete(e):
+                dialog.open = False
+                page.update()
+                if e.control.text == "Oui":
+                    delete_tasks.run(
+                        record_id,
+                        lambda: reception_repo.delete(record_id),
+                        lambda _: on_deleted(record_id),
+                        on_delete_error
                     )
-                    page.snack_bar.open = True
-                    page.update()
-                    
-            except Exception as ex:
-                print(f"Error editing record: {ex}")
-                import traceback
-                traceback.print_exc()
+
+            def on_deleted(record_id):
+                # Mise à jour incrémentale de la liste affichée (déjà faite si
+                # la notification est arrivée avant)
+                if record_id in row_controls:
+                    remove_rows([record_id])
                 page.snack_bar = ft.SnackBar(
-                    content=ft.Text(f"Erreur lors de la modification: {str(ex)}"),
-                    bgcolor=ft.Colors.RED   # Changed from ft.colors.RED
+                    content=ft.Text("Enregistrement supprimé avec succès!"),
+                    bgcolor=ft.Colors.GREEN
                 )
                 page.snack_bar.open = True
                 page.update()
 
-        def delete_record(e, record_id):
-            def confirm_delete(e):
-                if e.control.text == "Oui":
-                    try:
-                        conn = sqlite3.connect('pesees.db')
-                        c = conn.cursor()
-                        c.execute('DELETE FROM controle_reception WHERE id = ?', (record_id,))
-                        conn.commit()
-                        conn.close()
-                        load_data()
-                        page.snack_bar = ft.SnackBar(
-                            content=ft.Text("Enregistrement supprimé avec succès!"),
-                            bgcolor=ft.Colors.GREEN
-                        )
-                        page.snack_bar.open = True
-                    except Exception as ex:
-                        print(f"Error deleting record: {ex}")
-                        page.snack_bar = ft.SnackBar(
-                            content=ft.Text("Erreur lors de la suppression"),
-                            bgcolor=ft.Colors.RED
-                        )
-                        page.snack_bar.open = True
-                dialog.open = False
+            def on_delete_error(ex):
+                print(f"Error deleting record: {ex}")
+                page.snack_bar = ft.SnackBar(
+                    content=ft.Text("Erreur lors de la suppression"),
+                    bgcolor=ft.Colors.RED
+                )
+                page.snack_bar.open = True
                 page.update()
 
             dialog = ft.AlertDialog(
@@ -255,70 +368,55 @@ def create_consultation_reception_view(page: ft.Page):
             dialog.open = True
             page.update()
 
-        # Load initial data
-        load_data()
-
         # Create header with title and new button
+        title_text = ft.Text(
+            "Consultation des Réceptions",
+            size=20 if shown_mobile else 30,
+            weight=ft.FontWeight.BOLD
+        )
         header = ft.Row(
             [
-                ft.Text(
-                    "Consultation des Réceptions",
-                    size=30 if not is_mobile() else 20,
-                    weight=ft.FontWeight.BOLD
-                ),
-                ft.ElevatedButton(
-                    "Nouvelle Réception",
-                    icon=ft.Icons.ADD,
-                    on_click=lambda _: page.go("/reception"),
-                    style=ft.ButtonStyle(
-                        bgcolor=ft.Colors.BLUE,   # Changed from ft.colors.BLUE
-                        color=ft.Colors.WHITE,    # Changed from ft.colors.WHITE
-                    )
+                title_text,
+                ft.Row(
+                    [
+                        create_export_button(page, "controle_reception"),
+                        ft.ElevatedButton(
+                            "Nouvelle Réception",
+                            icon=ft.Icons.ADD,
+                            on_click=lambda _: page.go("/reception"),
+                            style=ft.ButtonStyle(
+                                bgcolor=ft.Colors.BLUE,   # Changed from ft.colors.BLUE
+                                color=ft.Colors.WHITE,    # Changed from ft.colors.WHITE
+                            )
+                        )
+                    ]
                 )
             ],
             alignment=ft.MainAxisAlignment.SPACE_BETWEEN
         )
 
-        def create_view_content():
-            if is_mobile():
-                return ft.Column(
-                    [header, mobile_view],
-                    expand=True,
-                    scroll=ft.ScrollMode.AUTO
-                )
-            else:
-                return ft.Column(
-                    [
-                        header,
-                        ft.Container(
-                            content=consultation_table,
-                            border=ft.border.all(2, ft.Colors.BLUE_100),
-                            border_radius=10,
-                            padding=10,
-                            expand=True
-                        )
-                    ],
-                    expand=True,
-                    scroll=ft.ScrollMode.AUTO
-                )
+        # Un seul arbre de contenu par visite; seule la présentation change
+        content_holder = ft.Container(content=presentation(shown_mobile), expand=True)
+        view_content = ft.Column(
+            [header, progress_bar, selection.bar, content_holder],
+            expand=True,
+            scroll=ft.ScrollMode.AUTO
+        )
 
         # Handle page resize
-        def on_resize(e):
-            view_content.content = create_view_content()
-            page.update()
+        layout.attach()
 
-        page.on_resize = on_resize
-        view_content = ft.Container(
-            content=create_view_content(),
-            expand=True,
-            padding=20
-        )
+        # Load initial data
+        load_data()
 
-        return ft.View(
+        # Modifications publiées par les autres sessions, appliquées en direct
+        watch(page, apply_change)
+
+        view = ft.View(
             "/consultation-reception",
             [
                 ft.Container(
-                    content=create_view_content(),
+                    content=view_content,
                     padding=20,
                     bgcolor=ft.Colors.WHITE,
                     expand=True
@@ -327,6 +425,14 @@ def create_consultation_reception_view(page: ft.Page):
             padding=0,
             spacing=0
         )
+        # Réutilisation par le cache de vues de la session
+        view.data = {
+            "tables": ("controle_reception",),
+            "on_change": apply_change,
+            "refresh": load_data,
+            "on_resize": layout.on_resize,
+        }
+        return view
 
     except Exception as ex:
         print(f"Error creating consultation view: {ex}")
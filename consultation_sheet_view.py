@@ -1,5 +1,23 @@
 import flet as ft
-import sqlite3
+from background import BackgroundTask, KeyedBackgroundTasks
+from bulk_actions import BulkSelection
+from changes import DELETE, watch
+from database import sheet_repo
+from exporter import create_export_button
+
+def sort_key(data):
+    """Clé (date_ts, id) décroissante, les dates illisibles en dernier"""
+    date_ts, record_id = data
+    return (date_ts is not None, date_ts or 0, record_id)
+
+# Champs modifiables en groupe depuis la sélection multiple (pas le numéro
+# de lot, propre à chaque enregistrement)
+BULK_FIELDS = {
+    "date": "Date",
+    "produit": "Produit",
+    "anomalie": "Anomalie",
+    "action_corrective": "Action Corrective",
+}
 
 def create_consultation_sheet_view(page: ft.Page):
     # Table pour afficher les données
@@ -13,48 +31,64 @@ def create_consultation_sheet_view(page: ft.Page):
             ft.DataColumn(ft.Text("Action Corrective")),
             ft.DataColumn(ft.Text("Actions")),
         ],
-        rows=[]
+        rows=[],
+        show_checkbox_column=True
     )
+    # Lignes affichées par id, pour retirer une ligne sans reconstruire la table
+    row_controls = {}
+    # Lignes cochées pour les actions groupées
+    selection = BulkSelection(page, sheet_repo, BULK_FIELDS, lambda ids: remove_rows(ids))
+    # Requêtes exécutées sur le pool de threads, barre de progression pendant la lecture
+    progress_bar = ft.ProgressBar(visible=False)
+    load_task = BackgroundTask(page, progress_bar)
+    # Relecture des enregistrements modifiés, une demande par id
+    change_tasks = KeyedBackgroundTasks(page)
+    # Suppressions, exécutées sur le pool de threads
+    delete_tasks = KeyedBackgroundTasks(page)
+
+    def create_row(record):
+        return selection.bind_row(ft.DataRow(
+            data=(record[7], record[0]),
+            cells=[
+                ft.DataCell(ft.Text(record[1])),  # Date
+                ft.DataCell(ft.Text(record[2])),  # Produit
+                ft.DataCell(ft.Text(record[3])),  # Lot
+                ft.DataCell(ft.Text(str(record[4]))),  # Quantité
+                ft.DataCell(ft.Text(record[5] or "")),  # Anomalie
+                ft.DataCell(ft.Text(record[6] or "")),  # Action Corrective
+                ft.DataCell(
+                    ft.Row(
+                        [
+                            ft.IconButton(
+                                icon=ft.Icons.EDIT,
+                                tooltip="Modifier",
+                                on_click=lambda e, id=record[0]: edit_record(e, id)
+                            ),
+                            ft.IconButton(
+                                icon=ft.Icons.DELETE,
+                                tooltip="Supprimer",
+                                on_click=lambda e, id=record[0]: delete_record(e, id)
+                            )
+                        ]
+                    )
+                )
+            ]
+        ), record[0])
 
     def load_data():
-        try:
-            conn = sqlite3.connect('pesees.db')
-            c = conn.cursor()
-            c.execute('SELECT * FROM sheet ORDER BY date DESC')
-            records = c.fetchall()
-            conn.close()
+        # Lecture sur le pool de threads; une demande plus récente remplace celle-ci
+        change_tasks.cancel()
+        load_task.run(sheet_repo.list, show_records, lambda ex: print(f"Error loading data: {ex}"))
 
+    def show_records(records):
+        try:
             data_table.rows.clear()
+            row_controls.clear()
+            selection.reset()
             
             for record in records:
-                data_table.rows.append(
-                    ft.DataRow(
-                        cells=[
-                            ft.DataCell(ft.Text(record[1])),  # Date
-                            ft.DataCell(ft.Text(record[2])),  # Produit
-                            ft.DataCell(ft.Text(record[3])),  # Lot
-                            ft.DataCell(ft.Text(str(record[4]))),  # Quantité
-                            ft.DataCell(ft.Text(record[5] or "")),  # Anomalie
-                            ft.DataCell(ft.Text(record[6] or "")),  # Action Corrective
-                            ft.DataCell(
-                                ft.Row(
-                                    [
-                                        ft.IconButton(
-                                            icon=ft.Icons.EDIT,
-                                            tooltip="Modifier",
-                                            on_click=lambda e, id=record[0]: edit_record(e, id)
-                                        ),
-                                        ft.IconButton(
-                                            icon=ft.Icons.DELETE,
-                                            tooltip="Supprimer",
-                                            on_click=lambda e, id=record[0]: delete_record(e, id)
-                                        )
-                                    ]
-                                )
-                            )
-                        ]
-                    )
-                )
+                row_controls[record[0]] = create_row(record)
+            data_table.rows.extend(row_controls.values())
             
             page.update()
             
@@ -62,48 +96,99 @@ def create_consultation_sheet_view(page: ft.Page):
             print(f"Error loading data: {e}")
 
     def edit_record(e, id):
-        try:
-            conn = sqlite3.connect('pesees.db')
-            c = conn.cursor()
-            c.execute('SELECT * FROM sheet WHERE id = ?', (id,))
-            record = c.fetchone()
-            conn.close()
-
-            page.client_storage.set("sheet_to_edit", record)
-            page.go("/sheet")
-            
-        except Exception as e:
-            print(f"Error editing record: {e}")
+        # La route ne porte que l'id; la ligne est lue côté serveur
+        page.go(f"/sheet/{id}")
+
+    def remove_rows(ids):
+        """Retirer uniquement les lignes supprimées, en une mise à jour de la table"""
+        controls = [row_controls.pop(id) for id in ids if id in row_controls]
+        for control in controls:
+            data_table.rows.remove(control)
+        data_table.update()
+
+    def insert_row(record):
+        if record[0] in row_controls:
+            return
+        key = sort_key((record[7], record[0]))
+        position = sum(1 for control in data_table.rows if sort_key(control.data) > key)
+        control = create_row(record)
+        row_controls[record[0]] = control
+        data_table.rows.insert(position, control)
+        data_table.update()
+
+    def apply_change(table, op, record_id):
+        """Appliquer une modification publiée (par cette session ou une autre)"""
+        if table != "sheet":
+            return
+        if record_id is None:
+            # Écriture en masse (import): relire la table
+            load_data()
+            return
+        if isinstance(record_id, tuple):
+            # Action groupée: une seule mise à jour de la table
+            if op == DELETE:
+                if any(id in row_controls for id in record_id):
+                    remove_rows(record_id)
+            else:
+                load_data()
+            return
+        if op == DELETE:
+            if record_id in row_controls:
+                remove_rows([record_id])
+            return
+        change_tasks.run(
+            record_id,
+            lambda: sheet_repo.get_row(record_id),
+            lambda record: show_change(record_id, record),
+            lambda ex: print(f"Erreur lors de la mise à jour de la table: {ex}")
+        )
+
+    def show_change(record_id, record):
+        control = row_controls.get(record_id)
+        if control is None:
+            if record is not None:
+                insert_row(record)
+        elif record is None:
+            remove_rows([record_id])
+        elif control.data == (record[7], record[0]):
+            # Même position: seules les cellules sont remplacées
+            control.cells = create_row(record).cells
+            control.update()
+        else:
+            remove_rows([record_id])
+            insert_row(record)
 
     def delete_record(e, id):
-        try:
-            conn = sqlite3.connect('pesees.db')
-            c = conn.cursor()
-            c.execute('DELETE FROM sheet WHERE id = ?', (id,))
-            conn.commit()
-            conn.close()
-
-            page.show_snack_bar(
-                ft.SnackBar(
-                    content=ft.Text("Enregistrement supprimé avec succès!"),
-                    bgcolor=ft.Colors.GREEN
-                )
+        delete_tasks.run(id, lambda: sheet_repo.delete(id), lambda _: on_deleted(id), on_delete_error)
+
+    def on_deleted(id):
+        page.show_snack_bar(
+            ft.SnackBar(
+                content=ft.Text("Enregistrement supprimé avec succès!"),
+                bgcolor=ft.Colors.GREEN
             )
-            load_data()
-            
-        except Exception as e:
-            print(f"Error deleting record: {e}")
-            page.show_snack_bar(
-                ft.SnackBar(
-                    content=ft.Text("Erreur lors de la suppression!"),
-                    bgcolor=ft.Colors.RED
-                )
+        )
+        # Mise à jour incrémentale de la table (déjà faite si la notification
+        # est arrivée avant)
+        if id in row_controls:
+            remove_rows([id])
+
+    def on_delete_error(e):
+        print(f"Error deleting record: {e}")
+        page.show_snack_bar(
+            ft.SnackBar(
+                content=ft.Text("Erreur lors de la suppression!"),
+                bgcolor=ft.Colors.RED
             )
+        )
 
     # Charger les données initiales
     load_data()
 
-    return ft.View(
+    # Modifications publiées par les autres sessions, appliquées en direct
+    watch(page, apply_change)
+
+    view = ft.View(
         "/consultation-sheet",
         [
             ft.Container(
@@ -114,13 +199,20 @@ def create_consultation_sheet_view(page: ft.Page):
                                 ft.Text("Consultation des Sheets", 
                                        size=30, 
                                        weight=ft.FontWeight.BOLD),
-                                ft.ElevatedButton(
-                                    "Nouveau Sheet",
-                                    on_click=lambda _: page.go("/sheet")
+                                ft.Row(
+                                    [
+                                        create_export_button(page, "sheet"),
+                                        ft.ElevatedButton(
+                                            "Nouveau Sheet",
+                                            on_click=lambda _: page.go("/sheet")
+                                        )
+                                    ]
                                 )
                             ],
                             alignment=ft.MainAxisAlignment.SPACE_BETWEEN
                         ),
+                        progress_bar,
+                        selection.bar,
                         # Wrap the data table in a Column instead of Container
                         ft.Column(
                             [data_table],
@@ -133,4 +225,7 @@ def create_consultation_sheet_view(page: ft.Page):
             )
         ],
         scroll=ft.ScrollMode.AUTO  # Move scroll property to View
-    )
\ No newline at end of file
+    )
+    # Réutilisation par le cache de vues de la session
+    view.data = {"tables": ("sheet",), "on_change": apply_change, "refresh": load_data, "on_resize": None}
+    return view
\ No newline at end of file
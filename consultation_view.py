@@ -1,6 +1,35 @@
 import flet as ft
-import sqlite3
 from datetime import datetime
+from background import BackgroundTask, KeyedBackgroundTasks
+from bulk_actions import BulkSelection
+from changes import DELETE, watch
+from database import PAGE_SIZE, pesees_repo, to_timestamp
+from exporter import create_export_button
+
+# Taille des lots chargés par le défilement infini de la vue mobile
+MOBILE_BATCH_SIZE = 20
+# Distance (px) à la fin de la liste déclenchant le chargement du lot suivant
+LOAD_MORE_THRESHOLD = 600
+# Champs modifiables en groupe depuis la sélection multiple (pas le numéro
+# de lot, propre à chaque enregistrement)
+BULK_FIELDS = {
+    "date": "Date",
+    "produit": "Produit",
+    "ddf": "DDF",
+    "ddp": "DDP",
+    "intervalle_pesee": "Intervalle pesée",
+    "anomalie_observee": "Anomalie observée",
+}
+
+def sort_position(controls, data):
+    """Position d'insertion d'une ligne de clé (date_ts, id) dans des contrôles
+    triés par (date_ts, id) décroissants (clé portée par control.data; date_ts
+    vaut 0 pour une date vide ou illisible, comme dans la requête)"""
+    position = 0
+    for index, control in enumerate(controls):
+        if isinstance(control.data, tuple) and control.data > data:
+            position = index + 1
+    return position
 
 def create_modern_search_bar(
     date_field: ft.TextField,
@@ -8,7 +37,8 @@ def create_modern_search_bar(
     lot_field: ft.TextField,
     on_search,
     on_reset,
-    is_mobile: bool = False
+    is_mobile: bool = False,
+    text_field: ft.TextField = None
 ):
     """Create a modern search bar with consistent styling"""
     
@@ -51,6 +81,22 @@ def create_modern_search_bar(
     lot_field.focused_border_color = ft.Colors.BLUE
     lot_field.focused_bgcolor = ft.Colors.BLUE_50
 
+    # Style the optional free text field (produit, lot, anomalie, caisse)
+    filter_fields = [date_field, product_field, lot_field]
+    if text_field is not None:
+        text_field.label = "Recherche libre"
+        text_field.hint_text = "Produit, lot, anomalie, caisse..."
+        text_field.prefix_icon = ft.Icons.MANAGE_SEARCH
+        text_field.border_radius = 8
+        text_field.filled = True
+        text_field.expand = True if is_mobile else False
+        text_field.width = None if is_mobile else 300
+        text_field.height = 48
+        text_field.border_color = ft.Colors.BLUE_100
+        text_field.focused_border_color = ft.Colors.BLUE
+        text_field.focused_bgcolor = ft.Colors.BLUE_50
+        filter_fields.append(text_field)
+
     # Create styled search button
     search_button = ft.ElevatedButton(
         "Rechercher",
@@ -82,9 +128,7 @@ def create_modern_search_bar(
         search_layout = ft.Column(
             [
                 ft.Text("Rechercher", size=16, weight=ft.FontWeight.BOLD),
-                date_field,
-                product_field,
-                lot_field,
+                *filter_fields,
                 ft.Row(
                     [search_button, reset_button],
                     alignment=ft.MainAxisAlignment.SPACE_BETWEEN,
@@ -98,11 +142,7 @@ def create_modern_search_bar(
             [
                 ft.Text("Filtrer les résultats", size=16, weight=ft.FontWeight.BOLD),
                 ft.Row(
-                    [
-                        date_field,
-                        product_field,
-                        lot_field,
-                    ],
+                    filter_fields,
                     wrap=True,
                     spacing=10,
                 ),
@@ -170,29 +210,26 @@ def create_mobile_consultation_view(page: ft.Page):
     # État pour contrôler la visibilité de la barre de recherche
     search_visible = False
     
-    # Container pour les cartes
-    records_column = ft.Column(
-        spacing=10,
-        scroll=ft.ScrollMode.AUTO,
-        expand=True
-    )
-
     # Créer les champs de recherche
     date_search = ft.TextField()
     product_search = ft.TextField()
     lot_search = ft.TextField()
+    text_search = ft.TextField(on_submit=lambda e: do_search(e))
     
     def do_search(_):
+        # Filtrage côté serveur, même moteur que la vue desktop
         load_mobile_data(
             date_search.value,
             product_search.value,
-            lot_search.value
+            lot_search.value,
+            text_search.value
         )
     
     def reset_search(_):
         date_search.value = ""
         product_search.value = ""
         lot_search.value = ""
+        text_search.value = ""
         page.update()
         load_mobile_data()
 
@@ -203,7 +240,8 @@ def create_mobile_consultation_view(page: ft.Page):
         lot_search,
         do_search,
         reset_search,
-        is_mobile=True
+        is_mobile=True,
+        text_field=text_search
     )
 
     # Créer un conteneur pour la barre de recherche avec animation
@@ -230,24 +268,132 @@ def create_mobile_consultation_view(page: ft.Page):
         on_click=toggle_search
     )
 
-    # Container pour les cartes
-    records_column = ft.Column(
+    # Liste virtualisée: les cartes ne sont construites que par lots, à mesure
+    # que l'utilisateur approche de la fin de la liste (défilement infini)
+    records_list = ft.ListView(
         spacing=10,
-        scroll=ft.ScrollMode.AUTO,
-        expand=True
+        expand=True,
+        on_scroll_interval=100,
+        on_scroll=lambda e: on_records_scroll(e)
     )
-    
-    def load_mobile_data():
-        records_column.controls.clear()
-        conn = sqlite3.connect('pesees.db')
-        c = conn.cursor()
+
+    # Indicateur affiché en fin de liste pendant le chargement d'un lot
+    loading_indicator = ft.Container(
+        content=ft.ProgressRing(width=24, height=24, stroke_width=3),
+        alignment=ft.alignment.center,
+        padding=10
+    )
+
+    # État du défilement infini: filtres actifs et curseur du lot suivant
+    current_filters = ("", "", "", "")
+    next_cursor = None
+    loading = False
+    # Cartes affichées par id, pour retirer une carte sans recharger la liste
+    card_controls = {}
+    # Cartes cochées pour les actions groupées
+    selection = BulkSelection(page, pesees_repo, BULK_FIELDS, lambda ids: remove_cards(ids))
+    # Lots de cartes lus sur le pool de threads
+    batch_task = BackgroundTask(page)
+    # Relecture des enregistrements modifiés, une demande par id
+    change_tasks = KeyedBackgroundTasks(page)
+    # Suppressions confirmées, exécutées sur le pool de threads
+    delete_tasks = KeyedBackgroundTasks(page)
+
+    def create_record_card(row):
+        record_id = row[0]
+        date = str(row[1]) if row[1] else "-"
+        produit = str(row[2]) if row[2] else "-"
+        n_lot = str(row[3]) if row[3] else "-"
+        created_by = str(row[4]) if row[4] else "N/A"
         
+        # Création d'une carte pour chaque enregistrement avec seulement les colonnes demandées
+        return ft.Card(
+            data=(row[5], row[0]),
+            content=ft.Container(
+                content=ft.Column([
+                    ft.ListTile(
+                        leading=ft.Icon(ft.Icons.CALENDAR_TODAY),
+                        title=ft.Text(f"Date: {date}", weight=ft.FontWeight.BOLD),
+                        subtitle=ft.Text(f"Produit: {produit}"),
+                    ),
+                    ft.Divider(height=1),
+                    ft.Container(
+                        content=ft.Column([
+                            ft.Text(f"N° LOT: {n_lot}"),
+                            ft.Text(f"Créé par: {created_by}")
+                        ]),
+                        padding=10,
+                    ),
+                    ft.Row([
+                        selection.checkbox(record_id),
+                        ft.Row([
+                            ft.TextButton(
+                                "Modifier",
+                                icon=ft.Icons.EDIT,
+                                on_click=lambda e, id=record_id: edit_record(e, id),
+                            ),
+                            ft.TextButton(
+                                "Supprimer",
+                                icon=ft.Icons.DELETE,
+                                on_click=lambda e, rid=record_id: delete_record(e, rid),
+                            ),
+                        ]),
+                    ], alignment=ft.MainAxisAlignment.SPACE_BETWEEN)
+                ]),
+                padding=10
+            ),
+            margin=10
+        )
+
+    def load_mobile_data(date_filter="", product_filter="", lot_filter="", text_filter=""):
+        nonlocal current_filters, next_cursor
+        # Repartir du début avec les nouveaux filtres: seul le premier lot
+        # correspondant est lu et affiché
+        current_filters = (
+            (date_filter or "").strip(),
+            (product_filter or "").strip(),
+            (lot_filter or "").strip(),
+            (text_filter or "").strip(),
+        )
+        records_list.controls.clear()
+        card_controls.clear()
+        selection.reset()
+        next_cursor = None
+        # Les relectures en cours portent sur l'ancienne liste
+        change_tasks.cancel()
+        load_next_batch(first=True)
+
+    def load_next_batch(first=False):
+        nonlocal loading
+        # Une nouvelle recherche remplace le lot en cours (résultat ignoré)
+        if not first and (loading or next_cursor is None):
+            return
+        loading = True
+        records_list.controls.append(loading_indicator)
+        if first:
+            page.update()
+        else:
+            records_list.update()
+
+        # Récupérer uniquement les colonnes nécessaires, un lot à la fois
+        filters, after = current_filters, next_cursor
+        batch_task.run(
+            lambda: pesees_repo.list_page(*filters, after=after, page_size=MOBILE_BATCH_SIZE),
+            lambda result: show_batch(result, first),
+            lambda ex: show_batch(None, first, ex)
+        )
+
+    def show_batch(result, first, error=None):
+        nonlocal next_cursor, loading
         try:
-            # Récupérer uniquement les colonnes nécessaires
-            rows = c.execute('SELECT id, date, produit, n_lot, created_by FROM pesees ORDER BY date DESC').fetchall()
+            if loading_indicator in records_list.controls:
+                records_list.controls.remove(loading_indicator)
+            if error is not None:
+                raise error
+            rows, next_cursor = result
             
-            if not rows:
-                records_column.controls.append(
+            if first and not rows:
+                records_list.controls.append(
                     ft.Container(
                         content=ft.Text("Aucune donnée disponible", text_align=ft.TextAlign.CENTER),
                         padding=20,
@@ -258,80 +404,128 @@ def create_mobile_consultation_view(page: ft.Page):
                 )
             else:
                 for row in rows:
-                    record_id = row[0]
-                    date = str(row[1]) if row[1] else "-"
-                    produit = str(row[2]) if row[2] else "-"
-                    n_lot = str(row[3]) if row[3] else "-"
-                    created_by = str(row[4]) if row[4] else "N/A"
-                    
-                    # Création d'une carte pour chaque enregistrement avec seulement les colonnes demandées
-                    card = ft.Card(
-                        content=ft.Container(
-                            content=ft.Column([
-                                ft.ListTile(
-                                    leading=ft.Icon(ft.Icons.CALENDAR_TODAY),
-                                    title=ft.Text(f"Date: {date}", weight=ft.FontWeight.BOLD),
-                                    subtitle=ft.Text(f"Produit: {produit}"),
-                                ),
-                                ft.Divider(height=1),
-                                ft.Container(
-                                    content=ft.Column([
-                                        ft.Text(f"N° LOT: {n_lot}"),
-                                        ft.Text(f"Créé par: {created_by}")
-                                    ]),
-                                    padding=10,
-                                ),
-                                ft.Row([
-                                    ft.TextButton(
-                                        "Modifier",
-                                        icon=ft.Icons.EDIT,
-                                        on_click=lambda e, id=record_id: edit_record(e, id),
-                                    ),
-                                    ft.TextButton(
-                                        "Supprimer",
-                                        icon=ft.Icons.DELETE,
-                                        on_click=lambda e, rid=record_id: delete_record(e, rid),
-                                    ),
-                                ], alignment=ft.MainAxisAlignment.END)
-                            ]),
-                            padding=10
-                        ),
-                        margin=10
-                    )
-                    records_column.controls.append(card)
+                    card = create_record_card(row)
+                    card_controls[row[0]] = card
+                    records_list.controls.append(card)
                 
         except Exception as ex:
             print(f"Error loading data: {ex}")
-            records_column.controls.append(
+            next_cursor = None
+            records_list.controls.append(
                 ft.Container(
                     content=ft.Text(f"Erreur: {str(ex)}", color=ft.Colors.RED),
                     padding=20
                 )
             )
         finally:
-            conn.close()
-            page.update()
+            loading = False
+            if first:
+                page.update()
+            else:
+                records_list.update()
+
+    def on_records_scroll(e: ft.OnScrollEvent):
+        # Charger le lot suivant quand la fin de la liste approche
+        if e.max_scroll_extent - e.pixels < LOAD_MORE_THRESHOLD:
+            load_next_batch()
+
+    def remove_cards(record_ids):
+        """Retirer les cartes supprimées en une mise à jour; la liste n'est
+        relue que si elle est vide"""
+        cards = [card_controls.pop(rid) for rid in record_ids if rid in card_controls]
+        if not card_controls:
+            load_mobile_data(*current_filters)
+            return
+        for card in cards:
+            records_list.controls.remove(card)
+        records_list.update()
+
+    def insert_card(row):
+        # Le tri par pertinence n'a pas de position stable: prochain chargement
+        if row[0] in card_controls or pesees_repo.is_ranked(current_filters[3]):
+            return
+        if not card_controls:
+            load_mobile_data(*current_filters)
+            return
+        cards = [control for control in records_list.controls if isinstance(control.data, tuple)]
+        position = sort_position(cards, (row[5], row[0]))
+        if position == len(cards) and next_cursor is not None:
+            # Au-delà des cartes chargées: le lot suivant l'apportera
+            return
+        card = create_record_card(row)
+        card_controls[row[0]] = card
+        index = records_list.controls.index(cards[position]) if position < len(cards) \
+            else records_list.controls.index(cards[-1]) + 1
+        records_list.controls.insert(index, card)
+        records_list.update()
+
+    def apply_change(table, op, record_id):
+        """Appliquer une modification publiée (par cette session ou une autre)"""
+        if table != "pesees":
+            return
+        if record_id is None:
+            # Écriture en masse (import): relire la liste
+            load_mobile_data(*current_filters)
+            return
+        if isinstance(record_id, tuple):
+            # Action groupée: une seule mise à jour de la liste
+            if op == DELETE:
+                if any(rid in card_controls for rid in record_id):
+                    remove_cards(record_id)
+            else:
+                load_mobile_data(*current_filters)
+            return
+        if op == DELETE:
+            if record_id in card_controls:
+                remove_cards([record_id])
+            return
+        filters = current_filters
+        change_tasks.run(
+            record_id,
+            lambda: pesees_repo.get_summary(record_id, *filters),
+            lambda row: show_change(record_id, row, filters),
+            lambda ex: print(f"Erreur lors de la mise à jour de la liste: {ex}")
+        )
+
+    def show_change(record_id, row, filters):
+        if filters != current_filters:
+            # Filtres modifiés entre-temps: la liste a été relue
+            return
+        card = card_controls.get(record_id)
+        if card is None:
+            if row is not None:
+                insert_card(row)
+        elif row is None:
+            # Ne correspond plus aux filtres actifs
+            remove_cards([record_id])
+        elif card.data == (row[5], row[0]) or pesees_repo.is_ranked(current_filters[3]):
+            # Même position: seul le contenu de la carte est remplacé
+            card.content = create_record_card(row).content
+            card.update()
+        else:
+            remove_cards([record_id])
+            insert_card(row)
 
     def delete_record(e, record_id):
         def confirm_delete(e):
+            dialog.open = False
+            page.update()
             if e.control.text == "Oui":
-                conn = sqlite3.connect('pesees.db')
-                c = conn.cursor()
-                c.execute('DELETE FROM pesees WHERE id = ?', (record_id,))
-                conn.commit()
-                conn.close()
-                
-                # Reload data
-                load_mobile_data()
-                
-                # Show message
-                dialog.open = False
-                page.snack_bar = ft.SnackBar(content=ft.Text("Enregistrement supprimé!"))
-                page.snack_bar.open = True
-                page.update()
-            else:
-                dialog.open = False
-                page.update()
+                delete_tasks.run(
+                    record_id,
+                    lambda: pesees_repo.delete(record_id),
+                    lambda _: on_deleted(record_id),
+                    on_delete_error
+                )
+
+        def on_deleted(record_id):
+            # Mise à jour incrémentale: seule la carte supprimée est retirée
+            # (déjà fait si la notification est arrivée avant)
+            if record_id in card_controls:
+                remove_cards([record_id])
+            page.snack_bar = ft.SnackBar(content=ft.Text("Enregistrement supprimé!"))
+            page.snack_bar.open = True
+            page.update()
 
         # Create confirmation dialog
         dialog = ft.AlertDialog(
@@ -347,91 +541,34 @@ def create_mobile_consultation_view(page: ft.Page):
         dialog.open = True
         page.update()
 
+    def on_delete_error(ex):
+        print(f"Error deleting record: {ex}")
+        page.snack_bar = ft.SnackBar(
+            content=ft.Text("Erreur lors de la suppression"),
+            bgcolor=ft.Colors.RED
+        )
+        page.snack_bar.open = True
+        page.update()
+
     def edit_record(e, record_id):
-        try:
-            conn = sqlite3.connect('pesees.db')
-            c = conn.cursor()
-            record = c.execute('SELECT * FROM pesees WHERE id = ?', (record_id,)).fetchone()
-            conn.close()
-
-            if record:
-                page.client_storage.set("record_to_edit", record)
-                page.go("/pesees")
-                
-        except Exception as ex:
-            print(f"Error in edit_record: {ex}")
-            page.snack_bar = ft.SnackBar(
-                content=ft.Text("Erreur lors de la modification"),
-                bgcolor=ft.Colors.RED
-            )
-            page.snack_bar.open = True
-            page.update()
+        # La route ne porte que l'id; la ligne est lue côté serveur
+        page.go(f"/pesees/{record_id}")
     
     # Charger les données
     load_mobile_data()
     
+    # Modifications publiées par les autres sessions, appliquées en direct
+    watch(page, apply_change)
+    
     # Bouton d'ajout flottant pour mobile
     add_button = ft.FloatingActionButton(
         icon=ft.Icons.ADD,
         bgcolor=ft.Colors.BLUE,
         on_click=lambda _: page.go("/pesees")
     )
-    
-    # Créer les champs de recherche
-    date_search = ft.TextField()
-    product_search = ft.TextField()
-    lot_search = ft.TextField()
-    
-    def do_search(_):
-        load_mobile_data(
-            date_search.value,
-            product_search.value,
-            lot_search.value
-        )
-    
-    def reset_search(_):
-        date_search.value = ""
-        product_search.value = ""
-        lot_search.value = ""
-        page.update()
-        load_mobile_data()
-
-    # Créer la barre de recherche mobile
-    search_bar = create_modern_search_bar(
-        date_search,
-        product_search,
-        lot_search,
-        do_search,
-        reset_search,
-        is_mobile=True
-    )
-
-    # Créer un conteneur pour la barre de recherche avec animation
-    search_container = ft.AnimatedSwitcher(
-        content=search_bar,
-        visible=False,  # Caché par défaut
-        transition=ft.AnimatedSwitcherTransition.SCALE,
-        duration=300,
-        switch_in_curve=ft.AnimationCurve.EASE_OUT,
-        switch_out_curve=ft.AnimationCurve.EASE_IN,
-    )
-
-    def toggle_search(_):
-        nonlocal search_visible
-        search_visible = not search_visible
-        search_container.visible = search_visible
-        page.update()
-
-    # Bouton de recherche dans l'AppBar
-    search_button = ft.IconButton(
-        icon=ft.Icons.SEARCH,
-        icon_color=ft.Colors.WHITE,
-        tooltip="Rechercher",
-        on_click=toggle_search
-    )
 
     # Modifier le return pour inclure le bouton de recherche dans l'AppBar
-    return ft.View(
+    view = ft.View(
         "/consultation",
         [
             ft.AppBar(
@@ -444,27 +581,42 @@ def create_mobile_consultation_view(page: ft.Page):
                 ),
                 actions=[
                     search_button,  # Ajouter le bouton de recherche
+                    create_export_button(page, "pesees", lambda: current_filters, ft.Colors.WHITE),
                     ft.IconButton(
                         icon=ft.Icons.REFRESH,
-                        on_click=lambda _: load_mobile_data()
+                        on_click=lambda _: load_mobile_data(*current_filters)
                     )
                 ]
             ),
             search_container,  # Barre de recherche cachée par défaut
+            ft.Container(content=selection.bar, padding=ft.padding.symmetric(horizontal=10)),
             ft.Container(
-                content=records_column,
+                content=records_list,
                 expand=True,
                 padding=10
             )
         ],
-        floating_action_button=add_button,
-        scroll=ft.ScrollMode.AUTO
+        floating_action_button=add_button
     )
+    # Réutilisation par le cache de vues de la session
+    view.data = {
+        "tables": ("pesees",),
+        "on_change": apply_change,
+        "refresh": lambda: load_mobile_data(*current_filters),
+        "on_resize": None,
+    }
+    return view
 
-def create_desktop_consultation_view(page: ft.Page):
+def create_desktop_consultation_view(page: ft.Page, page_size=PAGE_SIZE):
     # État pour contrôler la visibilité de la barre de recherche
     search_visible = False
 
+    # État de la pagination par curseur: filtres actifs, curseur de début
+    # de chaque page visitée (None = première page) et curseur suivant
+    current_filters = ("", "", "", "", "", "")
+    page_cursors = [None]
+    next_cursor = None
+
     # Création d'un thème cohérent - Fix: use ft.Colors instead of ft.colors
     theme = {
         "primary": ft.Colors.BLUE,
@@ -505,6 +657,38 @@ def create_desktop_consultation_view(page: ft.Page):
         height=48,
     )
 
+    # Intervalle de dates (bornes incluses), servi par l'index d'horodatage
+    date_from_search = ft.TextField(
+        label="Du",
+        hint_text="YYYY-MM-DD",
+        prefix_icon=ft.Icons.DATE_RANGE,
+        border_radius=8,
+        filled=True,
+        expand=True,
+        height=48,
+    )
+
+    date_to_search = ft.TextField(
+        label="Au",
+        hint_text="YYYY-MM-DD",
+        prefix_icon=ft.Icons.DATE_RANGE,
+        border_radius=8,
+        filled=True,
+        expand=True,
+        height=48,
+    )
+
+    text_search = ft.TextField(
+        label="Recherche libre",
+        hint_text="Produit, lot, anomalie, caisse...",
+        prefix_icon=ft.Icons.MANAGE_SEARCH,
+        border_radius=8,
+        filled=True,
+        expand=True,
+        height=48,
+        on_submit=lambda e: do_search(e),
+    )
+
     # Compteur de résultats stylé
     results_counter = ft.Text(
         size=14,
@@ -513,16 +697,35 @@ def create_desktop_consultation_view(page: ft.Page):
     )
 
     def do_search(_):
+        # Vérifier les bornes de l'intervalle avant d'interroger la base
+        for field in (date_from_search, date_to_search):
+            if field.value and field.value.strip():
+                try:
+                    to_timestamp(field.value)
+                except ValueError:
+                    page.snack_bar = ft.SnackBar(
+                        content=ft.Text(f"Date invalide ({field.label}): utilisez AAAA-MM-JJ ou JJ/MM/AAAA"),
+                        bgcolor=ft.Colors.RED
+                    )
+                    page.snack_bar.open = True
+                    page.update()
+                    return
         load_data(
             date_search.value,
             product_search.value,
-            lot_search.value
+            lot_search.value,
+            text_search.value,
+            date_from_search.value,
+            date_to_search.value
         )
 
     def reset_search(_):
         date_search.value = ""
         product_search.value = ""
         lot_search.value = ""
+        text_search.value = ""
+        date_from_search.value = ""
+        date_to_search.value = ""
         page.update()
         load_data()
 
@@ -543,6 +746,9 @@ def create_desktop_consultation_view(page: ft.Page):
                     ft.Column([date_search], col={"sm": 12, "md": 4}),
                     ft.Column([product_search], col={"sm": 12, "md": 4}),
                     ft.Column([lot_search], col={"sm": 12, "md": 4}),
+                    ft.Column([date_from_search], col={"sm": 6, "md": 6}),
+                    ft.Column([date_to_search], col={"sm": 6, "md": 6}),
+                    ft.Column([text_search], col={"sm": 12, "md": 12}),
                 ]),
                 ft.Row([
                     results_counter,
@@ -604,31 +810,202 @@ def create_desktop_consultation_view(page: ft.Page):
         column_spacing=40,
         heading_row_color=theme["primary_container"],
         heading_row_height=50,
+        show_checkbox_column=True,
+    )
+
+    # Contrôles de pagination
+    page_label = ft.Text(size=14, color=theme["secondary"])
+    prev_button = ft.IconButton(
+        icon=ft.Icons.CHEVRON_LEFT,
+        tooltip="Page précédente",
+        on_click=lambda _: prev_page()
+    )
+    next_button = ft.IconButton(
+        icon=ft.Icons.CHEVRON_RIGHT,
+        tooltip="Page suivante",
+        on_click=lambda _: next_page()
+    )
+    page_size_dropdown = ft.Dropdown(
+        label="Lignes par page",
+        width=140,
+        options=[ft.dropdown.Option(str(size)) for size in sorted({25, 50, 100, page_size})],
+        value=str(page_size),
+        on_change=lambda e: change_page_size(e)
     )
 
-    def load_data(date_filter="", product_filter="", lot_filter=""):
+    def load_data(date_filter="", product_filter="", lot_filter="", text_filter="",
+                  date_from="", date_to=""):
+        nonlocal current_filters, page_cursors
+        # Un changement de filtre repart de la première page
+        current_filters = (date_filter, product_filter, lot_filter, text_filter, date_from, date_to)
+        page_cursors = [None]
+        show_page()
+
+    def next_page():
+        if next_cursor is not None:
+            page_cursors.append(next_cursor)
+            show_page()
+
+    def prev_page():
+        if len(page_cursors) > 1:
+            page_cursors.pop()
+            show_page()
+
+    def change_page_size(e):
+        nonlocal page_size, page_cursors
+        page_size = int(e.control.value)
+        page_cursors = [None]
+        show_page()
+
+    # Lignes affichées par id, pour retirer une ligne sans reconstruire la page
+    row_controls = {}
+    # Lignes cochées pour les actions groupées
+    selection = BulkSelection(page, pesees_repo, BULK_FIELDS, lambda ids: remove_rows(ids))
+    # Requêtes exécutées sur le pool de threads, barre de progression pendant la lecture
+    progress_bar = ft.ProgressBar(visible=False, color=theme["primary"])
+    page_task = BackgroundTask(page, progress_bar)
+    # Relecture des enregistrements modifiés, une demande par id
+    change_tasks = KeyedBackgroundTasks(page)
+    # Suppressions confirmées, exécutées sur le pool de threads
+    delete_tasks = KeyedBackgroundTasks(page)
+
+    def create_table_row(row):
+        record_id = row[0]
+        date = str(row[1]) if row[1] else "-"
+        produit = str(row[2]) if row[2] else "-"
+        n_lot = str(row[3]) if row[3] else "-"
+        created_by = str(row[4]) if row[4] else "N/A"
+        
+        return selection.bind_row(ft.DataRow(
+            data=(row[5], row[0]),
+            cells=[
+                ft.DataCell(ft.Text(date)),
+                ft.DataCell(ft.Text(produit)),
+                ft.DataCell(ft.Text(n_lot)),
+                ft.DataCell(ft.Text(created_by)),
+                ft.DataCell(
+                    ft.Row([
+                        ft.IconButton(
+                            icon=ft.Icons.EDIT,
+                            icon_color=ft.Colors.BLUE,
+                            tooltip="Modifier",
+                            on_click=lambda e, id=record_id: edit_record(e, id)
+                        ),
+                        ft.IconButton(
+                            icon=ft.Icons.DELETE,
+                            icon_color=ft.Colors.RED,
+                            tooltip="Supprimer",
+                            on_click=lambda e, rid=record_id: delete_record(e, rid)
+                        )
+                    ])
+                )
+            ]
+        ), record_id)
+
+    def remove_rows(record_ids):
+        """Retirer les lignes supprimées en une mise à jour; seule la page
+        vidée est relue"""
+        controls = [row_controls.pop(rid) for rid in record_ids if rid in row_controls]
+        if not row_controls:
+            show_page()
+            return
+        for control in controls:
+            consultation_table.rows.remove(control)
+        consultation_table.update()
+
+    def insert_row(row):
+        nonlocal next_cursor
+        # Seule la première page triée par (date_ts, id) reçoit les nouvelles
+        # lignes; les autres pages et le tri par pertinence au prochain chargement
+        if row[0] in row_controls or len(page_cursors) > 1 or pesees_repo.is_ranked(current_filters[3]):
+            return
+        if not row_controls:
+            show_page()
+            return
+        position = sort_position(consultation_table.rows, (row[5], row[0]))
+        if position == len(consultation_table.rows) and next_cursor is not None:
+            return
+        control = create_table_row(row)
+        row_controls[row[0]] = control
+        consultation_table.rows.insert(position, control)
+        if len(row_controls) > page_size:
+            # La dernière ligne passe sur la page suivante
+            last = consultation_table.rows.pop()
+            row_controls.pop(last.data[1], None)
+            next_cursor = consultation_table.rows[-1].data
+            next_button.disabled = False
+            next_button.update()
+        consultation_table.update()
+
+    def apply_change(table, op, record_id):
+        """Appliquer une modification publiée (par cette session ou une autre)"""
+        if table != "pesees":
+            return
+        if record_id is None:
+            # Écriture en masse (import): relire la page courante
+            show_page()
+            return
+        if isinstance(record_id, tuple):
+            # Action groupée: une seule mise à jour de la page
+            if op == DELETE:
+                if any(rid in row_controls for rid in record_id):
+                    remove_rows(record_id)
+            else:
+                show_page()
+            return
+        if op == DELETE:
+            if record_id in row_controls:
+                remove_rows([record_id])
+            return
+        filters = current_filters
+        change_tasks.run(
+            record_id,
+            lambda: pesees_repo.get_summary(record_id, *filters),
+            lambda row: show_change(record_id, row, filters),
+            lambda ex: print(f"Erreur lors de la mise à jour de la table: {ex}")
+        )
+
+    def show_change(record_id, row, filters):
+        if filters != current_filters:
+            # Filtres modifiés entre-temps: la page a été relue
+            return
+        control = row_controls.get(record_id)
+        if control is None:
+            if row is not None:
+                insert_row(row)
+        elif row is None:
+            # Ne correspond plus aux filtres actifs
+            remove_rows([record_id])
+        elif control.data == (row[5], row[0]) or pesees_repo.is_ranked(current_filters[3]):
+            # Même position: seules les cellules de la ligne sont remplacées
+            control.cells = create_table_row(row).cells
+            control.update()
+        else:
+            remove_rows([record_id])
+            insert_row(row)
+
+    def show_page():
+        # Une seule page est lue et envoyée au navigateur (recherche libre via
+        # l'index plein texte); une demande plus récente remplace celle-ci
+        filters, after, size = current_filters, page_cursors[-1], page_size
+        # Les relectures en cours portent sur l'ancienne page
+        change_tasks.cancel()
+        page_task.run(
+            lambda: pesees_repo.list_page(*filters, after=after, page_size=size),
+            render_page,
+            lambda ex: render_page(None, ex)
+        )
+
+    def render_page(result, error=None):
+        nonlocal next_cursor
         consultation_table.rows.clear()
-        conn = sqlite3.connect('pesees.db')
-        c = conn.cursor()
+        row_controls.clear()
+        selection.reset()
         
         try:
-            # Récupérer uniquement les colonnes nécessaires
-            query = 'SELECT id, date, produit, n_lot, created_by FROM pesees WHERE 1=1'
-            params = []
-            
-            if date_filter:
-                query += ' AND date LIKE ?'
-                params.append(f'%{date_filter}%')
-            if product_filter:
-                query += ' AND produit LIKE ?'
-                params.append(f'%{product_filter}%')
-            if lot_filter:
-                query += ' AND n_lot LIKE ?'
-                params.append(f'%{lot_filter}%')
-            
-            query += ' ORDER BY date DESC'
-            
-            rows = c.execute(query, params).fetchall()
+            if error is not None:
+                raise error
+            rows, next_cursor = result
             
             if not rows:
                 consultation_table.rows.append(
@@ -638,38 +1015,8 @@ def create_desktop_consultation_view(page: ft.Page):
                 )
             else:
                 for row in rows:
-                    record_id = row[0]
-                    date = str(row[1]) if row[1] else "-"
-                    produit = str(row[2]) if row[2] else "-"
-                    n_lot = str(row[3]) if row[3] else "-"
-                    created_by = str(row[4]) if row[4] else "N/A"
-                    
-                    consultation_table.rows.append(
-                        ft.DataRow(
-                            cells=[
-                                ft.DataCell(ft.Text(date)),
-                                ft.DataCell(ft.Text(produit)),
-                                ft.DataCell(ft.Text(n_lot)),
-                                ft.DataCell(ft.Text(created_by)),
-                                ft.DataCell(
-                                    ft.Row([
-                                        ft.IconButton(
-                                            icon=ft.Icons.EDIT,
-                                            icon_color=ft.Colors.BLUE,
-                                            tooltip="Modifier",
-                                            on_click=lambda e, id=record_id: edit_record(e, id)
-                                        ),
-                                        ft.IconButton(
-                                            icon=ft.Icons.DELETE,
-                                            icon_color=ft.Colors.RED,
-                                            tooltip="Supprimer",
-                                            on_click=lambda e, rid=record_id: delete_record(e, rid)
-                                        )
-                                    ])
-                                )
-                            ]
-                        )
-                    )
+                    row_controls[row[0]] = create_table_row(row)
+                consultation_table.rows.extend(row_controls.values())
                     
         except Exception as ex:
             print(f"Error loading data: {ex}")
@@ -678,28 +1025,33 @@ def create_desktop_consultation_view(page: ft.Page):
                     cells=[ft.DataCell(ft.Text(f"Erreur: {str(ex)}"))] * 5
                 )
             )
+            next_cursor = None
         finally:
-            conn.close()
+            page_label.value = f"Page {len(page_cursors)}"
+            prev_button.disabled = len(page_cursors) <= 1
+            next_button.disabled = next_cursor is None
             page.update()
 
     def delete_record(e, record_id):
         def confirm_delete(e):
+            dialog.open = False
+            page.update()
             if e.control.text == "Oui":
-                conn = sqlite3.connect('pesees.db')
-                c = conn.cursor()
-                c.execute('DELETE FROM pesees WHERE id = ?', (record_id,))
-                conn.commit()
-                conn.close()
-                
-                load_data()
-                
-                dialog.open = False
-                page.snack_bar = ft.SnackBar(content=ft.Text("Enregistrement supprimé!"))
-                page.snack_bar.open = True
-                page.update()
-            else:
-                dialog.open = False
-                page.update()
+                delete_tasks.run(
+                    record_id,
+                    lambda: pesees_repo.delete(record_id),
+                    lambda _: on_deleted(record_id),
+                    on_delete_error
+                )
+
+        def on_deleted(record_id):
+            # Mise à jour incrémentale: seule la ligne supprimée est retirée
+            # (déjà fait si la notification est arrivée avant)
+            if record_id in row_controls:
+                remove_rows([record_id])
+            page.snack_bar = ft.SnackBar(content=ft.Text("Enregistrement supprimé!"))
+            page.snack_bar.open = True
+            page.update()
 
         dialog = ft.AlertDialog(
             modal=True,
@@ -714,34 +1066,30 @@ def create_desktop_consultation_view(page: ft.Page):
         dialog.open = True
         page.update()
 
+    def on_delete_error(ex):
+        print(f"Error deleting record: {ex}")
+        page.snack_bar = ft.SnackBar(
+            content=ft.Text("Erreur lors de la suppression"),
+            bgcolor=ft.Colors.RED
+        )
+        page.snack_bar.open = True
+        page.update()
+
     def edit_record(e, record_id):
-        try:
-            conn = sqlite3.connect('pesees.db')
-            c = conn.cursor()
-            record = c.execute('SELECT * FROM pesees WHERE id = ?', (record_id,)).fetchone()
-            conn.close()
-
-            if record:
-                page.client_storage.set("record_to_edit", record)
-                page.go("/pesees")
-                
-        except Exception as ex:
-            print(f"Error in edit_record: {ex}")
-            page.snack_bar = ft.SnackBar(
-                content=ft.Text("Erreur lors de la modification"),
-                bgcolor=ft.Colors.RED
-            )
-            page.snack_bar.open = True
-            page.update()
+        # La route ne porte que l'id; la ligne est lue côté serveur
+        page.go(f"/pesees/{record_id}")
 
     load_data()
     
+    # Modifications publiées par les autres sessions, appliquées en direct
+    watch(page, apply_change)
+    
     # Boutons d'action modernes
     refresh_button = ft.IconButton(
         icon=ft.Icons.REFRESH,  # Fix: uppercase Icons
         tooltip="Actualiser",
         icon_color=ft.Colors.WHITE,  # Fix: uppercase Colors
-        on_click=lambda _: load_data()
+        on_click=lambda _: show_page()
     )
 
     search_toggle_button = ft.IconButton(
@@ -771,15 +1119,22 @@ def create_desktop_consultation_view(page: ft.Page):
         ft.Column(
             [
                 search_container,
-                ft.Container(
-                    content=add_button,
-                    alignment=ft.alignment.center_right,
-                    padding=10
-                ),
+                ft.Row([
+                    selection.bar,
+                    ft.Container(expand=True),
+                    ft.Container(content=add_button, padding=10),
+                ]),
+                progress_bar,
                 ft.Card(
                     content=consultation_table,
                     elevation=0,
                 ),
+                ft.Row(
+                    [page_size_dropdown, prev_button, page_label, next_button],
+                    alignment=ft.MainAxisAlignment.END,
+                    vertical_alignment=ft.CrossAxisAlignment.CENTER,
+                    spacing=10,
+                ),
             ],
             spacing=20,
             scroll=ft.ScrollMode.AUTO,
@@ -788,7 +1143,7 @@ def create_desktop_consultation_view(page: ft.Page):
         ),
     ])
 
-    return ft.View(
+    view = ft.View(
         "/consultation",
         [
             ft.AppBar(
@@ -800,6 +1155,7 @@ def create_desktop_consultation_view(page: ft.Page):
                 bgcolor=theme["primary"],
                 actions=[
                     search_toggle_button,
+                    create_export_button(page, "pesees", lambda: current_filters, ft.Colors.WHITE),
                     refresh_button
                 ],
                 leading=ft.IconButton(
@@ -818,4 +1174,7 @@ def create_desktop_consultation_view(page: ft.Page):
         bgcolor=theme["background"],
         padding=0,
         spacing=0,
-    )
\ No newline at end of file
+    )
+    # Réutilisation par le cache de vues de la session
+    view.data = {"tables": ("pesees",), "on_change": apply_change, "refresh": show_page, "on_resize": None}
+    return view
\ No newline at end of file
@@ -0,0 +1,77 @@
+"""Indicateurs (KPI) de la page d'accueil, calculés une fois pour toutes les sessions.
+
+Le résultat est gardé en mémoire KPI_TTL secondes et invalidé dès qu'une
+écriture touche une table utilisée: cinquante écrans d'accueil ouverts
+coûtent un seul calcul, pas cinquante.
+"""
+import threading
+import time
+from datetime import datetime
+
+from changes import add_listener
+from database import conformity_stats, reception_repo, sheet_repo
+
+# Durée de vie (s) des indicateurs en cache; couvre aussi le changement de jour
+KPI_TTL = 60
+# Nombre d'anomalies récentes affichées
+LATEST_ANOMALIES = 5
+# Tables dont une modification invalide les indicateurs
+KPI_TABLES = ("pesees", "controle_reception", "sheet")
+
+
+class TTLCache:
+    """Valeur calculée à la demande, partagée entre threads, avec expiration.
+
+    Un seul thread recalcule à la fois; les autres attendent et lisent le
+    résultat au lieu de lancer le même calcul.
+    """
+
+    def __init__(self, compute, ttl):
+        self.compute = compute
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._value = None
+        self._expires = 0.0
+
+    def get(self):
+        with self._lock:
+            if self._value is None or time.monotonic() >= self._expires:
+                self._value = self.compute()
+                self._expires = time.monotonic() + self.ttl
+            return self._value
+
+    def invalidate(self):
+        with self._lock:
+            self._value = None
+
+
+def compute_kpis():
+    """Indicateurs du jour: pesées, taux de non-conformité, réceptions non
+    conformes, et dernières anomalies des sheets"""
+    today = datetime.now().strftime("%Y-%m-%d")
+    daily = conformity_stats.by_day(today)
+    nb_pesees = sum(row[2] for row in daily)
+    caisses = sum(row[3] for row in daily)
+    non_conformes = sum(row[5] for row in daily)
+    return {
+        "jour": today,
+        "nb_pesees": nb_pesees,
+        "taux_non_conformite": non_conformes / caisses if caisses else None,
+        "receptions_non_conformes": reception_repo.count_non_conformes(today),
+        "anomalies": sheet_repo.latest_anomalies(LATEST_ANOMALIES),
+    }
+
+
+kpi_cache = TTLCache(compute_kpis, KPI_TTL)
+
+
+def get_kpis():
+    return kpi_cache.get()
+
+
+def _on_change(table, op, record_id):
+    if table in KPI_TABLES:
+        kpi_cache.invalidate()
+
+
+add_listener(_on_change)
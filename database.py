@@ -0,0 +1,1397 @@
+import calendar
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from concurrent.futures import Future
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Optional
+
+from changes import DELETE, INSERT, UPDATE, add_listener, publish
+
+# Chemin de la base partagée par toutes les vues (surchargeable pour les benchmarks)
+DB_PATH = os.environ.get("PESEES_DB", "pesees.db")
+POOL_SIZE = 8
+POOL_TIMEOUT = 10
+# Attente maximale (ms) sur un verrou avant "database is locked"
+BUSY_TIMEOUT_MS = 5000
+# Taille du WAL (en pages) déclenchant un checkpoint automatique
+WAL_AUTOCHECKPOINT_PAGES = 1000
+# Intervalle (s) du checkpoint passif en arrière-plan
+CHECKPOINT_INTERVAL = 60
+# Nombre de lignes par page dans les vues de consultation
+PAGE_SIZE = 50
+# File d'écriture groupée: attente (s) pour regrouper les écritures soumises
+# ensemble, taille maximale d'un lot, et attente maximale d'un formulaire
+GROUP_COMMIT_DELAY = 0.005
+GROUP_COMMIT_MAX = 64
+WRITE_TIMEOUT = 30
+# Cache des lectures: nombre de résultats gardés, et taille maximale (lignes)
+# d'un résultat mis en cache
+QUERY_CACHE_SIZE = 256
+QUERY_CACHE_MAX_ROWS = 5000
+# Intervalle (s) entre deux contrôles des écritures d'autres processus
+QUERY_CACHE_CHECK_INTERVAL = 1.0
+
+# Nombre de commits faits par les pools de ce processus (voir QueryCache)
+_local_commits = 0
+_local_commits_lock = threading.Lock()
+
+
+def _count_local_commit():
+    global _local_commits
+    with _local_commits_lock:
+        _local_commits += 1
+
+
+class ConnectionPool:
+    """Pool de connexions SQLite partagé entre toutes les sessions Flet.
+
+    Les connexions sont ouvertes à la demande (jusqu'à `size`) puis réutilisées.
+    Chaque connexion garde un curseur réutilisable; le cache de requêtes
+    préparées de sqlite3 évite de recompiler les mêmes SELECT.
+    """
+
+    def __init__(self, path=None, size=POOL_SIZE):
+        self.path = path
+        self.size = size
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self._cache = None
+
+    @property
+    def cache(self):
+        """Cache des lectures faites sur ce pool (QueryCache), créé au premier usage"""
+        with self._lock:
+            if self._cache is None:
+                self._cache = QueryCache(self)
+            return self._cache
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            self.path or DB_PATH,
+            timeout=BUSY_TIMEOUT_MS / 1000,
+            check_same_thread=False,
+            cached_statements=256
+        )
+        configure_connection(conn)
+        return conn, conn.cursor()
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                try:
+                    return self._connect()
+                except Exception:
+                    self._created -= 1
+                    raise
+        try:
+            return self._idle.get(timeout=POOL_TIMEOUT)
+        except queue.Empty:
+            raise sqlite3.OperationalError(
+                f"Aucune connexion SQLite libre après {POOL_TIMEOUT} s "
+                f"(pool de {self.size} connexions)"
+            ) from None
+
+    def _release(self, entry):
+        self._idle.put(entry)
+
+    @contextmanager
+    def cursor(self):
+        """Prêter un curseur; commit si le bloc réussit, rollback sinon."""
+        entry = self._acquire()
+        conn, cur = entry
+        try:
+            yield cur
+            if conn.in_transaction:
+                conn.commit()
+                _count_local_commit()
+        except Exception:
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+        finally:
+            self._release(entry)
+
+    def close_all(self):
+        """Fermer toutes les connexions inactives (arrêt du serveur)."""
+        if self._cache is not None:
+            self._cache.close()
+        while True:
+            try:
+                conn, _ = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._created -= 1
+
+
+def configure_connection(conn):
+    """Réglages par connexion: attente sur verrou et fsync allégé en WAL"""
+    conn.execute(f'PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}')
+    # En WAL, NORMAL reste sûr (pas de corruption) et évite un fsync par commit
+    conn.execute('PRAGMA synchronous = NORMAL')
+
+
+pool = ConnectionPool()
+
+
+class GroupCommitWriter:
+    """Écrivain unique en arrière-plan pour les formulaires (group commit).
+
+    Les insertions et modifications soumises par les sessions sont mises en
+    file; le thread d'écriture les valide par lots de GROUP_COMMIT_MAX au plus,
+    une transaction par lot, au lieu d'une transaction (et d'une attente du
+    verrou d'écriture) par formulaire. Chaque soumission retourne un Future
+    dont le résultat est l'id de la ligne, disponible après le commit.
+    """
+
+    def __init__(self, pool: ConnectionPool, max_batch=GROUP_COMMIT_MAX, delay=GROUP_COMMIT_DELAY):
+        self.pool = pool
+        self.max_batch = max_batch
+        self.delay = delay
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="group-commit", daemon=True
+                )
+                self._thread.start()
+
+    def stop(self, timeout=None):
+        """Valider ce qui reste en file puis arrêter le thread d'écriture"""
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread is not None and thread.is_alive():
+            self._queue.put(None)
+            thread.join(timeout)
+
+    def submit(self, table, op, sql, params, record_id=None) -> Future:
+        """Mettre une écriture en file; le Future donne l'id de la ligne"""
+        future = Future()
+        self.start()
+        self._queue.put((table, op, sql, params, record_id, future))
+        return future
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            stopping = False
+            # Regrouper les écritures arrivées pendant GROUP_COMMIT_DELAY
+            deadline = time.monotonic() + self.delay
+            while len(batch) < self.max_batch:
+                try:
+                    item = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._commit(batch)
+            if stopping:
+                return
+
+    def _commit(self, batch):
+        results = []
+        try:
+            with self.pool.cursor() as c:
+                c.execute('BEGIN IMMEDIATE')
+                for table, op, sql, params, record_id, future in batch:
+                    # Un savepoint par écriture: une ligne refusée n'annule pas le lot
+                    c.execute('SAVEPOINT write_op')
+                    try:
+                        c.execute(sql, params)
+                        if op == INSERT:
+                            record_id = c.lastrowid
+                        results.append((future, table, op, record_id, None))
+                    except sqlite3.Error as e:
+                        c.execute('ROLLBACK TO write_op')
+                        results.append((future, table, op, record_id, e))
+                    c.execute('RELEASE write_op')
+        except Exception as e:
+            print(f"Group commit error: {e}")
+            for item in batch:
+                item[-1].set_exception(e)
+            return
+        for future, table, op, record_id, error in results:
+            if error is not None:
+                future.set_exception(error)
+                continue
+            future.set_result(record_id)
+            publish(table, op, record_id)
+
+
+writer = GroupCommitWriter(pool)
+
+_storage_lock = threading.Lock()
+_storage_ready = False
+_checkpoint_stop = threading.Event()
+
+
+def enable_wal(path=None):
+    """Passer le fichier en mode WAL (persistant) et régler l'auto-checkpoint.
+
+    Retourne le journal_mode effectivement actif.
+    """
+    conn = sqlite3.connect(path or DB_PATH, timeout=BUSY_TIMEOUT_MS / 1000)
+    try:
+        mode = conn.execute('PRAGMA journal_mode = WAL').fetchone()[0]
+        conn.execute(f'PRAGMA wal_autocheckpoint = {WAL_AUTOCHECKPOINT_PAGES}')
+        return mode
+    finally:
+        conn.close()
+
+
+def checkpoint(mode="PASSIVE"):
+    """Reporter le WAL dans la base; retourne (busy, pages_wal, pages_reportees)"""
+    with pool.cursor() as c:
+        return c.execute(f'PRAGMA wal_checkpoint({mode})').fetchone()
+
+
+def _checkpoint_loop():
+    while not _checkpoint_stop.wait(CHECKPOINT_INTERVAL):
+        try:
+            checkpoint("PASSIVE")
+        except Exception as e:
+            print(f"Checkpoint error: {e}")
+
+
+def init_storage():
+    """Initialiser le stockage une seule fois par processus.
+
+    Active le WAL pour que les lectures des vues de consultation ne soient plus
+    bloquées par les sauvegardes, puis lance le checkpoint périodique.
+    """
+    global _storage_ready
+    with _storage_lock:
+        if _storage_ready:
+            return
+        mode = enable_wal()
+        if mode.lower() != "wal":
+            print(f"WAL indisponible, journal_mode={mode}")
+        threading.Thread(target=_checkpoint_loop, name="wal-checkpoint", daemon=True).start()
+        _storage_ready = True
+
+
+def shutdown_storage():
+    """Vider la file d'écriture, arrêter le checkpoint périodique et tronquer
+    le WAL avant de fermer"""
+    writer.stop()
+    _checkpoint_stop.set()
+    try:
+        checkpoint("TRUNCATE")
+    except Exception as e:
+        print(f"Checkpoint error: {e}")
+    pool.close_all()
+
+
+def create_tables():
+    """Créer les tables métier si elles n'existent pas"""
+    with pool.cursor() as c:
+        # Table pesees existante
+        c.execute('''CREATE TABLE IF NOT EXISTS pesees
+                     (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                      date TEXT,
+                      produit TEXT,
+                      n_lot TEXT,
+                      ddf TEXT,
+                      ddp TEXT,
+                      nb_caisses_pesees INTEGER,
+                      intervalle_pesee TEXT,
+                      nb_caisses_conformes INTEGER,
+                      nb_caisses_non_conformes INTEGER,
+                      numero_caisse_non_conforme TEXT,
+                      anomalie_observee TEXT,
+                      created_by TEXT)''')
+
+        # Nouvelle table controle_reception
+        c.execute('''CREATE TABLE IF NOT EXISTS controle_reception
+                     (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                      date TEXT,
+                      heure TEXT,
+                      article TEXT,
+                      nature_article TEXT,
+                      n_lot TEXT,
+                      dlc TEXT,
+                      ddp TEXT,
+                      quantite_receptionnee INTEGER,
+                      conformite TEXT,
+                      non_conformite TEXT,
+                      reference TEXT,
+                      anomalie TEXT,
+                      created_by TEXT)''')
+
+        # Nouvelle table sheet
+        c.execute('''CREATE TABLE IF NOT EXISTS sheet
+                     (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                      date TEXT NOT NULL,
+                      produit TEXT NOT NULL,
+                      lot TEXT NOT NULL,
+                      qte_pesee_caisse INTEGER NOT NULL,
+                      anomalie TEXT,
+                      action_corrective TEXT,
+                      created_by TEXT NOT NULL,
+                      created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
+
+
+# Horodatages normalisés (secondes epoch) calculés par SQLite à partir des
+# dates saisies à la main. Ce sont des colonnes générées VIRTUAL: ajoutées par
+# ALTER TABLE, elles valent immédiatement pour les lignes existantes et sont
+# matérialisées dans leurs index. Une date illisible donne NULL.
+DATE_FORMATS = ("%Y-%m-%d", "%d/%m/%Y")
+
+
+def _iso_date_sql(column):
+    """Expression SQL ramenant 'JJ/MM/AAAA' à 'AAAA-MM-JJ' (ISO inchangé)"""
+    return (f"CASE WHEN {column} GLOB '[0-9][0-9]/[0-9][0-9]/[0-9][0-9][0-9][0-9]' "
+            f"THEN substr({column}, 7, 4) || '-' || substr({column}, 4, 2) || '-' || substr({column}, 1, 2) "
+            f"ELSE trim({column}) END")
+
+
+def _iso_time_sql(column):
+    """Expression SQL ramenant '8:30' / '8h30' à '08:30' ('00:00' si vide)"""
+    value = f"replace(trim(COALESCE({column}, '')), 'h', ':')"
+    return (f"CASE WHEN {value} = '' THEN '00:00' "
+            f"WHEN {value} GLOB '[0-9]:*' THEN '0' || {value} ELSE {value} END")
+
+
+def _epoch_sql(value):
+    return f"CAST(strftime('%s', {value}) AS INTEGER)"
+
+
+TIMESTAMP_COLUMNS = {
+    "pesees": ("date_ts", _epoch_sql(_iso_date_sql("date"))),
+    # Réception: date + heure, pour trier sur l'horodatage complet
+    "controle_reception": ("recu_ts", "COALESCE({}, {})".format(
+        _epoch_sql(_iso_date_sql("date") + " || ' ' || " + _iso_time_sql("heure")),
+        _epoch_sql(_iso_date_sql("date"))
+    )),
+    "sheet": ("date_ts", _epoch_sql(_iso_date_sql("date"))),
+}
+
+
+def ensure_timestamp_columns():
+    """Ajouter les colonnes d'horodatage générées absentes (migration des bases existantes)"""
+    with pool.cursor() as c:
+        for table, (column, expression) in TIMESTAMP_COLUMNS.items():
+            # table_xinfo liste aussi les colonnes générées, contrairement à table_info
+            columns = [row[1] for row in c.execute(f'PRAGMA table_xinfo({table})').fetchall()]
+            if column not in columns:
+                c.execute(f'''ALTER TABLE {table} ADD COLUMN {column} INTEGER
+                              GENERATED ALWAYS AS ({expression}) VIRTUAL''')
+
+
+def parse_date(value):
+    """Date saisie ('AAAA-MM-JJ' ou 'JJ/MM/AAAA') -> datetime; ValueError si illisible"""
+    value = (value or "").strip()
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+    raise ValueError(f"Date invalide: {value!r}")
+
+
+def to_timestamp(value, end_of_day=False):
+    """Date saisie -> secondes epoch, comme strftime('%s') côté SQLite.
+    Avec end_of_day, début du jour suivant (borne exclusive)."""
+    day = parse_date(value)
+    if end_of_day:
+        day += timedelta(days=1)
+    return calendar.timegm(day.timetuple())
+
+
+def date_prefix_bounds(value):
+    """Saisie désignant une année, un mois ou un jour ('2024', '2024-05',
+    '2024-05-03', '03/05/2024') -> (début, fin exclusive) en secondes epoch;
+    None pour un autre début de date"""
+    value = (value or "").strip()
+    try:
+        if re.fullmatch(r"\d{4}", value):
+            start, end = datetime(int(value), 1, 1), datetime(int(value) + 1, 1, 1)
+        elif re.fullmatch(r"\d{4}-\d{2}", value):
+            year, month = map(int, value.split("-"))
+            start = datetime(year, month, 1)
+            end = datetime(year + month // 12, month % 12 + 1, 1)
+        else:
+            start = parse_date(value)
+            end = start + timedelta(days=1)
+    except ValueError:
+        return None
+    return calendar.timegm(start.timetuple()), calendar.timegm(end.timetuple())
+
+
+def timestamp_range(column, date_from="", date_to=""):
+    """Filtre 'du ... au ...' (bornes incluses, facultatives) servi par un
+    parcours d'intervalle sur l'index de la colonne d'horodatage"""
+    clauses = []
+    params = []
+    if (date_from or "").strip():
+        clauses.append(f"{column} >= ?")
+        params.append(to_timestamp(date_from))
+    if (date_to or "").strip():
+        clauses.append(f"{column} < ?")
+        params.append(to_timestamp(date_to, end_of_day=True))
+    return " AND ".join(clauses), params
+
+
+def _normalize_sql(sql):
+    return " ".join(sql.split()).lower()
+
+
+def create_indexes(indexes):
+    """Créer les index {nom: CREATE INDEX ...} absents; un index du même nom
+    dont la définition diffère est recréé. Chaque migration passe sa propre
+    liste, figée (voir migrations.py)."""
+    with pool.cursor() as c:
+        existing = dict(c.execute(
+            "SELECT name, sql FROM sqlite_master WHERE type = 'index' AND name LIKE 'idx!_%' ESCAPE '!'"
+        ).fetchall())
+        changed = False
+        for name, sql in indexes.items():
+            current = existing.get(name)
+            if _normalize_sql(sql) == _normalize_sql(current or ""):
+                continue
+            if current is not None:
+                c.execute(f'DROP INDEX IF EXISTS {name}')
+            c.execute(sql)
+            changed = True
+        if changed:
+            # Mettre à jour les statistiques du planificateur pour les nouveaux index
+            c.execute('ANALYZE')
+
+
+# Index plein texte (trigrammes) des pesées, synchronisé par triggers.
+# Les trigrammes permettent une recherche "contient" indexée là où
+# LIKE '%x%' parcourt toute la table.
+SEARCH_COLUMNS = ("produit", "n_lot", "anomalie_observee", "numero_caisse_non_conforme")
+# Les trigrammes ne peuvent pas servir un terme de moins de 3 caractères
+MIN_SEARCH_TERM = 3
+
+
+def ensure_search_index():
+    """Créer la table pesees_fts et ses triggers, puis l'alimenter si elle est neuve"""
+    columns = ", ".join(SEARCH_COLUMNS)
+    new_values = ", ".join(f"new.{col}" for col in SEARCH_COLUMNS)
+    old_values = ", ".join(f"old.{col}" for col in SEARCH_COLUMNS)
+    with pool.cursor() as c:
+        exists = c.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'pesees_fts'"
+        ).fetchone()
+        c.execute(f'''CREATE VIRTUAL TABLE IF NOT EXISTS pesees_fts
+                      USING fts5({columns}, content='pesees', content_rowid='id',
+                                 tokenize='trigram')''')
+        c.execute(f'''CREATE TRIGGER IF NOT EXISTS pesees_fts_ai AFTER INSERT ON pesees BEGIN
+                          INSERT INTO pesees_fts(rowid, {columns}) VALUES (new.id, {new_values});
+                      END''')
+        c.execute(f'''CREATE TRIGGER IF NOT EXISTS pesees_fts_ad AFTER DELETE ON pesees BEGIN
+                          INSERT INTO pesees_fts(pesees_fts, rowid, {columns})
+                          VALUES ('delete', old.id, {old_values});
+                      END''')
+        c.execute(f'''CREATE TRIGGER IF NOT EXISTS pesees_fts_au AFTER UPDATE ON pesees BEGIN
+                          INSERT INTO pesees_fts(pesees_fts, rowid, {columns})
+                          VALUES ('delete', old.id, {old_values});
+                          INSERT INTO pesees_fts(rowid, {columns}) VALUES (new.id, {new_values});
+                      END''')
+        if not exists:
+            c.execute("INSERT INTO pesees_fts(pesees_fts) VALUES ('rebuild')")
+
+
+def fts_phrase(value, column=None):
+    """Terme FTS5 littéral (guillemets échappés), éventuellement limité à une colonne"""
+    phrase = '"' + value.replace('"', '""') + '"'
+    return f"{column} : {phrase}" if column else phrase
+
+
+# Agrégats quotidiens des pesées par produit, tenus à jour par triggers.
+# Le jour est tiré de date_ts (les dates illisibles ne sont pas agrégées).
+# Les taux de conformité par jour / semaine / produit se lisent alors sur
+# quelques lignes de pesees_daily au lieu de parcourir toute la table pesees.
+_DAILY_MEASURES = ("nb_caisses_pesees", "nb_caisses_conformes", "nb_caisses_non_conformes")
+
+
+def _daily_triggers():
+    """Instructions CREATE TRIGGER alimentant pesees_daily"""
+    def add(row):
+        values = ", ".join(f"COALESCE({row}.{col}, 0)" for col in _DAILY_MEASURES)
+        updates = ", ".join(f"{col} = {col} + excluded.{col}" for col in _DAILY_MEASURES)
+        return f'''INSERT INTO pesees_daily (jour, produit, nb_pesees, {", ".join(_DAILY_MEASURES)})
+                   SELECT date({row}.date_ts, 'unixepoch'), COALESCE({row}.produit, ''), 1, {values}
+                   WHERE {row}.date_ts IS NOT NULL
+                   ON CONFLICT (jour, produit) DO UPDATE SET
+                       nb_pesees = nb_pesees + 1, {updates};'''
+
+    def remove(row):
+        updates = ", ".join(f"{col} = {col} - COALESCE({row}.{col}, 0)" for col in _DAILY_MEASURES)
+        key = f"jour = date({row}.date_ts, 'unixepoch') AND produit = COALESCE({row}.produit, '')"
+        return f'''UPDATE pesees_daily SET nb_pesees = nb_pesees - 1, {updates} WHERE {key};
+                   DELETE FROM pesees_daily WHERE {key} AND nb_pesees <= 0;'''
+
+    watched = ", ".join(("date", "produit") + _DAILY_MEASURES)
+    return [
+        f'''CREATE TRIGGER IF NOT EXISTS pesees_daily_ai AFTER INSERT ON pesees BEGIN
+                {add("new")}
+            END''',
+        f'''CREATE TRIGGER IF NOT EXISTS pesees_daily_ad AFTER DELETE ON pesees BEGIN
+                {remove("old")}
+            END''',
+        f'''CREATE TRIGGER IF NOT EXISTS pesees_daily_au AFTER UPDATE OF {watched} ON pesees BEGIN
+                {remove("old")}
+                {add("new")}
+            END''',
+    ]
+
+
+def ensure_daily_aggregates():
+    """Créer pesees_daily et ses triggers, puis l'alimenter si elle est neuve.
+
+    À appeler après ensure_timestamp_columns (les triggers lisent date_ts).
+    """
+    with pool.cursor() as c:
+        exists = c.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'pesees_daily'"
+        ).fetchone()
+        c.execute('''CREATE TABLE IF NOT EXISTS pesees_daily
+                     (jour TEXT NOT NULL,
+                      produit TEXT NOT NULL,
+                      nb_pesees INTEGER NOT NULL DEFAULT 0,
+                      nb_caisses_pesees INTEGER NOT NULL DEFAULT 0,
+                      nb_caisses_conformes INTEGER NOT NULL DEFAULT 0,
+                      nb_caisses_non_conformes INTEGER NOT NULL DEFAULT 0,
+                      PRIMARY KEY (jour, produit)) WITHOUT ROWID''')
+        for trigger in _daily_triggers():
+            c.execute(trigger)
+        if not exists:
+            sums = ", ".join(f"SUM(COALESCE({col}, 0))" for col in _DAILY_MEASURES)
+            c.execute(f'''INSERT INTO pesees_daily
+                          (jour, produit, nb_pesees, {", ".join(_DAILY_MEASURES)})
+                          SELECT date(date_ts, 'unixepoch'), COALESCE(produit, ''), COUNT(*), {sums}
+                          FROM pesees WHERE date_ts IS NOT NULL
+                          GROUP BY 1, 2''')
+
+# Nombre maximal d'ids par clause IN (...) (limite de variables SQLite)
+ID_CHUNK_SIZE = 500
+
+
+def _id_chunks(ids):
+    ids = list(dict.fromkeys(ids))
+    for start in range(0, len(ids), ID_CHUNK_SIZE):
+        yield ids[start:start + ID_CHUNK_SIZE]
+
+
+def _set_clause(values, editable):
+    """'col=?, ...' et paramètres d'une modification groupée (colonnes vérifiées)"""
+    unknown = [col for col in values if col not in editable]
+    if unknown or not values:
+        raise ValueError(f"Colonne(s) non modifiable(s): {', '.join(unknown) or '(aucune)'}")
+    return ", ".join(f"{col}=?" for col in values), list(values.values())
+
+
+class QueryCache:
+    """Cache LRU des résultats de lecture d'un pool, indexé par (requête, paramètres).
+
+    Chaque table a un compteur de génération, incrémenté à chaque écriture
+    publiée (après le commit). Un résultat est gardé avec les générations
+    des tables lues au moment de la requête; il n'est réutilisé que si aucune
+    de ces tables n'a été modifiée depuis, sans passer par SQLite.
+
+    Les écritures d'un autre processus (import en ligne de commande, seconde
+    instance) ne sont pas publiées ici. PRAGMA data_version est relu sur une
+    connexion dédiée, au plus une fois par QUERY_CACHE_CHECK_INTERVAL et hors
+    du verrou du cache; s'il a changé sans qu'aucun commit du processus ne
+    l'explique, l'écriture vient d'ailleurs et tout le cache devient périmé.
+    Une écriture extérieure tombant dans le même intervalle qu'un commit du
+    processus n'est vue qu'à la prochaine écriture extérieure.
+    """
+
+    def __init__(self, pool: ConnectionPool, size=QUERY_CACHE_SIZE, max_rows=QUERY_CACHE_MAX_ROWS):
+        self.pool = pool
+        self.size = size
+        self.max_rows = max_rows
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._generations = {}
+        # Époque incrémentée quand data_version change (écriture non publiée)
+        self._epoch = 0
+        self._data_version = None
+        self._local_commits = None
+        self._watcher = None
+        self._watch_lock = threading.Lock()
+        self._next_check = 0.0
+        _query_caches.add(self)
+
+    def _check_data_version(self):
+        now = time.monotonic()
+        # Un seul contrôle à la fois; les autres lectures ne l'attendent pas
+        if now < self._next_check or not self._watch_lock.acquire(blocking=False):
+            return
+        try:
+            self._next_check = now + QUERY_CACHE_CHECK_INTERVAL
+            # Relevé avant data_version: un commit local entre les deux est
+            # pris pour une écriture extérieure (invalidation de trop, sans risque)
+            commits = _local_commits
+            if self._watcher is None:
+                self._watcher = sqlite3.connect(
+                    self.pool.path or DB_PATH,
+                    timeout=BUSY_TIMEOUT_MS / 1000,
+                    check_same_thread=False
+                )
+            version = self._watcher.execute("PRAGMA data_version").fetchone()[0]
+            foreign = (self._data_version is not None and version != self._data_version
+                       and commits == self._local_commits)
+            self._data_version = version
+            self._local_commits = commits
+            if foreign:
+                with self._lock:
+                    self._epoch += 1
+        except sqlite3.Error as e:
+            print(f"Query cache check error: {e}")
+        finally:
+            self._watch_lock.release()
+
+    def _snapshot(self, tables):
+        return (self._epoch,) + tuple(self._generations.get(table, 0) for table in tables)
+
+    def fetchall(self, tables, query, params=(), fresh=False) -> list:
+        """Lignes de la requête, lues dans le cache si `tables` n'ont pas changé.
+        Avec fresh, la base est toujours relue (et le cache mis à jour)."""
+        key = (query, tuple(params))
+        self._check_data_version()
+        with self._lock:
+            # Générations relevées avant la lecture: une écriture concurrente
+            # rend le résultat périmé plutôt que de le faire passer pour frais
+            generations = self._snapshot(tables)
+            entry = None if fresh else self._entries.get(key)
+            if entry is not None and entry[0] == generations:
+                self._entries.move_to_end(key)
+                return list(entry[1])
+        with self.pool.cursor() as c:
+            rows = c.execute(query, params).fetchall()
+        if len(rows) <= self.max_rows:
+            with self._lock:
+                self._entries[key] = (generations, tuple(rows))
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.size:
+                    self._entries.popitem(last=False)
+        return rows
+
+    def fetchone(self, tables, query, params=(), fresh=False) -> Optional[tuple]:
+        rows = self.fetchall(tables, query, params, fresh)
+        return rows[0] if rows else None
+
+    def invalidate(self, table):
+        """Rendre périmés les résultats lisant `table`"""
+        with self._lock:
+            self._generations[table] = self._generations.get(table, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def close(self):
+        with self._lock:
+            self._entries.clear()
+        with self._watch_lock:
+            if self._watcher is not None:
+                self._watcher.close()
+                self._watcher = None
+                self._data_version = None
+
+
+# Caches ouverts (un par pool)
+_query_caches = weakref.WeakSet()
+
+
+def _invalidate_query_caches(table, op, record_id):
+    for cache in list(_query_caches):
+        cache.invalidate(table)
+
+
+# Les écritures publiées invalident les caches avant d'être diffusées aux vues
+add_listener(_invalidate_query_caches)
+
+
+def iter_query(query, params=(), batch_size=1000):
+    """Parcourir le résultat d'une requête par paquets de `batch_size` lignes
+    (mémoire constante quelle que soit la taille du résultat)"""
+    with pool.cursor() as c:
+        c.execute(query, params)
+        while True:
+            rows = c.fetchmany(batch_size)
+            if not rows:
+                break
+            yield from rows
+
+
+def explain_query_plan(query, params=()):
+    """Lignes 'detail' de EXPLAIN QUERY PLAN pour une requête"""
+    with pool.cursor() as c:
+        return [row[3] for row in c.execute(f'EXPLAIN QUERY PLAN {query}', params).fetchall()]
+
+
+def _escape_like(value):
+    return value.replace("!", "!!").replace("%", "!%").replace("_", "!_")
+
+
+def prefix_like(column, value):
+    """Filtre 'commence par' servi par un index NOCASE"""
+    return f"{column} LIKE ? ESCAPE '!'", f"{_escape_like(value)}%"
+
+
+def prefix_range(column, value):
+    """Filtre 'commence par' exprimé en intervalle sur un index BINARY
+    (ex. '2024-05' devient 2024-05 <= date < 2024-05 + U+10FFFF)"""
+    return f"{column} >= ? AND {column} < ?", (value, value + "\U0010ffff")
+
+
+class PeseesRepository:
+    """Accès à la table pesees"""
+
+    TABLE = "pesees"
+    COLUMNS = (
+        "date", "produit", "n_lot", "ddf", "ddp", "nb_caisses_pesees",
+        "intervalle_pesee", "nb_caisses_conformes", "nb_caisses_non_conformes",
+        "numero_caisse_non_conforme", "anomalie_observee", "created_by"
+    )
+    INSERT_SQL = f'''INSERT INTO pesees ({", ".join(COLUMNS)})
+                     VALUES ({", ".join("?" * len(COLUMNS))})'''
+    UPDATE_SQL = f'UPDATE pesees SET {", ".join(f"{col}=?" for col in COLUMNS)} WHERE id=?'
+
+    def __init__(self, pool: ConnectionPool):
+        self.pool = pool
+
+    @classmethod
+    def build_filter(cls, date_filter="", product_filter="", lot_filter="", text_filter="",
+                     date_from="", date_to=""):
+        """Filtres de consultation -> (clause WHERE, paramètres, expression MATCH).
+
+        - date: une année, un mois ou un jour devient un intervalle sur la
+          clé de tri DATE_KEY (toutes saisies confondues); tout autre début
+          de date reste un 'commence par' sur idx_pesees_date
+        - du / au: intervalle sur la clé de tri DATE_KEY, servi par
+          idx_pesees_date_key dans l'ordre de la pagination (ValueError si une
+          borne est illisible); les dates vides ou illisibles sont exclues
+        - produit / N° LOT: 'contient' via pesees_fts (3 caractères ou plus),
+          sinon 'commence par' sur les index NOCASE
+        - recherche libre: chaque mot est cherché dans les colonnes indexées
+          de pesees_fts; l'expression MATCH est None sans terme plein texte
+        """
+        clauses = []
+        params = []
+        match_terms = []
+        date_filter = (date_filter or "").strip()
+        bounds = date_prefix_bounds(date_filter) if date_filter else None
+        if bounds is not None:
+            clauses.append(f"{cls.DATE_KEY} >= ? AND {cls.DATE_KEY} < ?")
+            params.extend(bounds)
+        elif date_filter:
+            clause, values = prefix_range("pesees.date", date_filter)
+            clauses.append(clause)
+            params.extend(values)
+        clause, values = timestamp_range(cls.DATE_KEY, date_from, date_to)
+        if clause:
+            # DATE_KEY vaut 0 pour une date vide: "au ..." seul ne doit pas la retenir
+            clauses.append(clause + " AND pesees.date_ts IS NOT NULL")
+            params.extend(values)
+        for column, value in (("produit", product_filter), ("n_lot", lot_filter)):
+            value = (value or "").strip()
+            if not value:
+                continue
+            if len(value) >= MIN_SEARCH_TERM:
+                match_terms.append(fts_phrase(value, column))
+            else:
+                clause, pattern = prefix_like(f"pesees.{column}", value)
+                clauses.append(clause)
+                params.append(pattern)
+        for word in (text_filter or "").split():
+            if len(word) >= MIN_SEARCH_TERM:
+                match_terms.append(fts_phrase(word))
+            else:
+                pattern = f"%{_escape_like(word)}%"
+                clauses.append("(" + " OR ".join(
+                    f"pesees.{col} LIKE ? ESCAPE '!'" for col in SEARCH_COLUMNS
+                ) + ")")
+                params.extend([pattern] * len(SEARCH_COLUMNS))
+        match = " AND ".join(match_terms) or None
+        return " AND ".join(clauses) or "1=1", params, match
+
+    # Clé de tri chronologique: horodatage normalisé (date_ts), et non la date
+    # saisie, pour ranger ensemble 'JJ/MM/AAAA' et ISO. Jamais NULL (date vide
+    # ou illisible -> 0): la comparaison du curseur (clé, id) < (?, ?) doit
+    # rester vraie ou fausse, sinon ces lignes ne seraient sur aucune page.
+    # Servie par l'index d'expression idx_pesees_date_key.
+    DATE_KEY = "COALESCE(pesees.date_ts, 0)"
+    SUMMARY_COLUMNS = f"pesees.id, pesees.date, pesees.produit, pesees.n_lot, pesees.created_by, {DATE_KEY}"
+
+    @staticmethod
+    def is_ranked(text_filter=""):
+        """Vrai si la recherche libre trie par pertinence plutôt que par (date_ts, id)"""
+        return any(len(word) >= MIN_SEARCH_TERM for word in (text_filter or "").split())
+
+    def _source(self, date_filter, product_filter, lot_filter, text_filter, date_from, date_to):
+        """(FROM ... WHERE ..., paramètres, clés de tri, tri décroissant).
+
+        Avec une recherche libre, l'ordre est la pertinence bm25 (puis id
+        décroissant via -id); sinon (COALESCE(date_ts, 0), id) décroissants. Les deux clés
+        forment le curseur de pagination.
+        """
+        where, params, match = self.build_filter(
+            date_filter, product_filter, lot_filter, text_filter, date_from, date_to
+        )
+        if match is None:
+            return f"FROM pesees WHERE {where}", params, (self.DATE_KEY, "pesees.id"), True
+        source = f'''FROM pesees_fts JOIN pesees ON pesees.id = pesees_fts.rowid
+                     WHERE pesees_fts MATCH ? AND {where}'''
+        if self.is_ranked(text_filter):
+            return source, [match] + params, ("bm25(pesees_fts)", "-pesees.id"), False
+        return source, [match] + params, (self.DATE_KEY, "pesees.id"), True
+
+    def summary_query(self, date_filter="", product_filter="", lot_filter="", text_filter="",
+                      date_from="", date_to=""):
+        """Requête (sql, params) de la liste de consultation complète"""
+        source, params, keys, descending = self._source(
+            date_filter, product_filter, lot_filter, text_filter, date_from, date_to
+        )
+        direction = " DESC" if descending else ""
+        order = ", ".join(key + direction for key in keys)
+        return f"SELECT {self.SUMMARY_COLUMNS} {source} ORDER BY {order}", params
+
+    def page_query(self, date_filter="", product_filter="", lot_filter="", text_filter="",
+                   date_from="", date_to="", after=None, page_size=PAGE_SIZE):
+        """Requête (sql, params) d'une page en pagination par curseur (keyset).
+
+        Les lignes sont (id, date, produit, n_lot, created_by, date_ts, clé1,
+        clé2) et
+        `after` est le couple (clé1, clé2) de la dernière ligne de la page
+        précédente. Une ligne de plus que `page_size` est demandée pour savoir
+        s'il existe une page suivante.
+        """
+        source, params, keys, descending = self._source(
+            date_filter, product_filter, lot_filter, text_filter, date_from, date_to
+        )
+        if after is not None:
+            # (clé1, clé2) < (?, ?) développé: la borne sur clé1 seule donne un
+            # parcours d'intervalle sur l'index (SEARCH), pas un parcours complet
+            op = '<' if descending else '>'
+            source += f" AND {keys[0]} {op}= ? AND ({keys[0]} {op} ? OR {keys[1]} {op} ?)"
+            params = params + [after[0], after[0], after[1]]
+        direction = " DESC" if descending else ""
+        order = ", ".join(key + direction for key in keys)
+        return f'''SELECT {self.SUMMARY_COLUMNS}, {keys[0]}, {keys[1]} {source}
+                   ORDER BY {order} LIMIT ?''', params + [page_size + 1]
+
+    def export_query(self, date_filter="", product_filter="", lot_filter="", text_filter="",
+                     date_from="", date_to=""):
+        """Requête (sql, params) des lignes complètes (id, date, ..., created_by)
+        correspondant aux filtres, dans l'ordre de la consultation"""
+        source, params, keys, descending = self._source(
+            date_filter, product_filter, lot_filter, text_filter, date_from, date_to
+        )
+        direction = " DESC" if descending else ""
+        order = ", ".join(key + direction for key in keys)
+        columns = ", ".join(f"pesees.{col}" for col in self.COLUMNS)
+        return f"SELECT pesees.id, {columns} {source} ORDER BY {order}", params
+
+    def list_summary(self, date_filter="", product_filter="", lot_filter="", text_filter="",
+                     date_from="", date_to="") -> list:
+        """Lignes (id, date, produit, n_lot, created_by, date_ts) pour les vues de consultation"""
+        query, params = self.summary_query(
+            date_filter, product_filter, lot_filter, text_filter, date_from, date_to
+        )
+        return self.pool.cache.fetchall(("pesees",), query, params)
+
+    def list_page(self, date_filter="", product_filter="", lot_filter="", text_filter="",
+                  date_from="", date_to="", after=None, page_size=PAGE_SIZE):
+        """Une page de lignes (id, date, produit, n_lot, created_by, date_ts).
+
+        Retourne (lignes, curseur_suivant); le curseur est None sur la
+        dernière page.
+        """
+        query, params = self.page_query(
+            date_filter, product_filter, lot_filter, text_filter, date_from, date_to,
+            after, page_size
+        )
+        rows = self.pool.cache.fetchall(("pesees",), query, params)
+        next_cursor = tuple(rows[page_size - 1][6:]) if len(rows) > page_size else None
+        return [row[:6] for row in rows[:page_size]], next_cursor
+
+    def get_summary(self, record_id: int, date_filter="", product_filter="", lot_filter="",
+                    text_filter="", date_from="", date_to="") -> Optional[tuple]:
+        """Ligne (id, date, produit, n_lot, created_by, date_ts) de l'enregistrement s'il
+        correspond aux filtres, sinon None (mise à jour incrémentale des vues)"""
+        source, params, _, _ = self._source(
+            date_filter, product_filter, lot_filter, text_filter, date_from, date_to
+        )
+        return self.pool.cache.fetchone(
+            ("pesees",), f"SELECT {self.SUMMARY_COLUMNS} {source} AND pesees.id = ?",
+            params + [record_id]
+        )
+
+    def get(self, record_id: int, fresh=False) -> Optional[tuple]:
+        """Ligne complète (id, date, ..., created_by) ou None; fresh relit la
+        base (formulaire d'édition: jamais une version périmée)"""
+        return self.pool.cache.fetchone(
+            ("pesees",), f'SELECT id, {", ".join(self.COLUMNS)} FROM pesees WHERE id = ?',
+            (record_id,), fresh
+        )
+
+    def insert(self, values: dict) -> int:
+        with self.pool.cursor() as c:
+            c.execute(self.INSERT_SQL, [values.get(col) for col in self.COLUMNS])
+            record_id = c.lastrowid
+        publish("pesees", INSERT, record_id)
+        return record_id
+
+    def submit_insert(self, values: dict) -> Future:
+        """Insertion par la file d'écriture groupée; le Future donne le nouvel id"""
+        return writer.submit(
+            "pesees", INSERT, self.INSERT_SQL, [values.get(col) for col in self.COLUMNS]
+        )
+
+    def insert_many(self, rows, notify=True) -> int:
+        """Insérer une suite de dictionnaires de valeurs en une seule transaction
+        (executemany); une seule notification, sans id, pour tout le lot
+        (aucune si notify est faux: l'appelant publie lui-même, les caches
+        de lecture sont tout de même invalidés)"""
+        with self.pool.cursor() as c:
+            c.executemany(
+                self.INSERT_SQL,
+                ([values.get(col) for col in self.COLUMNS] for values in rows)
+            )
+            count = c.rowcount
+        if notify:
+            publish("pesees", INSERT, None)
+        else:
+            _invalidate_query_caches("pesees", INSERT, None)
+        return count
+
+    def update(self, record_id: int, values: dict) -> None:
+        with self.pool.cursor() as c:
+            c.execute(self.UPDATE_SQL, [values.get(col) for col in self.COLUMNS] + [record_id])
+        publish("pesees", UPDATE, record_id)
+
+    def submit_update(self, record_id: int, values: dict) -> Future:
+        """Modification par la file d'écriture groupée; le Future donne l'id"""
+        return writer.submit(
+            "pesees", UPDATE, self.UPDATE_SQL,
+            [values.get(col) for col in self.COLUMNS] + [record_id], record_id
+        )
+
+    def delete(self, record_id: int) -> None:
+        with self.pool.cursor() as c:
+            c.execute('DELETE FROM pesees WHERE id = ?', (record_id,))
+        publish("pesees", DELETE, record_id)
+
+    def delete_many(self, record_ids) -> int:
+        """Supprimer plusieurs enregistrements en une transaction (DELETE ... IN)"""
+        count = 0
+        with self.pool.cursor() as c:
+            for chunk in _id_chunks(record_ids):
+                c.execute(
+                    f'DELETE FROM pesees WHERE id IN ({", ".join("?" * len(chunk))})', chunk
+                )
+                count += c.rowcount
+        publish("pesees", DELETE, tuple(record_ids))
+        return count
+
+    def update_many(self, record_ids, values: dict) -> int:
+        """Donner les mêmes valeurs à plusieurs enregistrements en une transaction"""
+        assignments, params = _set_clause(values, self.COLUMNS[:-1])
+        count = 0
+        with self.pool.cursor() as c:
+            for chunk in _id_chunks(record_ids):
+                c.execute(
+                    f'''UPDATE pesees SET {assignments}
+                        WHERE id IN ({", ".join("?" * len(chunk))})''',
+                    params + chunk
+                )
+                count += c.rowcount
+        publish("pesees", UPDATE, tuple(record_ids))
+        return count
+
+
+class ReceptionRepository:
+    """Accès à la table controle_reception"""
+
+    TABLE = "controle_reception"
+    COLUMNS = (
+        "date", "heure", "article", "nature_article", "n_lot", "dlc", "ddp",
+        "quantite_receptionnee", "conformite", "non_conformite", "reference",
+        "anomalie", "created_by"
+    )
+    # Colonnes modifiables (created_by est conservé lors d'une modification)
+    EDITABLE = COLUMNS[:-1]
+    INSERT_SQL = f'''INSERT INTO controle_reception ({", ".join(COLUMNS)})
+                     VALUES ({", ".join("?" * len(COLUMNS))})'''
+    UPDATE_SQL = f'UPDATE controle_reception SET {", ".join(f"{col}=?" for col in EDITABLE)} WHERE id=?'
+    LIST_FIELDS = '''
+        SELECT id, date, heure, article, nature_article, n_lot,
+               dlc, ddp, quantite_receptionnee, conformite,
+               reference, anomalie, recu_ts
+        FROM controle_reception
+    '''
+    LIST_QUERY = LIST_FIELDS + "ORDER BY recu_ts DESC, id DESC"
+    EXPORT_QUERY = f'''SELECT id, {", ".join(COLUMNS)} FROM controle_reception
+                      ORDER BY recu_ts DESC, id DESC'''
+
+    def __init__(self, pool: ConnectionPool):
+        self.pool = pool
+
+    def list(self) -> list:
+        """Lignes (id, date, heure, article, nature_article, n_lot, dlc, ddp,
+        quantite_receptionnee, conformite, reference, anomalie, recu_ts)"""
+        return self.pool.cache.fetchall((self.TABLE,), self.LIST_QUERY)
+
+    def get_row(self, record_id: int) -> Optional[tuple]:
+        """Ligne au format de list() ou None"""
+        return self.pool.cache.fetchone((self.TABLE,), self.LIST_FIELDS + "WHERE id = ?", (record_id,))
+
+    def count_non_conformes(self, day) -> int:
+        """Nombre de réceptions 'non conforme' d'un jour (intervalle sur idx_reception_recu_ts)"""
+        clause, params = timestamp_range("recu_ts", day, day)
+        return self.pool.cache.fetchone(
+            ("controle_reception",),
+            f'''SELECT COUNT(*) FROM controle_reception
+                WHERE {clause} AND conformite = 'non conforme' COLLATE NOCASE''',
+            params
+        )[0]
+
+    def get(self, record_id: int, fresh=False) -> Optional[dict]:
+        """Enregistrement complet sous forme de dictionnaire ou None; fresh
+        relit la base (formulaire d'édition)"""
+        row = self.pool.cache.fetchone(
+            ("controle_reception",),
+            f'SELECT id, {", ".join(self.COLUMNS)} FROM controle_reception WHERE id = ?',
+            (record_id,), fresh
+        )
+        if row is None:
+            return None
+        return dict(zip(("id",) + self.COLUMNS, row))
+
+    def insert(self, values: dict) -> int:
+        with self.pool.cursor() as c:
+            c.execute(self.INSERT_SQL, [values.get(col) for col in self.COLUMNS])
+            record_id = c.lastrowid
+        publish("controle_reception", INSERT, record_id)
+        return record_id
+
+    def submit_insert(self, values: dict) -> Future:
+        """Insertion par la file d'écriture groupée; le Future donne le nouvel id"""
+        return writer.submit(
+            "controle_reception", INSERT, self.INSERT_SQL, [values.get(col) for col in self.COLUMNS]
+        )
+
+    def insert_many(self, rows, notify=True) -> int:
+        """Insérer une suite de dictionnaires de valeurs en une seule transaction
+        (executemany); une seule notification, sans id, pour tout le lot
+        (aucune si notify est faux: l'appelant publie lui-même, les caches
+        de lecture sont tout de même invalidés)"""
+        with self.pool.cursor() as c:
+            c.executemany(
+                self.INSERT_SQL,
+                ([values.get(col) for col in self.COLUMNS] for values in rows)
+            )
+            count = c.rowcount
+        if notify:
+            publish("controle_reception", INSERT, None)
+        else:
+            _invalidate_query_caches("controle_reception", INSERT, None)
+        return count
+
+    def update(self, record_id: int, values: dict) -> None:
+        with self.pool.cursor() as c:
+            c.execute(self.UPDATE_SQL, [values.get(col) for col in self.EDITABLE] + [record_id])
+        publish("controle_reception", UPDATE, record_id)
+
+    def submit_update(self, record_id: int, values: dict) -> Future:
+        """Modification par la file d'écriture groupée; le Future donne l'id"""
+        return writer.submit(
+            "controle_reception", UPDATE, self.UPDATE_SQL,
+            [values.get(col) for col in self.EDITABLE] + [record_id], record_id
+        )
+
+    def delete(self, record_id: int) -> None:
+        with self.pool.cursor() as c:
+            c.execute('DELETE FROM controle_reception WHERE id = ?', (record_id,))
+        publish("controle_reception", DELETE, record_id)
+
+    def delete_many(self, record_ids) -> int:
+        """Supprimer plusieurs enregistrements en une transaction (DELETE ... IN)"""
+        count = 0
+        with self.pool.cursor() as c:
+            for chunk in _id_chunks(record_ids):
+                c.execute(
+                    f'DELETE FROM controle_reception WHERE id IN ({", ".join("?" * len(chunk))})', chunk
+                )
+                count += c.rowcount
+        publish("controle_reception", DELETE, tuple(record_ids))
+        return count
+
+    def update_many(self, record_ids, values: dict) -> int:
+        """Donner les mêmes valeurs à plusieurs enregistrements en une transaction"""
+        assignments, params = _set_clause(values, self.EDITABLE)
+        count = 0
+        with self.pool.cursor() as c:
+            for chunk in _id_chunks(record_ids):
+                c.execute(
+                    f'''UPDATE controle_reception SET {assignments}
+                        WHERE id IN ({", ".join("?" * len(chunk))})''',
+                    params + chunk
+                )
+                count += c.rowcount
+        publish("controle_reception", UPDATE, tuple(record_ids))
+        return count
+
+
+class SheetRepository:
+    """Accès à la table sheet"""
+
+    TABLE = "sheet"
+    COLUMNS = (
+        "date", "produit", "lot", "qte_pesee_caisse", "anomalie",
+        "action_corrective", "created_by"
+    )
+    EDITABLE = COLUMNS[:-1]
+    INSERT_SQL = f'''INSERT INTO sheet ({", ".join(COLUMNS)})
+                     VALUES ({", ".join("?" * len(COLUMNS))})'''
+    UPDATE_SQL = f'UPDATE sheet SET {", ".join(f"{col}=?" for col in EDITABLE)} WHERE id=?'
+    LIST_FIELDS = f'SELECT id, {", ".join(EDITABLE)}, date_ts FROM sheet '
+    LIST_QUERY = LIST_FIELDS + "ORDER BY date_ts DESC, id DESC"
+    EXPORT_QUERY = f'SELECT id, {", ".join(COLUMNS)} FROM sheet ORDER BY date_ts DESC, id DESC'
+
+    def __init__(self, pool: ConnectionPool):
+        self.pool = pool
+
+    def list(self) -> list:
+        """Lignes (id, date, produit, lot, qte_pesee_caisse, anomalie, action_corrective, date_ts)"""
+        return self.pool.cache.fetchall((self.TABLE,), self.LIST_QUERY)
+
+    def get_row(self, record_id: int) -> Optional[tuple]:
+        """Ligne au format de list() ou None"""
+        return self.pool.cache.fetchone((self.TABLE,), self.LIST_FIELDS + "WHERE id = ?", (record_id,))
+
+    def latest_anomalies(self, limit=5) -> list:
+        """Dernières lignes (id, date, produit, lot, anomalie) ayant une anomalie"""
+        return self.pool.cache.fetchall(
+            ("sheet",),
+            '''SELECT id, date, produit, lot, anomalie FROM sheet
+               WHERE anomalie IS NOT NULL AND trim(anomalie) <> ''
+               ORDER BY date_ts DESC, id DESC LIMIT ?''',
+            (limit,)
+        )
+
+    def get(self, record_id: int, fresh=False) -> Optional[tuple]:
+        """Ligne complète (id, date, ..., created_by) ou None; fresh relit la
+        base (formulaire d'édition)"""
+        return self.pool.cache.fetchone(
+            ("sheet",), f'SELECT id, {", ".join(self.COLUMNS)} FROM sheet WHERE id = ?',
+            (record_id,), fresh
+        )
+
+    def insert(self, values: dict) -> int:
+        with self.pool.cursor() as c:
+            c.execute(self.INSERT_SQL, [values.get(col) for col in self.COLUMNS])
+            record_id = c.lastrowid
+        publish("sheet", INSERT, record_id)
+        return record_id
+
+    def submit_insert(self, values: dict) -> Future:
+        """Insertion par la file d'écriture groupée; le Future donne le nouvel id"""
+        return writer.submit(
+            "sheet", INSERT, self.INSERT_SQL, [values.get(col) for col in self.COLUMNS]
+        )
+
+    def insert_many(self, rows, notify=True) -> int:
+        """Insérer une suite de dictionnaires de valeurs en une seule transaction
+        (executemany); une seule notification, sans id, pour tout le lot
+        (aucune si notify est faux: l'appelant publie lui-même, les caches
+        de lecture sont tout de même invalidés)"""
+        with self.pool.cursor() as c:
+            c.executemany(
+                self.INSERT_SQL,
+                ([values.get(col) for col in self.COLUMNS] for values in rows)
+            )
+            count = c.rowcount
+        if notify:
+            publish("sheet", INSERT, None)
+        else:
+            _invalidate_query_caches("sheet", INSERT, None)
+        return count
+
+    def update(self, record_id: int, values: dict) -> None:
+        with self.pool.cursor() as c:
+            c.execute(self.UPDATE_SQL, [values.get(col) for col in self.EDITABLE] + [record_id])
+        publish("sheet", UPDATE, record_id)
+
+    def submit_update(self, record_id: int, values: dict) -> Future:
+        """Modification par la file d'écriture groupée; le Future donne l'id"""
+        return writer.submit(
+            "sheet", UPDATE, self.UPDATE_SQL,
+            [values.get(col) for col in self.EDITABLE] + [record_id], record_id
+        )
+
+    def delete(self, record_id: int) -> None:
+        with self.pool.cursor() as c:
+            c.execute('DELETE FROM sheet WHERE id = ?', (record_id,))
+        publish("sheet", DELETE, record_id)
+
+    def delete_many(self, record_ids) -> int:
+        """Supprimer plusieurs enregistrements en une transaction (DELETE ... IN)"""
+        count = 0
+        with self.pool.cursor() as c:
+            for chunk in _id_chunks(record_ids):
+                c.execute(
+                    f'DELETE FROM sheet WHERE id IN ({", ".join("?" * len(chunk))})', chunk
+                )
+                count += c.rowcount
+        publish("sheet", DELETE, tuple(record_ids))
+        return count
+
+    def update_many(self, record_ids, values: dict) -> int:
+        """Donner les mêmes valeurs à plusieurs enregistrements en une transaction"""
+        assignments, params = _set_clause(values, self.EDITABLE)
+        count = 0
+        with self.pool.cursor() as c:
+            for chunk in _id_chunks(record_ids):
+                c.execute(
+                    f'''UPDATE sheet SET {assignments}
+                        WHERE id IN ({", ".join("?" * len(chunk))})''',
+                    params + chunk
+                )
+                count += c.rowcount
+        publish("sheet", UPDATE, tuple(record_ids))
+        return count
+
+
+class UsersRepository:
+    """Accès à la table users"""
+
+    def __init__(self, pool: ConnectionPool):
+        self.pool = pool
+
+    def authenticate(self, username: str, password_hash: str) -> Optional[tuple]:
+        """(id, username, role) si les identifiants sont valides, sinon None"""
+        with self.pool.cursor() as c:
+            return c.execute('''SELECT id, username, role
+                                FROM users
+                                WHERE username = ? AND password = ?''',
+                             (username, password_hash)).fetchone()
+
+    def list(self) -> list:
+        """Lignes (id, username, role, created_at), les plus récentes d'abord"""
+        with self.pool.cursor() as c:
+            return c.execute('''SELECT id, username, role, created_at
+                                FROM users ORDER BY id DESC''').fetchall()
+
+    def create(self, username: str, password_hash: str, role: Optional[str] = None) -> int:
+        """Créer un utilisateur; lève sqlite3.IntegrityError si le nom existe déjà"""
+        with self.pool.cursor() as c:
+            if role is None:
+                c.execute('INSERT INTO users (username, password) VALUES (?, ?)',
+                          (username, password_hash))
+            else:
+                c.execute('INSERT INTO users (username, password, role) VALUES (?, ?, ?)',
+                          (username, password_hash, role))
+            return c.lastrowid
+
+    def delete(self, user_id: int) -> None:
+        with self.pool.cursor() as c:
+            c.execute('DELETE FROM users WHERE id = ?', (user_id,))
+
+
+class ConformityStats:
+    """Taux de conformité des pesées lus sur les agrégats pesees_daily.
+
+    Chaque ligne retournée est (période, produit, nb_pesees, nb_caisses_pesees,
+    nb_caisses_conformes, nb_caisses_non_conformes, taux_conformite); le taux
+    vaut None quand aucune caisse n'a été pesée.
+    """
+
+    MEASURES = """SUM(nb_pesees), SUM(nb_caisses_pesees), SUM(nb_caisses_conformes),
+                  SUM(nb_caisses_non_conformes),
+                  SUM(nb_caisses_conformes) * 1.0 / NULLIF(SUM(nb_caisses_pesees), 0)"""
+
+    def __init__(self, pool: ConnectionPool):
+        self.pool = pool
+
+    @staticmethod
+    def _day(value):
+        """Jour ISO d'une date saisie ('AAAA-MM-JJ' ou 'JJ/MM/AAAA')"""
+        return parse_date(value).strftime("%Y-%m-%d")
+
+    def day_query(self, day, product=None):
+        """Requête (sql, params) des taux par produit pour un jour"""
+        query = f"SELECT jour, produit, {self.MEASURES} FROM pesees_daily WHERE jour = ?"
+        params = [self._day(day)]
+        if product is not None:
+            query += " AND produit = ?"
+            params.append(product)
+        return query + " GROUP BY jour, produit ORDER BY produit", params
+
+    def week_query(self, day, product=None):
+        """Requête (sql, params) des taux par produit pour la semaine (lundi-dimanche)
+        contenant `day`; la période retournée est le lundi de la semaine"""
+        monday = parse_date(day)
+        monday -= timedelta(days=monday.weekday())
+        start = monday.strftime("%Y-%m-%d")
+        end = (monday + timedelta(days=7)).strftime("%Y-%m-%d")
+        query = f"""SELECT ?, produit, {self.MEASURES} FROM pesees_daily
+                    WHERE jour >= ? AND jour < ?"""
+        params = [start, start, end]
+        if product is not None:
+            query += " AND produit = ?"
+            params.append(product)
+        return query + " GROUP BY produit ORDER BY produit", params
+
+    def product_query(self, product, date_from="", date_to=""):
+        """Requête (sql, params) de la série quotidienne d'un produit, jours récents d'abord"""
+        query = f"SELECT jour, produit, {self.MEASURES} FROM pesees_daily WHERE produit = ?"
+        params = [product]
+        if (date_from or "").strip():
+            query += " AND jour >= ?"
+            params.append(self._day(date_from))
+        if (date_to or "").strip():
+            query += " AND jour <= ?"
+            params.append(self._day(date_to))
+        return query + " GROUP BY jour, produit ORDER BY jour DESC", params
+
+    def _fetch(self, query, params):
+        # pesees_daily est tenue à jour par les triggers de pesees
+        return self.pool.cache.fetchall(("pesees",), query, params)
+
+    def by_day(self, day, product=None) -> list:
+        return self._fetch(*self.day_query(day, product))
+
+    def by_week(self, day, product=None) -> list:
+        return self._fetch(*self.week_query(day, product))
+
+    def by_product(self, product, date_from="", date_to="") -> list:
+        return self._fetch(*self.product_query(product, date_from, date_to))
+
+
+pesees_repo = PeseesRepository(pool)
+reception_repo = ReceptionRepository(pool)
+sheet_repo = SheetRepository(pool)
+users_repo = UsersRepository(pool)
+conformity_stats = ConformityStats(pool)
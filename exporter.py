@@ -0,0 +1,168 @@
+"""Export des résultats de consultation en CSV ou XLSX.
+
+Les lignes sont lues par paquets (database.iter_query) et écrites au fil de
+l'eau dans le fichier: la mémoire reste constante quel que soit le nombre de
+lignes. Les XLSX utilisent le classeur write_only d'openpyxl (dépendance
+facultative). Les fichiers sont déposés dans EXPORT_DIR, servi par Flet
+comme dossier d'assets, puis ouverts dans le navigateur pour téléchargement.
+"""
+import csv
+import os
+import time
+import uuid
+from datetime import datetime
+
+import flet as ft
+
+from background import BackgroundTask
+from database import iter_query, pesees_repo, reception_repo, sheet_repo
+
+# Dossier d'assets de l'application (ft.app assets_dir)
+ASSETS_DIR = os.environ.get(
+    "PESEES_ASSETS", os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets")
+)
+EXPORT_DIR = os.path.join(ASSETS_DIR, "exports")
+# Durée de conservation (s) des fichiers exportés
+EXPORT_TTL = 3600
+
+EXPORT_HEADERS = {
+    "pesees": (
+        "ID", "Date", "Produit", "N° LOT", "DDF", "DDP", "Nb caisses pesées",
+        "Intervalle pesée", "Nb caisses conformes", "Nb caisses non conformes",
+        "N° caisse non conforme", "Anomalie observée", "Créé par"
+    ),
+    "controle_reception": (
+        "ID", "Date", "Heure", "Article", "Nature", "N° LOT", "DLC", "DDP",
+        "Quantité", "Conformité", "Non-conformité", "Référence", "Anomalie", "Créé par"
+    ),
+    "sheet": (
+        "ID", "Date", "Produit", "Lot", "Quantité pesée caisse", "Anomalie",
+        "Action corrective", "Créé par"
+    ),
+}
+
+
+def export_query(table, filters=()):
+    """Requête (sql, params) des lignes à exporter; `filters` suit l'ordre
+    des filtres de PeseesRepository (les autres tables n'en ont pas)"""
+    if table == "pesees":
+        return pesees_repo.export_query(*filters)
+    if table == "controle_reception":
+        return reception_repo.EXPORT_QUERY, []
+    if table == "sheet":
+        return sheet_repo.EXPORT_QUERY, []
+    raise ValueError(f"Table non exportable: {table}")
+
+
+def write_csv(path, headers, rows):
+    # utf-8-sig et ';' pour une ouverture directe dans Excel
+    with open(path, "w", newline="", encoding="utf-8-sig") as f:
+        writer = csv.writer(f, delimiter=";")
+        writer.writerow(headers)
+        writer.writerows(rows)
+
+
+def write_xlsx(path, headers, rows):
+    try:
+        from openpyxl import Workbook
+    except ImportError:
+        raise ValueError("L'export XLSX nécessite le paquet openpyxl")
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(headers)
+    for row in rows:
+        sheet.append(row)
+    workbook.save(path)
+
+
+WRITERS = {"csv": write_csv, "xlsx": write_xlsx}
+
+
+def _purge_old_exports():
+    limit = time.time() - EXPORT_TTL
+    for name in os.listdir(EXPORT_DIR):
+        path = os.path.join(EXPORT_DIR, name)
+        try:
+            if os.path.getmtime(path) < limit:
+                os.remove(path)
+        except OSError:
+            pass
+
+
+def export_to_file(table, fmt, filters=()):
+    """Écrire l'export dans EXPORT_DIR; retourne (nom_fichier, nb_lignes)"""
+    writer = WRITERS.get(fmt)
+    if writer is None:
+        raise ValueError(f"Format d'export inconnu: {fmt}")
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    _purge_old_exports()
+    query, params = export_query(table, filters)
+    # Nom imprévisible: le dossier d'assets est servi sans authentification
+    name = f"{table}_{datetime.now():%Y%m%d_%H%M%S}_{uuid.uuid4().hex[:12]}.{fmt}"
+    path = os.path.join(EXPORT_DIR, name)
+    count = 0
+
+    def counted(rows):
+        nonlocal count
+        for row in rows:
+            count += 1
+            yield row
+
+    rows = iter_query(query, params)
+    try:
+        writer(path, EXPORT_HEADERS[table], counted(rows))
+    except Exception:
+        if os.path.exists(path):
+            os.remove(path)
+        raise
+    finally:
+        # Rendre la connexion au pool même si l'écriture s'est arrêtée en route
+        rows.close()
+    return name, count
+
+
+def create_export_button(page: ft.Page, table, get_filters=None, icon_color=None):
+    """Menu 'Exporter' (CSV / XLSX) des vues de consultation.
+
+    get_filters() retourne les filtres actifs au moment du clic. Le fichier
+    est écrit sur le pool de threads.
+    """
+    export_task = BackgroundTask(page)
+
+    def do_export(fmt):
+        filters = get_filters() if get_filters else ()
+        page.snack_bar = ft.SnackBar(content=ft.Text("Export en cours..."))
+        page.snack_bar.open = True
+        page.update()
+        export_task.run(lambda: export_to_file(table, fmt, filters), on_exported, on_export_error)
+
+    def on_exported(result):
+        name, count = result
+        page.launch_url(f"/exports/{name}")
+        page.snack_bar = ft.SnackBar(
+            content=ft.Text(f"{count} ligne(s) exportée(s)"),
+            bgcolor=ft.Colors.GREEN
+        )
+        page.snack_bar.open = True
+        page.update()
+
+    def on_export_error(ex):
+        print(f"Error exporting {table}: {ex}")
+        page.snack_bar = ft.SnackBar(
+            content=ft.Text(f"Erreur lors de l'export: {str(ex)}"),
+            bgcolor=ft.Colors.RED
+        )
+        page.snack_bar.open = True
+        page.update()
+
+    return ft.PopupMenuButton(
+        icon=ft.Icons.DOWNLOAD,
+        icon_color=icon_color,
+        tooltip="Exporter",
+        items=[
+            ft.PopupMenuItem(text="Exporter en CSV", icon=ft.Icons.TABLE_CHART,
+                             on_click=lambda _: do_export("csv")),
+            ft.PopupMenuItem(text="Exporter en XLSX", icon=ft.Icons.GRID_ON,
+                             on_click=lambda _: do_export("xlsx")),
+        ]
+    )
@@ -1,38 +1,28 @@
 import flet as ft
+from background import BackgroundTask
+from changes import watch
+from dashboard import KPI_TABLES, get_kpis
+from responsive import ResponsiveLayout
+from sessions import current_username
 
 def create_home_view(page: ft.Page):
-    username = page.client_storage.get("username")
-    
-    # Pour le mode desktop, nous devons utiliser page.window_width
-    # Pour le mode web, nous utilisons page.width
-    def get_width():
-        if hasattr(page, "window_width") and page.window_width:
-            return page.window_width
-        elif page.width:
-            return page.width
-        else:
-            return 1000  # Valeur par défaut pour desktop
-    
-    def is_mobile():
-        width = get_width()
-        return width < 768
-    
-    # Fonction pour créer une carte de menu responsive
+    username = current_username(page)
+    
+    # Largeur et seuil mobile suivis par le gestionnaire de redimensionnement
+    layout = ResponsiveLayout(page, lambda mobile: apply_layout(mobile),
+                              lambda width: apply_widths(width), default_width=1000)
+    
+    # Fonction pour créer une carte de menu; tailles fixées par style_card
     def create_card(icon, title, description, route, color, bg_color):
-        mobile = is_mobile()
-        card_width = get_width() - 40 if mobile else 300
-        
         return ft.Container(
             content=ft.Column(
                 [
                     ft.Icon(
                         name=icon,
-                        size=40 if mobile else 50,
                         color=color
                     ),
                     ft.Text(
                         title,
-                        size=18 if mobile else 20,
                         weight=ft.FontWeight.BOLD,
                         text_align=ft.TextAlign.CENTER
                     ),
@@ -47,20 +37,27 @@ def create_home_view(page: ft.Page):
                         style=ft.ButtonStyle(
                             padding=15,
                             bgcolor=color
-                        ),
-                        width=card_width - 40 if mobile else None
+                        )
                     )
                 ],
-                horizontal_alignment=ft.CrossAxisAlignment.CENTER,
-                spacing=10 if mobile else 15
+                horizontal_alignment=ft.CrossAxisAlignment.CENTER
             ),
-            padding=15 if mobile else 20,
             bgcolor=bg_color,
-            border_radius=10,
-            width=card_width,
-            margin=ft.margin.only(bottom=10) if mobile else ft.margin.all(10)
+            border_radius=10
         )
     
+    # Tailles responsive d'une carte, modifiées en place
+    def style_card(card, mobile, width):
+        card_width = width - 40 if mobile else 300
+        icon, title, _, button = card.content.controls
+        icon.size = 40 if mobile else 50
+        title.size = 18 if mobile else 20
+        button.width = card_width - 40 if mobile else None
+        card.content.spacing = 10 if mobile else 15
+        card.padding = 15 if mobile else 20
+        card.width = card_width
+        card.margin = ft.margin.only(bottom=10) if mobile else ft.margin.all(10)
+    
     # Création des cartes
     pesees_card = create_card(
         ft.Icons.SCALE,
@@ -89,113 +86,126 @@ def create_home_view(page: ft.Page):
         ft.Colors.ORANGE_50
     )
     
-    # Créer le layout en fonction de la taille
-    mobile = is_mobile()
+    # Panneau d'indicateurs du jour (lu dans le cache partagé des KPI)
+    pesees_value = ft.Text("-", size=28, weight=ft.FontWeight.BOLD, color=ft.Colors.BLUE)
+    taux_value = ft.Text("-", size=28, weight=ft.FontWeight.BOLD, color=ft.Colors.RED)
+    receptions_value = ft.Text("-", size=28, weight=ft.FontWeight.BOLD, color=ft.Colors.GREEN)
+    anomalies_column = ft.Column(spacing=5)
     
-    if mobile:
-        cards_layout = ft.Column(
+    def create_kpi_tile(icon, label, value_text, color, bg_color):
+        return ft.Container(
+            content=ft.Column(
+                [
+                    ft.Icon(name=icon, color=color),
+                    value_text,
+                    ft.Text(label, size=14, text_align=ft.TextAlign.CENTER)
+                ],
+                horizontal_alignment=ft.CrossAxisAlignment.CENTER,
+                spacing=5
+            ),
+            padding=15,
+            bgcolor=bg_color,
+            border_radius=10,
+            width=200
+        )
+    
+    # Lecture des KPI sur le pool de threads
+    kpi_task = BackgroundTask(page)
+    
+    def fill_kpis(kpis):
+        pesees_value.value = str(kpis["nb_pesees"])
+        taux = kpis["taux_non_conformite"]
+        taux_value.value = f"{taux * 100:.1f} %" if taux is not None else "-"
+        receptions_value.value = str(kpis["receptions_non_conformes"])
+        anomalies_column.controls = [
+            ft.Text(f"{row[1]} - {row[2]} (lot {row[3]}): {row[4]}", size=14)
+            for row in kpis["anomalies"]
+        ] or [ft.Text("Aucune anomalie récente", size=14, italic=True)]
+    
+    kpi_panel = ft.Container(
+        content=ft.Column(
             [
-                pesees_card,
-                reception_card,
-                sheet_card
+                ft.Text("Indicateurs du jour", size=18, weight=ft.FontWeight.BOLD),
+                ft.Row(
+                    [
+                        create_kpi_tile(ft.Icons.SCALE, "Pesées du jour", pesees_value,
+                                        ft.Colors.BLUE, ft.Colors.BLUE_50),
+                        create_kpi_tile(ft.Icons.WARNING_AMBER, "Taux de non-conformité", taux_value,
+                                        ft.Colors.RED, ft.Colors.RED_50),
+                        create_kpi_tile(ft.Icons.RECEIPT_LONG, "Réceptions non conformes", receptions_value,
+                                        ft.Colors.GREEN, ft.Colors.GREEN_50),
+                    ],
+                    alignment=ft.MainAxisAlignment.CENTER,
+                    spacing=10,
+                    wrap=True
+                ),
+                ft.Text("Dernières anomalies (sheets)", size=16, weight=ft.FontWeight.BOLD),
+                anomalies_column
             ],
             horizontal_alignment=ft.CrossAxisAlignment.CENTER,
             spacing=10
-        )
-    else:
-        cards_layout = ft.Row(
-            [
-                pesees_card,
-                reception_card,
-                sheet_card
-            ],
-            alignment=ft.MainAxisAlignment.CENTER,
-            spacing=20,
-            wrap=True
-        )
+        ),
+        padding=15,
+        border=ft.border.all(1, ft.Colors.BLUE_100),
+        border_radius=10
+    )
     
-    # Gérer le redimensionnement pour le mode desktop
-    def on_resize(e):
-        nonlocal cards_layout
-        # Redétecter si on est en mode mobile
-        mobile = is_mobile()
-        
-        # Recréer les cartes
-        new_pesees_card = create_card(
-            ft.Icons.SCALE,
-            "Gestion des Pesées",
-            "Gérer les pesées et consultations",
-            "/pesees",
-            ft.Colors.BLUE,
-            ft.Colors.BLUE_50
-        )
-        
-        new_reception_card = create_card(
-            ft.Icons.RECEIPT_LONG,
-            "Contrôle de Réception",
-            "Gérer les contrôles de réception",
-            "/reception",
-            ft.Colors.GREEN,
-            ft.Colors.GREEN_50
-        )
-        
-        new_sheet_card = create_card(
-            ft.Icons.ASSIGNMENT,
-            "Sheet",
-            "Gérer les sheets",
-            "/sheet",
-            ft.Colors.ORANGE,
-            ft.Colors.ORANGE_50
-        )
-        
-        # Créer le nouveau layout
+    def on_data_change(table, op, record_id):
+        # Le cache est déjà invalidé: la première session recalcule, les autres relisent
+        if table in KPI_TABLES:
+            refresh_kpis()
+
+    def refresh_kpis():
+        kpi_task.run(get_kpis, show_kpis, on_kpis_error)
+    
+    def show_kpis(kpis):
+        fill_kpis(kpis)
+        if kpi_panel.page:
+            kpi_panel.update()
+    
+    def on_kpis_error(ex):
+        print(f"Error loading KPIs: {ex}")
+    
+    cards = [pesees_card, reception_card, sheet_card]
+    
+    # Disposition des cartes: colonne (mobile) ou ligne (desktop)
+    def create_cards_layout(mobile):
         if mobile:
-            new_layout = ft.Column(
-                [
-                    new_pesees_card,
-                    new_reception_card,
-                    new_sheet_card
-                ],
+            return ft.Column(
+                cards,
                 horizontal_alignment=ft.CrossAxisAlignment.CENTER,
                 spacing=10
             )
-        else:
-            new_layout = ft.Row(
-                [
-                    new_pesees_card,
-                    new_reception_card,
-                    new_sheet_card
-                ],
-                alignment=ft.MainAxisAlignment.CENTER,
-                spacing=20,
-                wrap=True
-            )
-        
-        # Mettre à jour le layout et le titre
-        content_column.controls[1] = new_layout
-        content_column.controls[0].size = 24 if mobile else 32
-        content_column.controls[0].update()
-        cards_layout = new_layout
-        
-        # Mettre à jour le padding du container
+        return ft.Row(
+            cards,
+            alignment=ft.MainAxisAlignment.CENTER,
+            spacing=20,
+            wrap=True
+        )
+    
+    # Seuil mobile franchi: mêmes cartes, nouvelle disposition
+    def apply_layout(mobile):
+        content_column.controls[2] = create_cards_layout(mobile)
+        title_text.size = 24 if mobile else 32
         main_container.padding = 15 if mobile else 50
-        main_container.update()
-        
-        page.update()
     
-    # Enregistrer le gestionnaire de redimensionnement pour desktop
-    page.on_resize = on_resize
+    # Même disposition: seules les largeurs changent
+    def apply_widths(width):
+        for card in cards:
+            style_card(card, layout.mobile, width)
+    
+    title_text = ft.Text(
+        f"Bienvenue {username}",
+        weight=ft.FontWeight.BOLD,
+        text_align=ft.TextAlign.CENTER
+    )
     
     # Créer le contenu principal
     content_column = ft.Column(
         [
-            ft.Text(
-                f"Bienvenue {username}",
-                size=24 if mobile else 32,
-                weight=ft.FontWeight.BOLD,
-                text_align=ft.TextAlign.CENTER
-            ),
-            cards_layout
+            title_text,
+            kpi_panel,
+            ft.Container()
         ],
         horizontal_alignment=ft.CrossAxisAlignment.CENTER,
         spacing=20
@@ -203,14 +213,32 @@ def create_home_view(page: ft.Page):
     
     main_container = ft.Container(
         content=content_column,
-        padding=15 if mobile else 50,
         expand=True
     )
     
-    return ft.View(
+    apply_layout(layout.mobile)
+    apply_widths(layout.width)
+    # Enregistrer le gestionnaire de redimensionnement
+    layout.attach()
+    
+    # Premier chargement des indicateurs, affichés à leur arrivée
+    refresh_kpis()
+    
+    # Indicateurs rafraîchis en direct lors des écritures
+    watch(page, on_data_change)
+    
+    view = ft.View(
         "/home",
         [
             main_container
         ],
         scroll=ft.ScrollMode.AUTO
-    )
\ No newline at end of file
+    )
+    # Réutilisation par le cache de vues de la session
+    view.data = {
+        "tables": KPI_TABLES,
+        "on_change": on_data_change,
+        "refresh": refresh_kpis,
+        "on_resize": layout.on_resize,
+    }
+    return view
\ No newline at end of file
@@ -0,0 +1,275 @@
+"""Import en masse de pesées, contrôles de réception et sheets (CSV ou XLSX).
+
+Le fichier est lu ligne à ligne (jamais chargé en entier), chaque ligne est
+validée, et les lignes valides sont écrites par lots de IMPORT_CHUNK_SIZE
+avec executemany, un lot par transaction. Les lignes invalides sont
+ignorées et rapportées avec leur numéro de ligne.
+
+    python importer.py pesees historique.csv [--user admin]
+"""
+import argparse
+import csv
+import os
+import unicodedata
+from datetime import date, datetime, time
+from itertools import islice
+
+from changes import INSERT, publish
+from database import parse_date, pesees_repo, reception_repo, sheet_repo
+
+# Dossier de réception des fichiers envoyés depuis le navigateur (ft.app upload_dir)
+UPLOAD_DIR = os.environ.get(
+    "PESEES_UPLOADS", os.path.join(os.path.dirname(os.path.abspath(__file__)), "uploads")
+)
+# Nombre de lignes écrites par transaction
+IMPORT_CHUNK_SIZE = 5000
+# Nombre maximal d'erreurs conservées dans le rapport
+MAX_REPORTED_ERRORS = 1000
+
+# Description de chaque table importable: dépôt, colonnes obligatoires,
+# colonnes entières / dates, et libellés des formulaires acceptés en en-tête
+IMPORT_TARGETS = {
+    "pesees": {
+        "repo": pesees_repo,
+        "required": ("date", "produit", "n_lot"),
+        "integers": ("nb_caisses_pesees", "nb_caisses_conformes", "nb_caisses_non_conformes"),
+        "dates": ("date",),
+        "labels": {
+            "n lot": "n_lot",
+            "n° lot": "n_lot",
+            "nombre des caisses pesees": "nb_caisses_pesees",
+            "intervalle de la pesee": "intervalle_pesee",
+            "nombre des caisses conformes": "nb_caisses_conformes",
+            "nombre des caisses non conforme": "nb_caisses_non_conformes",
+            "numero de la caisse non-conforme": "numero_caisse_non_conforme",
+            "anomalie observee": "anomalie_observee",
+        },
+    },
+    "controle_reception": {
+        "repo": reception_repo,
+        "required": ("date", "article", "n_lot"),
+        "integers": ("quantite_receptionnee",),
+        "dates": ("date",),
+        "labels": {
+            "article receptionne": "article",
+            "nature d'article (mp/adc/adc/i/consommable)": "nature_article",
+            "nature": "nature_article",
+            "n° lot": "n_lot",
+            "qte receptionnee": "quantite_receptionnee",
+            "quantite": "quantite_receptionnee",
+            "etat de la reception": "conformite",
+            "anomalie ou non-conformite": "anomalie",
+        },
+    },
+    "sheet": {
+        "repo": sheet_repo,
+        "required": ("date", "produit", "lot", "qte_pesee_caisse"),
+        "integers": ("qte_pesee_caisse",),
+        "dates": ("date",),
+        "labels": {
+            "quantite pesee caisse": "qte_pesee_caisse",
+            "quantite": "qte_pesee_caisse",
+            "action corrective": "action_corrective",
+        },
+    },
+}
+
+
+class ImportReport:
+    """Résultat d'un import: lignes insérées et erreurs (n° de ligne, message)"""
+
+    def __init__(self):
+        self.inserted = 0
+        self.rejected = 0
+        self.errors = []
+
+    def add_error(self, line, message):
+        self.rejected += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((line, message))
+
+    def summary(self):
+        return f"{self.inserted} ligne(s) importée(s), {self.rejected} rejetée(s)"
+
+
+def _normalize_header(name):
+    """Nom de colonne sans accents ni casse, pour reconnaître les libellés"""
+    name = unicodedata.normalize("NFKD", str(name or "")).encode("ascii", "ignore").decode()
+    return " ".join(name.lower().replace("_", " ").split())
+
+
+def _column_map(target, headers):
+    """Index de colonne du fichier -> colonne de la table (colonnes inconnues ignorées)"""
+    columns = target["repo"].COLUMNS
+    aliases = {_normalize_header(col): col for col in columns}
+    aliases.update({_normalize_header(label): col for label, col in target["labels"].items()})
+    mapping = {}
+    for index, header in enumerate(headers):
+        column = aliases.get(_normalize_header(header))
+        if column is not None and column != "created_by":
+            mapping[index] = column
+    return mapping
+
+
+def _read_csv(path):
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        sample = f.read(4096)
+        f.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=";,\t")
+        except csv.Error:
+            dialect = csv.excel
+        yield from csv.reader(f, dialect)
+
+
+def _read_xlsx(path):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ValueError("L'import XLSX nécessite le paquet openpyxl")
+    # read_only: les lignes sont lues à la demande, sans charger la feuille
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        for row in workbook.worksheets[0].iter_rows(values_only=True):
+            yield list(row)
+    finally:
+        workbook.close()
+
+
+def read_rows(path):
+    """Lignes brutes (listes de cellules) du fichier, en-tête compris"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension in (".xlsx", ".xlsm"):
+        return _read_xlsx(path)
+    if extension in (".csv", ".txt"):
+        return _read_csv(path)
+    raise ValueError(f"Format non pris en charge: {extension or path}")
+
+
+def _cell_text(value):
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+def _convert(target, column, value):
+    """Valeur d'une cellule pour `column` (None si vide), ou ValueError"""
+    if column in target["dates"]:
+        if isinstance(value, (datetime, date)):
+            value = value.strftime("%Y-%m-%d")
+        elif _cell_text(value):
+            # Dates enregistrées au format ISO, comme les formulaires
+            value = parse_date(_cell_text(value)).strftime("%Y-%m-%d")
+    elif column in target["integers"]:
+        text = _cell_text(value)
+        if text:
+            try:
+                value = int(text)
+            except ValueError:
+                raise ValueError(f"{column}: nombre entier attendu ({text!r})")
+        else:
+            value = None
+    elif isinstance(value, time):
+        value = value.strftime("%H:%M")
+    else:
+        value = _cell_text(value)
+    return value if value != "" else None
+
+
+def validate_row(target, mapping, cells):
+    """Valeurs (dict) d'une ligne, ou lève ValueError avec le motif du rejet"""
+    values = {}
+    for index, column in mapping.items():
+        values[column] = _convert(target, column, cells[index] if index < len(cells) else None)
+    missing = [col for col in target["required"] if values.get(col) is None]
+    if missing:
+        raise ValueError(f"champ(s) obligatoire(s) vide(s): {', '.join(missing)}")
+    return values
+
+
+def validate_value(table, column, value):
+    """Valeur d'une modification groupée, validée comme une cellule importée
+    (dates ramenées en ISO, entiers); ValueError si elle est illisible ou si
+    elle vide une colonne obligatoire"""
+    target = IMPORT_TARGETS[table]
+    value = _convert(target, column, value)
+    if value is None and column in target["required"]:
+        raise ValueError(f"{column}: champ obligatoire, il ne peut pas être vidé")
+    return value
+
+
+def import_file(table, path, username="import", chunk_size=IMPORT_CHUNK_SIZE, on_progress=None):
+    """Importer le fichier `path` dans `table`; retourne un ImportReport.
+
+    on_progress(lignes_lues) est appelé après chaque lot écrit. Une seule
+    notification est publiée à la fin de l'import (même interrompu), pour que
+    les vues ouvertes ne relisent leur liste qu'une fois.
+    """
+    target = IMPORT_TARGETS.get(table)
+    if target is None:
+        raise ValueError(f"Table non importable: {table}")
+    report = ImportReport()
+    rows = read_rows(path)
+    headers = next(rows, None)
+    if headers is None:
+        raise ValueError("Fichier vide")
+    mapping = _column_map(target, headers)
+    if not mapping:
+        raise ValueError("Aucune colonne reconnue dans l'en-tête")
+    missing = [col for col in target["required"] if col not in mapping.values()]
+    if missing:
+        raise ValueError(f"Colonne(s) obligatoire(s) absente(s): {', '.join(missing)}")
+
+    line = 1
+
+    def valid_values(chunk):
+        nonlocal line
+        for cells in chunk:
+            line += 1
+            if not any(_cell_text(cell) for cell in cells):
+                continue
+            try:
+                values = validate_row(target, mapping, cells)
+            except ValueError as e:
+                report.add_error(line, str(e))
+                continue
+            values["created_by"] = username
+            yield values
+
+    try:
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                break
+            report.inserted += target["repo"].insert_many(valid_values(chunk), notify=False)
+            if on_progress:
+                on_progress(line - 1)
+    finally:
+        if report.inserted:
+            publish(target["repo"].TABLE, INSERT, None)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import en masse CSV / XLSX")
+    parser.add_argument("table", choices=sorted(IMPORT_TARGETS))
+    parser.add_argument("path")
+    parser.add_argument("--user", default="import", help="valeur de created_by")
+    parser.add_argument("--chunk-size", type=int, default=IMPORT_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    from database import init_storage
+    from migrations import migrate
+    init_storage()
+    migrate()
+
+    report = import_file(args.table, args.path, args.user, args.chunk_size)
+    print(report.summary())
+    for line, message in report.errors:
+        print(f"  ligne {line}: {message}")
+
+
+if __name__ == "__main__":
+    main()
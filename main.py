@@ -1,80 +1,66 @@
+import importlib
 import flet as ft
-import sqlite3
-from add_form import create_add_view
-from consultation_view import create_consultation_view
-from consultation_reception_view import create_consultation_reception_view
-from auth_view import create_auth_database, create_login_view, create_register_view
-from admin_view import create_user_management_view, is_admin
-from reception_form import create_reception_view
-from home_view import create_home_view
-from sheet_form import create_sheet_view
-from consultation_sheet_view import create_consultation_sheet_view
+from background import BackgroundTask
+from changes import add_listener, bind_pubsub, remove_listener, unwatch, watch
+from sessions import current_username, is_admin, is_authenticated, logout
+from view_cache import ViewCache, is_cacheable
+from database import init_storage, pesees_repo, reception_repo, sheet_repo, shutdown_storage
+from migrations import migrate
 
-def create_database():
-    conn = sqlite3.connect('pesees.db')
-    c = conn.cursor()
-    
-    # Table pesees existante
-    c.execute('''CREATE TABLE IF NOT EXISTS pesees
-                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                  date TEXT,
-                  produit TEXT,
-                  n_lot TEXT,
-                  ddf TEXT,
-                  ddp TEXT,
-                  nb_caisses_pesees INTEGER,
-                  intervalle_pesee TEXT,
-                  nb_caisses_conformes INTEGER,
-                  nb_caisses_non_conformes INTEGER,
-                  numero_caisse_non_conforme TEXT,
-                  anomalie_observee TEXT,
-                  created_by TEXT)''')
-    
-    # Nouvelle table controle_reception
-    c.execute('''CREATE TABLE IF NOT EXISTS controle_reception
-                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                  date TEXT,
-                  heure TEXT,
-                  article TEXT,
-                  nature_article TEXT,
-                  n_lot TEXT,
-                  dlc TEXT,
-                  ddp TEXT,
-                  quantite_receptionnee INTEGER,
-                  conformite TEXT,
-                  non_conformite TEXT,
-                  reference TEXT,
-                  anomalie TEXT,
-                  created_by TEXT)''')
-    
-    # Nouvelle table sheet
-    c.execute('''CREATE TABLE IF NOT EXISTS sheet
-                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                  date TEXT NOT NULL,
-                  produit TEXT NOT NULL,
-                  lot TEXT NOT NULL,
-                  qte_pesee_caisse INTEGER NOT NULL,
-                  anomalie TEXT,
-                  action_corrective TEXT,
-                  created_by TEXT NOT NULL,
-                  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
-    
-    conn.commit()
-    conn.close()
+# Fabriques de vues et module qui les définit. Les modules ne sont importés
+# qu'à la première navigation vers leur route: l'écran de connexion
+# s'affiche sans attendre le chargement de toutes les vues. Importés par leur
+# nom, ils sont à déclarer à l'empaquetage (flet pack --hidden-import).
+VIEW_MODULES = {
+    "create_login_view": "auth_view",
+    "create_register_view": "auth_view",
+    "create_home_view": "home_view",
+    "create_add_view": "add_form",
+    "create_consultation_view": "consultation_view",
+    "create_consultation_reception_view": "consultation_reception_view",
+    "create_user_management_view": "admin_view",
+    "create_reception_view": "reception_form",
+    "create_sheet_view": "sheet_form",
+    "create_consultation_sheet_view": "consultation_sheet_view",
+}
+_view_factories = {}
+
+def view_factory(name):
+    """Fabrique de vue `name`, son module étant importé au premier appel"""
+    factory = _view_factories.get(name)
+    if factory is None:
+        factory = getattr(importlib.import_module(VIEW_MODULES[name]), name)
+        _view_factories[name] = factory
+    return factory
+
+def route_record_id(page, base):
+    """Id désigné par une route d'édition /<base>/<id>.
 
-def is_authenticated(page):
-    """Vérifier si l'utilisateur est authentifié"""
+    Retourne (True, id) pour une route d'édition (id None s'il est
+    illisible), (False, None) pour la route de création /<base>. Seul l'id
+    transite par le navigateur; la ligne est relue en base par show_form.
+    """
+    troute = ft.TemplateRoute(page.route)
+    if not troute.match(f"/{base}/:id"):
+        return False, None
     try:
-        auth_status = page.client_storage.get("authenticated")
-        return auth_status == "true"
-    except:
-        return False
+        return True, int(troute.id)
+    except ValueError:
+        return True, None
+
+def show_not_found(page, route):
+    page.snack_bar = ft.SnackBar(
+        content=ft.Text("Enregistrement non trouvé"),
+        bgcolor=ft.Colors.RED
+    )
+    page.snack_bar.open = True
+    page.go(route)
 
 def create_logout_button(page):
     """Créer un bouton de déconnexion"""
     def handle_logout(e):
-        # Effacer le stockage client
-        page.client_storage.clear()
+        # Fermer la session serveur
+        logout(page)
         page.snack_bar = ft.SnackBar(
             content=ft.Text("Déconnexion réussie!"),
             bgcolor=ft.Colors.ORANGE
@@ -82,7 +68,7 @@ def create_logout_button(page):
         page.snack_bar.open = True
         page.go("/login")
     
-    username = page.client_storage.get("username") or "Utilisateur"
+    username = current_username(page, "Utilisateur")
     
     return ft.PopupMenuButton(
         icon=ft.Icons.PERSON,  # Changed from icons to Icons
@@ -160,41 +146,136 @@ def main(page: ft.Page):
         page.window_height = 800
         page.window_resizable = True
     
-    # Create databases first to avoid delays
-    try:
-        create_database()
-        create_auth_database()
-    except Exception as e:
-        print(f"Database error: {e}")
+    # Diffusion des modifications de données à toutes les sessions ouvertes
+    bind_pubsub(page.pubsub)
+    
+    # Vues déjà construites de cette session, réutilisées par route_change
+    view_cache = ViewCache()
+    add_listener(view_cache.on_change)
+    
+    # Session serveur et vues oubliées à la fermeture de la session Flet
+    def close_session(e):
+        remove_listener(view_cache.on_change)
+        view_cache.clear()
+        logout(page)
+    
+    page.on_close = close_session
+    
+    # Lecture de l'enregistrement d'une route d'édition sur le pool de threads
+    record_task = BackgroundTask(page)
+    
+    def append_form(factory_name, record):
+        view = view_factory(factory_name)(page, record)
+        view.appbar = create_main_app_bar(page)
+        page.views.append(view)
+    
+    def show_form(base, repo, factory_name, back_route):
+        """Formulaire de création (/<base>) ou d'édition (/<base>/<id>).
+        
+        La ligne éditée est relue en base (jamais le cache, pour ne pas
+        écraser une modification plus récente) hors du gestionnaire de route;
+        une vue d'attente est affichée entre-temps.
+        """
+        editing, record_id = route_record_id(page, base)
+        if not editing:
+            append_form(factory_name, None)
+            return
+        route = page.route
+        page.views.append(ft.View(route, [ft.ProgressBar()], appbar=create_main_app_bar(page)))
+        record_task.run(
+            lambda: repo.get(record_id, fresh=True) if record_id is not None else None,
+            lambda record: show_record(route, factory_name, record, back_route),
+            lambda ex: show_record_error(route, back_route, ex)
+        )
+    
+    def show_record(route, factory_name, record, back_route):
+        if page.route != route:
+            return
+        if record is None:
+            show_not_found(page, back_route)
+            return
+        page.views.clear()
+        append_form(factory_name, record)
+        page.update()
+    
+    def show_record_error(route, back_route, ex):
+        print(f"Route error: {ex}")
+        if page.route == route:
+            show_not_found(page, back_route)
+    
+    def show_cached(route, build):
+        """Afficher la vue de la route depuis le cache, sinon la construire.
+        
+        Retourne la fonction de rafraîchissement à appeler après page.update()
+        si des données de la vue ont changé pendant son absence.
+        """
+        view, dirty = view_cache.get(route)
+        if view is None:
+            view = build()
+            if is_cacheable(view):
+                view_cache.put(route, view)
+            page.views.append(view)
+            return None
+        # Rebrancher la vue réutilisée sur les modifications et le redimensionnement
+        watch(page, view.data["on_change"])
+        page.on_resize = view.data.get("on_resize")
+        page.views.append(view)
+        return view.data["refresh"] if dirty else None
+    
+    def build_with_app_bar(factory_name):
+        view = view_factory(factory_name)(page)
+        view.appbar = create_main_app_bar(page)
+        return view
+    
+    def build_consultation():
+        view = view_factory("create_consultation_view")(page)
+        if hasattr(view, 'appbar') and view.appbar:
+            actions = [
+                ft.IconButton(
+                    icon=ft.Icons.ADD,  # Changed from icons to Icons
+                    tooltip="Ajouter une pesée",
+                    on_click=lambda _: page.go("/home")
+                )
+            ]
+            
+            if is_admin(page):
+                actions.append(
+                    ft.IconButton(
+                        icon=ft.Icons.ADMIN_PANEL_SETTINGS,  # Changed from icons to Icons
+                        tooltip="Administration",
+                        on_click=lambda _: page.go("/admin")
+                )
+            )
+            
+            actions.append(create_logout_button(page))
+            view.appbar.actions = actions
+        return view
     
     # Define a simpler route change handler
     def route_change(e):
         try:
+            # La vue quittée ne reçoit plus les notifications de modification
+            unwatch(page)
+            # Une lecture d'enregistrement en cours concerne l'ancienne route
+            record_task.cancel()
             page.views.clear()
+            view_cache.leave()
+            refresh = None
             
             if page.route == "/login" or not is_authenticated(page):
-                page.views.append(create_login_view(page))
+                # Nouvel utilisateur possible: aucune vue de l'ancien n'est gardée
+                view_cache.clear()
+                page.views.append(view_factory("create_login_view")(page))
             elif page.route == "/" or page.route == "/home":
-                view = create_home_view(page)
-                view.appbar = create_main_app_bar(page)
-                page.views.append(view)
+                refresh = show_cached("/home", lambda: build_with_app_bar("create_home_view"))
             # Route for the weighing form
-            elif page.route == "/pesees":
+            elif page.route == "/pesees" or page.route.startswith("/pesees/"):
                 if not is_authenticated(page):
                     page.go("/login")
                     return
                 
-                # Récupérer les données pour la modification
-                record_to_edit = page.client_storage.get("record_to_edit")
-                
-                # Créer la vue avec les données
-                view = create_add_view(page, record_to_edit)
-                view.appbar = create_main_app_bar(page)
-                page.views.append(view)
-                
-                # Nettoyer les données après utilisation
-                if record_to_edit:
-                    page.client_storage.remove("record_to_edit")
+                # Créer la vue avec les données à modifier (/pesees/<id>)
+                show_form("pesees", pesees_repo, "create_add_view", "/consultation")
             
             # Private routes (authentication required)
             elif page.route == "/consultation":
@@ -202,37 +283,17 @@ def main(page: ft.Page):
                     page.go("/login")
                     return
                 
-                view = create_consultation_view(page)
-                if hasattr(view, 'appbar') and view.appbar:
-                    actions = [
-                        ft.IconButton(
-                            icon=ft.Icons.ADD,  # Changed from icons to Icons
-                            tooltip="Ajouter une pesée",
-                            on_click=lambda _: page.go("/home")
-                        )
-                    ]
-                    
-                    if is_admin(page):
-                        actions.append(
-                            ft.IconButton(
-                                icon=ft.Icons.ADMIN_PANEL_SETTINGS,  # Changed from icons to Icons
-                                tooltip="Administration",
-                                on_click=lambda _: page.go("/admin")
-                        )
-                    )
-                    
-                    actions.append(create_logout_button(page))
-                    view.appbar.actions = actions
-                page.views.append(view)
+                refresh = show_cached("/consultation", build_consultation)
             
             elif page.route == "/consultation-reception":
                 if not is_authenticated(page):
                     page.go("/login")
                     return
                 
-                view = create_consultation_reception_view(page)
-                view.appbar = create_main_app_bar(page)
-                page.views.append(view)
+                refresh = show_cached(
+                    "/consultation-reception",
+                    lambda: build_with_app_bar("create_consultation_reception_view")
+                )
             
             elif page.route == "/admin":
                 if not is_authenticated(page):
@@ -248,40 +309,33 @@ def main(page: ft.Page):
                     page.go("/home")
                     return
                 
-                view = create_user_management_view(page)
+                view = view_factory("create_user_management_view")(page)
                 view.appbar = create_main_app_bar(page)
                 page.views.append(view)
             
-            elif page.route == "/reception":
+            elif page.route == "/reception" or page.route.startswith("/reception/"):
                 if not is_authenticated(page):
                     page.go("/login")
                     return
                 
-                view = create_reception_view(page)
-                view.appbar = create_main_app_bar(page)
-                page.views.append(view)
+                show_form("reception", reception_repo, "create_reception_view", "/consultation-reception")
             
-            elif page.route == "/sheet":
+            elif page.route == "/sheet" or page.route.startswith("/sheet/"):
                 if not is_authenticated(page):
                     page.go("/login")
                     return
                 
-                record_to_edit = page.client_storage.get("sheet_to_edit")
-                view = create_sheet_view(page, record_to_edit)
-                view.appbar = create_main_app_bar(page)
-                page.views.append(view)
-                
-                if record_to_edit:
-                    page.client_storage.remove("sheet_to_edit")
+                show_form("sheet", sheet_repo, "create_sheet_view", "/consultation-sheet")
             
             elif page.route == "/consultation-sheet":
                 if not is_authenticated(page):
                     page.go("/login")
                     return
                 
-                view = create_consultation_sheet_view(page)
-                view.appbar = create_main_app_bar(page)
-                page.views.append(view)
+                refresh = show_cached(
+                    "/consultation-sheet",
+                    lambda: build_with_app_bar("create_consultation_sheet_view")
+                )
             
             else:
                 # Route par défaut
@@ -292,11 +346,15 @@ def main(page: ft.Page):
                 return
                 
             page.update()
+            
+            # Vue réutilisée dont les données ont changé entre-temps
+            if refresh:
+                refresh()
         except Exception as ex:
             print(f"Route error: {ex}")
             # Fall back to login on error
             page.views.clear()
-            page.views.append(create_login_view(page))
+            page.views.append(view_factory("create_login_view")(page))
             page.update()
     
     page.on_route_change = route_change
@@ -305,7 +363,11 @@ def main(page: ft.Page):
     page.go("/login")
 
 if __name__ == "__main__":
+    import os
+    import secrets
     import socket
+    from exporter import ASSETS_DIR
+    from importer import UPLOAD_DIR
     
     def try_port(port):
         sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
@@ -331,12 +393,23 @@ if __name__ == "__main__":
     print(f"and http://192.168.5.115:{port} (network)")
     print(f"{'='*50}\n")
     
+    # Schéma créé / migré une seule fois, avant la première session
+    init_storage()
+    migrate()
+    
+    # Les envois de fichiers (import CSV / XLSX) exigent une clé secrète
+    os.environ.setdefault("FLET_SECRET_KEY", secrets.token_urlsafe(32))
+    
     try:
         # Use a simpler configuration
         ft.app(
             target=main,
             port=port,
-            view=ft.WEB_BROWSER
+            view=ft.WEB_BROWSER,
+            assets_dir=ASSETS_DIR,
+            upload_dir=UPLOAD_DIR
         )
     except Exception as e:
-        print(f"App error: {e}")
\ No newline at end of file
+        print(f"App error: {e}")
+    finally:
+        shutdown_storage()
\ No newline at end of file
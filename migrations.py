@@ -0,0 +1,109 @@
+"""Migrations du schéma, versionnées par PRAGMA user_version.
+
+migrate() est appelé une seule fois au démarrage du processus (serveur ou
+import en ligne de commande), jamais à l'ouverture d'une session. Chaque
+migration est appliquée une fois, dans l'ordre, puis son numéro est
+enregistré dans le fichier (user_version).
+
+Les étapes sont idempotentes: une base créée avant les migrations (version
+0 mais tables présentes) les rejoue sans dommage. Une migration appliquée ne
+se modifie plus: chacune porte son propre DDL, figé (les index d'une
+migration ne sont pas lus dans une table partagée). Tout changement de
+schéma (nouvel index, nouvelle colonne...) ajoute une migration en fin de
+liste.
+"""
+import hashlib
+import threading
+
+from database import (
+    create_indexes, create_tables, ensure_daily_aggregates, ensure_search_index,
+    ensure_timestamp_columns, pool
+)
+
+_lock = threading.Lock()
+
+
+def create_users_table():
+    """Table des utilisateurs et compte administrateur par défaut (admin/admin)"""
+    with pool.cursor() as c:
+        c.execute('''CREATE TABLE IF NOT EXISTS users
+                     (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                      username TEXT UNIQUE NOT NULL,
+                      password TEXT NOT NULL,
+                      created_at TEXT DEFAULT CURRENT_TIMESTAMP)''')
+        default_password = hashlib.sha256("admin".encode()).hexdigest()
+        c.execute('''INSERT OR IGNORE INTO users (username, password)
+                     VALUES (?, ?)''', ("admin", default_password))
+
+
+def add_user_roles():
+    """Colonne role des utilisateurs; le compte admin devient administrateur"""
+    with pool.cursor() as c:
+        columns = c.execute("PRAGMA table_info(users)").fetchall()
+        if not any(column[1] == 'role' for column in columns):
+            c.execute("ALTER TABLE users ADD COLUMN role TEXT DEFAULT 'user'")
+            c.execute("UPDATE users SET role = 'admin' WHERE username = 'admin'")
+
+
+def add_consultation_indexes():
+    """Index secondaires des écrans de consultation. Les colonnes filtrées par
+    préfixe utilisent NOCASE pour que l'optimisation LIKE 'x%' de SQLite
+    s'applique."""
+    create_indexes({
+        "idx_pesees_date": "CREATE INDEX idx_pesees_date ON pesees(date)",
+        "idx_pesees_date_ts": "CREATE INDEX idx_pesees_date_ts ON pesees(date_ts)",
+        "idx_pesees_produit": "CREATE INDEX idx_pesees_produit ON pesees(produit COLLATE NOCASE)",
+        "idx_pesees_n_lot": "CREATE INDEX idx_pesees_n_lot ON pesees(n_lot COLLATE NOCASE)",
+        "idx_pesees_created_by": "CREATE INDEX idx_pesees_created_by ON pesees(created_by)",
+        "idx_reception_recu_ts": "CREATE INDEX idx_reception_recu_ts ON controle_reception(recu_ts)",
+        "idx_reception_n_lot": "CREATE INDEX idx_reception_n_lot ON controle_reception(n_lot COLLATE NOCASE)",
+        "idx_reception_created_by": "CREATE INDEX idx_reception_created_by ON controle_reception(created_by)",
+        "idx_sheet_date_ts": "CREATE INDEX idx_sheet_date_ts ON sheet(date_ts)",
+        "idx_sheet_lot": "CREATE INDEX idx_sheet_lot ON sheet(lot COLLATE NOCASE)",
+        "idx_sheet_created_by": "CREATE INDEX idx_sheet_created_by ON sheet(created_by)",
+        "idx_pesees_daily_produit": "CREATE INDEX idx_pesees_daily_produit ON pesees_daily(produit, jour)",
+    })
+
+
+def add_date_key_index():
+    """Index d'expression de la clé de tri des pesées (PeseesRepository.DATE_KEY)"""
+    create_indexes({
+        "idx_pesees_date_key": "CREATE INDEX idx_pesees_date_key ON pesees(COALESCE(date_ts, 0))",
+    })
+
+
+# (version, description, étape)
+MIGRATIONS = (
+    (1, "tables métier", create_tables),
+    (2, "utilisateurs", create_users_table),
+    (3, "rôles des utilisateurs", add_user_roles),
+    # Horodatages normalisés (colonnes générées) pour les filtres et tris par date
+    (4, "horodatages", ensure_timestamp_columns),
+    # Agrégats quotidiens de conformité (lisent date_ts)
+    (5, "agrégats quotidiens", ensure_daily_aggregates),
+    # Index secondaires et recherche plein texte des écrans de consultation
+    (6, "index", add_consultation_indexes),
+    (7, "recherche plein texte", ensure_search_index),
+    # Tri et pagination des pesées sur COALESCE(date_ts, 0) (dates NULL comprises)
+    (8, "index de tri par date", add_date_key_index),
+)
+
+
+def schema_version() -> int:
+    with pool.cursor() as c:
+        return c.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate() -> int:
+    """Appliquer les migrations en attente; retourne la version atteinte"""
+    with _lock:
+        version = schema_version()
+        for number, description, step in MIGRATIONS:
+            if number <= version:
+                continue
+            step()
+            with pool.cursor() as c:
+                c.execute(f"PRAGMA user_version = {int(number)}")
+            version = number
+            print(f"Migration {number} appliquée: {description}")
+        return version
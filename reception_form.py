@@ -1,36 +1,20 @@
 import flet as ft
-import sqlite3
 from datetime import datetime
+from background import BackgroundTask
+from database import WRITE_TIMEOUT, reception_repo
+from responsive import ResponsiveLayout
+from sessions import current_username
 
-def create_reception_view(page: ft.Page):
-    # Get editing data from client storage
-    editing_data = page.client_storage.get("reception_to_edit")
-    print("Retrieved editing data:", editing_data)  # Debug print
+def create_reception_view(page: ft.Page, editing_data=None):
+    # Largeur disponible et seuil mobile, suivis au redimensionnement
+    layout = ResponsiveLayout(page, lambda mobile: apply_layout(mobile),
+                              lambda width: apply_widths(width))
     
-    # Déterminer la largeur disponible
-    def get_width():
-        if hasattr(page, "window_width") and page.window_width:
-            return page.window_width
-        elif page.width:
-            return page.width
-        else:
-            return 1200  # Valeur par défaut pour desktop
-    
-    # Déterminer si on est en mode mobile
-    def is_mobile():
-        width = get_width()
-        return width < 768
-    
-    mobile = is_mobile()
-    
-    # Fonction helper pour créer des champs de saisie
+    # Fonction helper pour créer des champs de saisie (largeur fixée par apply_widths)
     def create_field(label, value="", multiline=False, input_filter=None):
-        field_width = get_width() - 40 if mobile else min(300, get_width()/2.5)
-        
         return ft.TextField(
             label=label,
             value=value,
-            width=field_width,
             multiline=multiline,
             min_lines=3 if multiline else 1,
             input_filter=input_filter
@@ -74,7 +58,6 @@ def create_reception_view(page: ft.Page):
     # Dropdown responsive
     conformite_dropdown = ft.Dropdown(
         label="État de la réception",
-        width=get_width() - 40 if mobile else min(300, get_width()/2.5),
         options=[
             ft.dropdown.Option("conforme"),
             ft.dropdown.Option("non conforme")
@@ -96,93 +79,81 @@ def create_reception_view(page: ft.Page):
     if editing_data:
         page.update()
 
+    # Attente du commit sur le pool de threads, indicateur près du bouton
+    save_progress = ft.ProgressRing(width=20, height=20, stroke_width=2, visible=False)
+    save_task = BackgroundTask(page, save_progress)
+
+    def set_saving(saving):
+        # Bouton désactivé jusqu'au commit: un double clic n'envoie pas deux écritures
+        save_button.disabled = saving
+        if save_button.page:
+            save_button.update()
+
     def save_record(e):
+        if save_button.disabled:
+            return
         try:
-            conn = sqlite3.connect('pesees.db')
-            c = conn.cursor()
+            values = {
+                "date": date_input.value,
+                "heure": heure_input.value,
+                "article": article_input.value,
+                "nature_article": nature_input.value,
+                "n_lot": lot_input.value,
+                "dlc": dlc_input.value,
+                "ddp": ddp_input.value,
+                "quantite_receptionnee": quantite_input.value,
+                "conformite": conformite_dropdown.value,
+                "non_conformite": None,
+                "reference": reference_input.value,
+                "anomalie": anomalie_input.value,
+            }
             
+            set_saving(True)
             if editing_data and "id" in editing_data:
                 # Update existing record with all fields
-                c.execute('''
-                    UPDATE controle_reception 
-                    SET date=?, heure=?, article=?, nature_article=?, n_lot=?,
-                        dlc=?, ddp=?, quantite_receptionnee=?, conformite=?,
-                        non_conformite=?, reference=?, anomalie=?
-                    WHERE id=?
-                ''', (
-                    date_input.value,
-                    heure_input.value,
-                    article_input.value,
-                    nature_input.value,
-                    lot_input.value,
-                    dlc_input.value,
-                    ddp_input.value,
-                    quantite_input.value,
-                    conformite_dropdown.value,
-                    None,  # non_conformite
-                    reference_input.value,
-                    anomalie_input.value,
-                    editing_data["id"]
-                ))
+                saved = reception_repo.submit_update(editing_data["id"], values)
             else:
                 # Insert new record with all fields
-                c.execute('''
-                    INSERT INTO controle_reception 
-                    (date, heure, article, nature_article, n_lot, dlc, ddp,
-                     quantite_receptionnee, conformite, non_conformite,
-                     reference, anomalie, created_by)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (
-                    date_input.value,
-                    heure_input.value,
-                    article_input.value,
-                    nature_input.value,
-                    lot_input.value,
-                    dlc_input.value,
-                    ddp_input.value,
-                    quantite_input.value,
-                    conformite_dropdown.value,
-                    None,  # non_conformite
-                    reference_input.value,
-                    anomalie_input.value,
-                    page.client_storage.get("username", "Unknown")
-                ))
-
-            conn.commit()
-            conn.close()
-
-            # Clear editing data
-            page.client_storage.remove("reception_to_edit")
-
-            # Show success message and return to consultation view
-            page.snack_bar = ft.SnackBar(
-                content=ft.Text("Enregistrement sauvegardé avec succès!")
-            )
-            page.snack_bar.open = True
-            page.go("/consultation-reception")
+                values["created_by"] = current_username(page, "Unknown")
+                saved = reception_repo.submit_insert(values)
+            # Écriture groupée avec celles des autres sessions; le commit est
+            # attendu hors du gestionnaire d'événement
+            save_task.run(lambda: saved.result(WRITE_TIMEOUT), on_saved, on_save_error)
             
         except Exception as ex:
-            print(f"Error saving data: {ex}")
-            page.snack_bar = ft.SnackBar(
-                content=ft.Text(f"Erreur: {str(ex)}"),
-                bgcolor=ft.Colors.RED
-            )
-            page.snack_bar.open = True
-            page.update()
+            on_save_error(ex)
 
-    # Créer la mise en page responsive
-    def create_layout():
-        nonlocal mobile
-        mobile = is_mobile()
-        
+    def on_saved(record_id):
+        set_saving(False)
+        # Show success message and return to consultation view
+        page.snack_bar = ft.SnackBar(
+            content=ft.Text("Enregistrement sauvegardé avec succès!")
+        )
+        page.snack_bar.open = True
+        page.go("/consultation-reception")
+
+    def on_save_error(ex):
+        set_saving(False)
+        print(f"Error saving data: {ex}")
+        page.snack_bar = ft.SnackBar(
+            content=ft.Text(f"Erreur: {str(ex)}"),
+            bgcolor=ft.Colors.RED
+        )
+        page.snack_bar.open = True
+        page.update()
+
+    inputs = [
+        date_input, heure_input, article_input, nature_input,
+        lot_input, dlc_input, ddp_input, quantite_input,
+        conformite_dropdown, reference_input, anomalie_input
+    ]
+    
+    # Créer la mise en page responsive (champs réutilisés)
+    def create_layout(mobile):
         if mobile:
             # Mise en page mobile (une seule colonne)
             return ft.Column(
-                [
-                    date_input, heure_input, article_input, nature_input,
-                    lot_input, dlc_input, ddp_input, quantite_input,
-                    conformite_dropdown, reference_input, anomalie_input
-                ],
+                inputs,
                 spacing=10,
                 horizontal_alignment=ft.CrossAxisAlignment.CENTER
             )
@@ -190,93 +161,63 @@ def create_reception_view(page: ft.Page):
             # Mise en page desktop (deux colonnes)
             return ft.Row(
                 [
-                    ft.Column(
-                        [date_input, heure_input, article_input,
-                         nature_input, lot_input, dlc_input],
-                        spacing=10
-                    ),
-                    ft.Column(
-                        [ddp_input, quantite_input, conformite_dropdown,
-                         reference_input, anomalie_input],
-                        spacing=10
-                    )
+                    ft.Column(inputs[:6], spacing=10),
+                    ft.Column(inputs[6:], spacing=10)
                 ],
                 alignment=ft.MainAxisAlignment.CENTER,
                 spacing=20
             )
     
-    form_layout = create_layout()
-    
-    # Créer les boutons d'action responsive
-    def create_buttons():
-        nonlocal mobile
-        button_width = (get_width() - 60) / 2 if mobile else None
-        
-        return ft.Row(
-            [
-                ft.ElevatedButton(
-                    text="Sauvegarder",
-                    on_click=save_record,
-                    style=ft.ButtonStyle(
-                        color=ft.Colors.WHITE,
-                        bgcolor=ft.Colors.BLUE,
-                        padding=15
-                    ),
-                    width=button_width
-                ),
-                ft.ElevatedButton(
-                    text="Consulter",
-                    on_click=lambda _: page.go("/consultation-reception"),
-                    style=ft.ButtonStyle(
-                        color=ft.Colors.WHITE,
-                        bgcolor=ft.Colors.GREEN,
-                        padding=15
-                    ),
-                    width=button_width
-                )
-            ],
-            alignment=ft.MainAxisAlignment.CENTER,
-            spacing=10 if mobile else 20
+    # Boutons d'action (largeur fixée par apply_widths)
+    save_button = ft.ElevatedButton(
+        text="Sauvegarder",
+        on_click=save_record,
+        style=ft.ButtonStyle(
+            color=ft.Colors.WHITE,
+            bgcolor=ft.Colors.BLUE,
+            padding=15
+        )
+    )
+    consult_button = ft.ElevatedButton(
+        text="Consulter",
+        on_click=lambda _: page.go("/consultation-reception"),
+        style=ft.ButtonStyle(
+            color=ft.Colors.WHITE,
+            bgcolor=ft.Colors.GREEN,
+            padding=15
         )
+    )
+    buttons_row = ft.Row(
+        [save_progress, save_button, consult_button],
+        alignment=ft.MainAxisAlignment.CENTER
+    )
     
-    buttons_row = create_buttons()
+    # Seuil mobile franchi: changer la disposition
+    def apply_layout(mobile):
+        content_column.controls[1] = create_layout(mobile)
+        title_text.size = 24 if mobile else 30
+        buttons_row.spacing = 10 if mobile else 20
+        main_container.padding = 10 if mobile else 20
     
-    # Gestionnaire de redimensionnement
-    def on_resize(e):
-        nonlocal form_layout, buttons_row
-        
-        # Recréer la mise en page
-        new_form_layout = create_layout()
-        new_buttons_row = create_buttons()
-        
-        # Mettre à jour le titre
-        content_column.controls[0].size = 24 if is_mobile() else 30
-        
-        # Remplacer les éléments dans la colonne principale
-        content_column.controls[1] = new_form_layout
-        content_column.controls[2] = new_buttons_row
-        
-        form_layout = new_form_layout
-        buttons_row = new_buttons_row
-        
-        # Mettre à jour le padding du container
-        main_container.padding = 10 if is_mobile() else 20
-        
-        page.update()
+    # Même disposition: ajuster les largeurs en place
+    def apply_widths(width):
+        mobile = layout.mobile
+        field_width = width - 40 if mobile else min(300, width/2.5)
+        for field in inputs:
+            field.width = field_width
+        save_button.width = consult_button.width = (width - 60) / 2 if mobile else None
     
-    # Enregistrer le gestionnaire de redimensionnement
-    page.on_resize = on_resize
+    title_text = ft.Text(
+        "Contrôle de Réception",
+        weight=ft.FontWeight.BOLD,
+        text_align=ft.TextAlign.CENTER
+    )
     
     # Créer la colonne de contenu principale
     content_column = ft.Column(
         [
-            ft.Text(
-                "Contrôle de Réception",
-                size=24 if mobile else 30,
-                weight=ft.FontWeight.BOLD,
-                text_align=ft.TextAlign.CENTER
-            ),
-            form_layout,
+            title_text,
+            ft.Container(),
             buttons_row
         ],
         horizontal_alignment=ft.CrossAxisAlignment.CENTER,
@@ -285,10 +226,14 @@ def create_reception_view(page: ft.Page):
     
     main_container = ft.Container(
         content=content_column,
-        padding=10 if mobile else 20,
         expand=True
     )
     
+    apply_layout(layout.mobile)
+    apply_widths(layout.width)
+    # Enregistrer le gestionnaire de redimensionnement
+    layout.attach()
+    
     return ft.View(
         "/reception",
         [main_container],
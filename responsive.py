@@ -0,0 +1,78 @@
+"""Mise en page adaptative des écrans (accueil, formulaires...).
+
+Faire glisser le bord d'une fenêtre déclenche des centaines d'événements
+on_resize. ResponsiveLayout les regroupe (le dernier seulement est traité,
+RESIZE_DEBOUNCE secondes après le calme) et distingue deux cas:
+- le seuil mobile/desktop est franchi: on_breakpoint(mobile) change la
+  disposition (colonne unique / colonnes côte à côte) en réutilisant les
+  contrôles existants;
+- sinon: on_width(largeur) ajuste seulement les largeurs en place.
+Un seul page.update() est envoyé par rafale de redimensionnement.
+"""
+import threading
+
+# Largeur (px) en dessous de laquelle l'affichage est « mobile »
+MOBILE_BREAKPOINT = 768
+# Délai (s) sans redimensionnement avant d'appliquer la mise en page
+RESIZE_DEBOUNCE = 0.15
+
+
+def page_width(page, default=1200):
+    """Largeur disponible: fenêtre (desktop), page (web), sinon défaut"""
+    if getattr(page, "window_width", None):
+        return page.window_width
+    return page.width or default
+
+
+class ResponsiveLayout:
+    """Gestionnaire page.on_resize d'une vue, avec anti-rebond.
+
+    mobile et width donnent l'état courant, à utiliser pour construire la
+    vue; attach() branche le gestionnaire sur la page.
+    """
+
+    def __init__(self, page, on_breakpoint, on_width=None,
+                 breakpoint=MOBILE_BREAKPOINT, delay=RESIZE_DEBOUNCE, default_width=1200):
+        self.page = page
+        self.on_breakpoint = on_breakpoint
+        self.on_width = on_width
+        self.breakpoint = breakpoint
+        self.delay = delay
+        self.default_width = default_width
+        self.width = page_width(page, default_width)
+        self.mobile = self.width < breakpoint
+        self._lock = threading.Lock()
+        self._timer = None
+
+    def attach(self):
+        self.page.on_resize = self.on_resize
+
+    def on_resize(self, e):
+        # Chaque événement repousse l'application de la mise en page
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = threading.Timer(self.delay, self._apply)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _apply(self):
+        with self._lock:
+            self._timer = None
+        if self.page.on_resize != self.on_resize:
+            # La vue n'est plus affichée
+            return
+        width = page_width(self.page, self.default_width)
+        mobile = width < self.breakpoint
+        crossed = mobile != self.mobile
+        if not crossed and width == self.width:
+            return
+        self.width, self.mobile = width, mobile
+        try:
+            if crossed:
+                self.on_breakpoint(mobile)
+            if self.on_width:
+                self.on_width(width)
+            self.page.update()
+        except Exception as ex:
+            print(f"Error applying layout: {ex}")
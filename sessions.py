@@ -0,0 +1,88 @@
+"""Sessions côté serveur: état d'authentification de chaque session Flet.
+
+L'utilisateur connecté et son rôle sont gardés en mémoire, indexés par
+page.session_id, au lieu d'être relus dans client_storage (un aller-retour
+websocket vers le navigateur par lecture). Le routage ne dépend ainsi
+jamais du client. Une session inactive pendant SESSION_TTL secondes expire;
+au-delà de MAX_SESSIONS, les moins récemment utilisées sont évincées.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+# Durée (s) d'inactivité avant expiration d'une session
+SESSION_TTL = 8 * 3600
+# Nombre maximal de sessions gardées en mémoire
+MAX_SESSIONS = 1000
+
+
+class SessionStore:
+    """Données par session (dict), avec expiration glissante et éviction LRU"""
+
+    def __init__(self, ttl=SESSION_TTL, max_sessions=MAX_SESSIONS):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self._lock = threading.Lock()
+        self._sessions = OrderedDict()
+
+    def _purge(self, now):
+        # Les sessions sont rangées de la moins à la plus récemment utilisée
+        while self._sessions:
+            session_id, (expires, _) = next(iter(self._sessions.items()))
+            if expires > now and len(self._sessions) <= self.max_sessions:
+                break
+            del self._sessions[session_id]
+
+    def get(self, session_id) -> dict:
+        """Données de la session (vide si inconnue ou expirée)"""
+        now = time.monotonic()
+        with self._lock:
+            self._purge(now)
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return {}
+            self._sessions[session_id] = (now + self.ttl, entry[1])
+            self._sessions.move_to_end(session_id)
+            return entry[1]
+
+    def set(self, session_id, **values):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            data = dict(entry[1]) if entry else {}
+            data.update(values)
+            self._sessions[session_id] = (now + self.ttl, data)
+            self._sessions.move_to_end(session_id)
+            self._purge(now)
+
+    def clear(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+
+session_store = SessionStore()
+
+
+def login(page, username, role):
+    session_store.set(page.session_id, authenticated=True, username=username, role=role)
+
+
+def logout(page):
+    session_store.clear(page.session_id)
+
+
+def is_authenticated(page) -> bool:
+    return bool(session_store.get(page.session_id).get("authenticated"))
+
+
+def current_username(page, default=None):
+    return session_store.get(page.session_id).get("username") or default
+
+
+def current_role(page):
+    return session_store.get(page.session_id).get("role")
+
+
+def is_admin(page) -> bool:
+    """Vrai si l'utilisateur de la session est administrateur"""
+    return current_role(page) == "admin"
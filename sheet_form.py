@@ -1,6 +1,8 @@
 import flet as ft
-import sqlite3
 from datetime import datetime
+from background import BackgroundTask
+from database import WRITE_TIMEOUT, sheet_repo
+from sessions import current_username
 
 def create_sheet_view(page: ft.Page, record_to_edit=None):
     # Input fields
@@ -42,7 +44,19 @@ def create_sheet_view(page: ft.Page, record_to_edit=None):
         multiline=True
     )
 
+    # Attente du commit sur le pool de threads, indicateur près du bouton
+    save_progress = ft.ProgressRing(width=20, height=20, stroke_width=2, visible=False)
+    save_task = BackgroundTask(page, save_progress)
+
+    def set_saving(saving):
+        # Bouton désactivé jusqu'au commit: un double clic n'envoie pas deux écritures
+        save_button.disabled = saving
+        if save_button.page:
+            save_button.update()
+
     def save_sheet(e):
+        if save_button.disabled:
+            return
         try:
             if not all([date_input.value, produit_input.value, lot_input.value, qte_input.value]):
                 page.show_snack_bar(ft.SnackBar(
@@ -51,41 +65,52 @@ def create_sheet_view(page: ft.Page, record_to_edit=None):
                 ))
                 return
 
-            conn = sqlite3.connect('pesees.db')
-            c = conn.cursor()
+            values = {
+                "date": date_input.value,
+                "produit": produit_input.value,
+                "lot": lot_input.value,
+                "qte_pesee_caisse": qte_input.value,
+                "anomalie": anomalie_input.value,
+                "action_corrective": action_input.value,
+            }
             
+            set_saving(True)
             if record_to_edit:
-                c.execute('''UPDATE sheet 
-                           SET date=?, produit=?, lot=?, qte_pesee_caisse=?,
-                               anomalie=?, action_corrective=?
-                           WHERE id=?''',
-                         (date_input.value, produit_input.value, lot_input.value,
-                          qte_input.value, anomalie_input.value, action_input.value,
-                          record_to_edit[0]))
+                saved = sheet_repo.submit_update(record_to_edit[0], values)
             else:
-                c.execute('''INSERT INTO sheet 
-                           (date, produit, lot, qte_pesee_caisse,
-                            anomalie, action_corrective, created_by)
-                           VALUES (?, ?, ?, ?, ?, ?, ?)''',
-                         (date_input.value, produit_input.value, lot_input.value,
-                          qte_input.value, anomalie_input.value, action_input.value,
-                          page.client_storage.get("username")))
-
-            conn.commit()
-            conn.close()
-
-            page.show_snack_bar(ft.SnackBar(
-                content=ft.Text("Enregistrement réussi!"),
-                bgcolor=ft.Colors.GREEN
-            ))
-            page.go("/consultation-sheet")  # Redirection vers la consultation
+                values["created_by"] = current_username(page)
+                saved = sheet_repo.submit_insert(values)
+            # Écriture groupée avec celles des autres sessions; le commit est
+            # attendu hors du gestionnaire d'événement
+            save_task.run(lambda: saved.result(WRITE_TIMEOUT), on_saved, on_save_error)
             
         except Exception as ex:
-            print(f"Error saving sheet: {ex}")
-            page.show_snack_bar(ft.SnackBar(
-                content=ft.Text("Erreur lors de l'enregistrement!"),
-                bgcolor=ft.Colors.RED
-            ))
+            on_save_error(ex)
+
+    def on_saved(record_id):
+        set_saving(False)
+        page.show_snack_bar(ft.SnackBar(
+            content=ft.Text("Enregistrement réussi!"),
+            bgcolor=ft.Colors.GREEN
+        ))
+        page.go("/consultation-sheet")  # Redirection vers la consultation
+
+    def on_save_error(ex):
+        set_saving(False)
+        print(f"Error saving sheet: {ex}")
+        page.show_snack_bar(ft.SnackBar(
+            content=ft.Text("Erreur lors de l'enregistrement!"),
+            bgcolor=ft.Colors.RED
+        ))
+
+    save_button = ft.ElevatedButton(
+        text="Enregistrer",
+        on_click=save_sheet,
+        style=ft.ButtonStyle(
+            color=ft.Colors.WHITE,
+            bgcolor=ft.Colors.BLUE
+        )
+    )
 
     return ft.View(
         "/sheet",
@@ -103,14 +128,8 @@ def create_sheet_view(page: ft.Page, record_to_edit=None):
                         # Row avec les deux boutons côte à côte
                         ft.Row(
                             [
-                                ft.ElevatedButton(
-                                    text="Enregistrer",
-                                    on_click=save_sheet,
-                                    style=ft.ButtonStyle(
-                                        color=ft.Colors.WHITE,
-                                        bgcolor=ft.Colors.BLUE
-                                    )
-                                ),
+                                save_progress,
+                                save_button,
                                 ft.ElevatedButton(
                                     text="Consulter",
                                     on_click=lambda _: page.go("/consultation-sheet"),
@@ -0,0 +1,123 @@
+"""Plans d'exécution des requêtes de consultation (index gérés par l'application).
+
+Aucune requête ne doit parcourir une table entière. Les pages suivantes et
+les filtres par date des pesées doivent en plus lire un intervalle de
+l'index attendu, déjà dans l'ordre de la pagination (pas de tri temporaire).
+
+    python -m pytest tests
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database  # noqa: E402
+import migrations  # noqa: E402
+from database import conformity_stats, pesees_repo, reception_repo, sheet_repo, to_timestamp  # noqa: E402
+
+ROWS = 2000
+
+
+def seed(pool):
+    with pool.cursor() as c:
+        c.executemany(
+            'INSERT INTO pesees (date, produit, n_lot, created_by) VALUES (?, ?, ?, ?)',
+            [(f"2024-{i % 12 + 1:02d}-{i % 28 + 1:02d}", f"produit-{i % 40}", f"LOT{i:05d}", "admin")
+             for i in range(ROWS)]
+        )
+        c.execute("UPDATE pesees SET nb_caisses_pesees = 20, nb_caisses_conformes = 20 - id % 3, "
+                  "nb_caisses_non_conformes = id % 3")
+        c.execute("UPDATE pesees SET anomalie_observee = 'anomalie caisse ' || id WHERE id % 50 = 0")
+        c.executemany(
+            'INSERT INTO controle_reception (date, heure, article, n_lot, created_by) VALUES (?, ?, ?, ?, ?)',
+            [(f"2024-{i % 12 + 1:02d}-{i % 28 + 1:02d}", f"{i % 24:02d}:00", f"article-{i % 30}",
+              f"LOT{i:05d}", "admin") for i in range(ROWS)]
+        )
+        c.executemany(
+            'INSERT INTO sheet (date, produit, lot, qte_pesee_caisse, created_by) VALUES (?, ?, ?, ?, ?)',
+            [(f"2024-{i % 12 + 1:02d}-{i % 28 + 1:02d}", f"produit-{i % 40}", f"LOT{i:05d}", 10, "admin")
+             for i in range(ROWS)]
+        )
+        # Statistiques du planificateur sur les données de test
+        c.execute('ANALYZE')
+
+
+@pytest.fixture(scope="module")
+def explain(tmp_path_factory):
+    # Base temporaire: les migrations et explain_query_plan utilisent le pool des modules
+    test_pool = database.ConnectionPool(str(tmp_path_factory.mktemp("plans") / "pesees.db"))
+    saved = database.pool, migrations.pool
+    database.pool = migrations.pool = test_pool
+    try:
+        migrations.migrate()
+        seed(test_pool)
+        yield lambda query: database.explain_query_plan(*query)
+    finally:
+        database.pool, migrations.pool = saved
+        test_pool.close_all()
+
+
+AFTER = (to_timestamp("2024-05-10"), 100)
+
+# Requêtes qui ne doivent pas parcourir une table entière
+QUERIES = {
+    "pesees": lambda: pesees_repo.summary_query(),
+    "pesees produit": lambda: pesees_repo.summary_query("", "produit-1"),
+    "pesees lot": lambda: pesees_repo.summary_query("", "", "LOT001"),
+    "pesees lot court": lambda: pesees_repo.summary_query("", "", "LO"),
+    "pesees date + produit + lot": lambda: pesees_repo.summary_query("2024-05", "produit-1", "LOT001"),
+    "pesees produit contient": lambda: pesees_repo.summary_query("", "uit-1"),
+    "pesees recherche": lambda: pesees_repo.summary_query("", "", "", "anomalie"),
+    "pesees date + recherche": lambda: pesees_repo.summary_query("2024-05", "", "", "anomalie caisse"),
+    "pesees produit + au": lambda: pesees_repo.summary_query("", "produit-1", "", "", "", "2024-05-31"),
+    "pesees début de date": lambda: pesees_repo.summary_query("2024-0"),
+    "pesees page produit": lambda: pesees_repo.page_query("", "produit-1", after=AFTER),
+    "controle_reception": lambda: (reception_repo.LIST_QUERY, []),
+    "sheet": lambda: (sheet_repo.LIST_QUERY, []),
+    "conformité jour": lambda: conformity_stats.day_query("2024-05-03"),
+    "conformité jour + produit": lambda: conformity_stats.day_query("2024-05-03", "produit-1"),
+    "conformité semaine": lambda: conformity_stats.week_query("2024-05-03"),
+    "conformité produit": lambda: conformity_stats.product_query("produit-1", "2024-05-01", "2024-05-31"),
+}
+
+DATE_FILTERS = {
+    "mois": ("2024-05",),
+    "jour": ("03/05/2024",),
+    "du": ("", "", "", "", "2024-05-01", ""),
+    "au": ("", "", "", "", "", "2024-05-31"),
+    "du + au": ("", "", "", "", "2024-05-01", "2024-05-31"),
+}
+
+# Requêtes servies par un intervalle d'index dans l'ordre de la pagination:
+# (requête, index attendu)
+RANGE_QUERIES = {
+    "pesees page suivante": (lambda: pesees_repo.page_query(after=AFTER), "idx_pesees_date_key"),
+}
+for _name, _filters in DATE_FILTERS.items():
+    RANGE_QUERIES[f"pesees {_name}"] = (
+        lambda f=_filters: pesees_repo.summary_query(*f), "idx_pesees_date_key"
+    )
+    RANGE_QUERIES[f"pesees page {_name}"] = (
+        lambda f=_filters: pesees_repo.page_query(*f), "idx_pesees_date_key"
+    )
+    RANGE_QUERIES[f"pesees page suivante {_name}"] = (
+        lambda f=_filters: pesees_repo.page_query(*f, after=AFTER), "idx_pesees_date_key"
+    )
+
+
+@pytest.mark.parametrize("name", list(QUERIES) + list(RANGE_QUERIES))
+def test_no_full_table_scan(explain, name):
+    query = QUERIES[name]() if name in QUERIES else RANGE_QUERIES[name][0]()
+    plan = explain(query)
+    # "SCAN pesees_fts VIRTUAL TABLE INDEX ..." est une recherche FTS, pas un parcours
+    assert not [step for step in plan if step.startswith("SCAN") and "INDEX" not in step], plan
+
+
+@pytest.mark.parametrize("name", list(RANGE_QUERIES))
+def test_range_scan_in_page_order(explain, name):
+    query, index = RANGE_QUERIES[name]
+    plan = explain(query())
+    assert any(step.startswith(f"SEARCH pesees USING INDEX {index} ") for step in plan), plan
+    assert not any("TEMP B-TREE FOR ORDER BY" in step for step in plan), plan
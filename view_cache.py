@@ -0,0 +1,77 @@
+"""Cache par session des vues déjà construites.
+
+route_change réutilise l'arbre de contrôles d'une route visitée récemment
+au lieu de le reconstruire et de relire la base. Une vue cachée est marquée
+« sale » quand une écriture touche l'une de ses tables pendant qu'elle
+n'est pas affichée; elle est alors rafraîchie à son retour à l'écran.
+
+Les vues cachables déclarent dans view.data:
+- "tables": tables affichées;
+- "on_change": gestionnaire des modifications publiées (changes.watch);
+- "refresh": relecture des données affichées;
+- "on_resize": gestionnaire page.on_resize de la vue (ResponsiveLayout), ou
+  None.
+Flet n'accepte pas data dans le constructeur de ft.View: la vue est créée
+puis view.data est affecté.
+"""
+import threading
+from collections import OrderedDict
+
+# Nombre de vues gardées par session
+VIEW_CACHE_SIZE = 5
+
+
+def is_cacheable(view):
+    return isinstance(view.data, dict) and "tables" in view.data and "refresh" in view.data
+
+
+class ViewCache:
+    """Vues d'une session par route (LRU), avec drapeau « sale » par route"""
+
+    def __init__(self, size=VIEW_CACHE_SIZE):
+        self.size = size
+        self._lock = threading.Lock()
+        self._views = OrderedDict()
+        self._dirty = set()
+        self.current = None
+
+    def on_change(self, table, op, record_id):
+        """Écouteur des écritures (changes.add_listener): la vue affichée
+        applique elle-même les changements, les autres sont marquées sales"""
+        with self._lock:
+            for route, view in self._views.items():
+                if route != self.current and table in view.data["tables"]:
+                    self._dirty.add(route)
+
+    def get(self, route):
+        """(vue, sale) pour la route, ou (None, False) si elle n'est pas en cache"""
+        with self._lock:
+            self.current = route
+            view = self._views.get(route)
+            if view is None:
+                return None, False
+            self._views.move_to_end(route)
+            dirty = route in self._dirty
+            self._dirty.discard(route)
+            return view, dirty
+
+    def put(self, route, view):
+        with self._lock:
+            self.current = route
+            self._views[route] = view
+            self._views.move_to_end(route)
+            self._dirty.discard(route)
+            while len(self._views) > self.size:
+                old_route, _ = self._views.popitem(last=False)
+                self._dirty.discard(old_route)
+
+    def leave(self):
+        """Plus aucune vue cachée n'est affichée (formulaire, connexion...)"""
+        with self._lock:
+            self.current = None
+
+    def clear(self):
+        with self._lock:
+            self._views.clear()
+            self._dirty.clear()
+            self.current = None